@@ -1,20 +1,31 @@
 import logging
-from bson import ObjectId, errors
-from flask import Blueprint, render_template, redirect, url_for, flash, request, session, Response, send_file
+import re
+from bson import ObjectId, errors, json_util
+from flask import Blueprint, render_template, redirect, url_for, flash, request, session, Response, send_file, jsonify, stream_with_context
 from flask_login import login_required, current_user
 from flask_wtf import FlaskForm
+from pymongo import ASCENDING, DESCENDING, UpdateOne
 from wtforms import StringField, FloatField, SelectField, SubmitField, DateField, validators
 from wtforms.validators import DataRequired, NumberRange
 from translations import trans
 import utils
+from helpers.admission import heavy_endpoint, is_export_request
+from helpers.admin_metrics import admin_metrics, expire_cached_reports, get_stats_snapshot, get_investor_summary
+from helpers.batch_lookup import attach_users, page_args, paginate_query
+from helpers.user_deletion import request_user_deletion
+from helpers.audit_query import AUDIT_PAGE_SIZE, AUDIT_MAX_PAGE_SIZE, build_audit_query, find_audit_page, iter_audit_csv, serialize_audit_log
+from helpers.retention import RETENTION_POLICIES, parse_day_range, read_archive, restore_range, retention_engine
+from helpers.usage_analytics import usage_summary
+from helpers.monthly_analytics import invalidate_months
+from helpers.blob_storage import blob_storage
 from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
-from io import BytesIO
+from io import BytesIO, StringIO
 import csv
-from models import get_records, get_cashflows, get_feedback, to_dict_feedback, get_waitlist_entries, to_dict_waitlist
+from models import get_records, get_cashflows, get_feedback, to_dict_feedback, get_waitlist_entries, to_dict_waitlist, create_tombstone, get_kyc_records_page, KYC_STATUSES
 
 logger = logging.getLogger(__name__)
 
@@ -94,12 +105,122 @@ def log_audit_action(action, details=None):
             'admin_id': str(current_user.id),
             'action': action,
             'details': details or {},
+            'ip_address': request.remote_addr,
             'timestamp': datetime.now(timezone.utc)
         })
     except Exception as e:
         logger.error(f"Error logging audit action '{action}': {str(e)}",
                      extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
 
+USERS_PAGE_SIZE = 50
+RECEIPT_STATUSES = ('pending', 'approved', 'rejected')
+TRIAL_EXPIRING_DAYS = 7
+USER_FILTER_ARGS = ('q', 'role', 'subscription', 'trial')
+USER_LIST_PROJECTION = {
+    'email': 1, 'role': 1, 'suspended': 1, 'created_at': 1,
+    'is_subscribed': 1, 'subscription_plan': 1, 'subscription_end': 1,
+    'is_trial': 1, 'trial_end': 1
+}
+
+def annotate_user_status(user, now):
+    """Set the string _id and is_trial_active flag the admin user tables display."""
+    user['_id'] = str(user['_id'])
+    trial_end = user.get('trial_end')
+    subscription_end = user.get('subscription_end')
+    trial_end_aware = trial_end.replace(tzinfo=ZoneInfo("UTC")) if trial_end and trial_end.tzinfo is None else trial_end
+    subscription_end_aware = subscription_end.replace(tzinfo=ZoneInfo("UTC")) if subscription_end and subscription_end.tzinfo is None else subscription_end
+    user['is_trial_active'] = (
+        now <= trial_end_aware if user.get('is_trial') and trial_end_aware
+        else user.get('is_subscribed') and subscription_end_aware and now <= subscription_end_aware
+    )
+    return user
+
+def build_user_conditions(args, now):
+    """
+    Translate the user list filters into query conditions.
+
+    Every condition is served by a users index: prefix search uses anchored
+    regexes on _id and email (both stored lowercase), role has its own index,
+    and subscription/trial state use the compound status/expiry indexes.
+    """
+    conditions = [{'deletion_pending': {'$ne': True}}]
+    if not utils.is_admin():
+        conditions.append({'role': {'$ne': 'admin'}})
+    search = (args.get('q') or '').strip().lower()
+    if search:
+        prefix = '^' + re.escape(search)
+        conditions.append({'$or': [{'_id': {'$regex': prefix}}, {'email': {'$regex': prefix}}]})
+    role = args.get('role')
+    if role in ('trader', 'startup', 'admin'):
+        conditions.append({'role': role})
+    subscription = args.get('subscription')
+    if subscription == 'active':
+        conditions.append({'is_subscribed': True, 'subscription_end': {'$gte': now}})
+    elif subscription == 'expired':
+        conditions.append({'is_subscribed': True, 'subscription_end': {'$lt': now}})
+    elif subscription == 'none':
+        conditions.append({'is_subscribed': {'$ne': True}})
+    trial = args.get('trial')
+    if trial == 'active':
+        conditions.append({'is_trial': True, 'trial_end': {'$gte': now}})
+    elif trial == 'expiring':
+        conditions.append({'is_trial': True, 'trial_end': {'$gte': now, '$lt': now + timedelta(days=TRIAL_EXPIRING_DAYS)}})
+    elif trial == 'expired':
+        conditions.append({'is_trial': True, 'trial_end': {'$lt': now}})
+    return conditions
+
+def load_user_page(db, args, page_size=USERS_PAGE_SIZE):
+    """
+    Fetch one page of users matching the list filters, ordered by username.
+
+    Pages are keyset-paginated on _id ('after' / 'before' cursors) rather than
+    skipped, so deep pages cost the same as the first one.
+
+    Returns:
+        dict: users, active filters, and next_after / prev_before cursors
+    """
+    now = datetime.now(timezone.utc)
+    conditions = build_user_conditions(args, now)
+    after = (args.get('after') or '').strip()
+    before = (args.get('before') or '').strip()
+    if before:
+        conditions.append({'_id': {'$lt': before}})
+        query = {'$and': conditions}
+        users = list(db.users.find(query, USER_LIST_PROJECTION).sort('_id', DESCENDING).limit(page_size + 1))
+        has_prev = len(users) > page_size
+        users = users[:page_size][::-1]
+        has_next = True
+    else:
+        if after:
+            conditions.append({'_id': {'$gt': after}})
+        query = {'$and': conditions} if conditions else {}
+        users = list(db.users.find(query, USER_LIST_PROJECTION).sort('_id', ASCENDING).limit(page_size + 1))
+        has_next = len(users) > page_size
+        users = users[:page_size]
+        has_prev = bool(after)
+    for user in users:
+        annotate_user_status(user, now)
+    return {
+        'users': users,
+        'filters': {key: args.get(key) for key in USER_FILTER_ARGS if args.get(key)},
+        'next_after': users[-1]['_id'] if users and has_next else None,
+        'prev_before': users[0]['_id'] if users and has_prev else None
+    }
+
+def selected_user_ids():
+    """Usernames posted from the user list checkboxes and/or the single user field."""
+    user_ids = request.form.getlist('user_ids')
+    user_ids.append(request.form.get('user_id', ''))
+    return list(dict.fromkeys(user_id.strip().lower() for user_id in user_ids if user_id and user_id.strip()))
+
+def redirect_to_user_list(endpoint):
+    """Redirect back to a user list keeping its filters and page."""
+    return redirect(url_for(endpoint, **request.args.to_dict()))
+
+def end_of_day(value):
+    """Convert a form date into an aware end-of-day datetime BSON can store."""
+    return datetime.combine(value, datetime.max.time(), tzinfo=timezone.utc) if value else None
+
 # Routes
 @admin_bp.route('/dashboard', methods=['GET'])
 @login_required
@@ -111,17 +232,9 @@ def dashboard():
         db = utils.get_mongo_db()
         if db is None:
             raise Exception("Failed to connect to MongoDB")
-        stats = {
-            'users': db.users.count_documents({}),
-            'records': db.records.count_documents({}),
-            'cashflows': db.cashflows.count_documents({}),
-            'debtors': db.debtors.count_documents({}),
-            'creditors': db.creditors.count_documents({}),
-            'funds': db.funds.count_documents({}),
-            'audit_logs': db.audit_logs.count_documents({}),
-            'feedback': db.feedback.count_documents({})
-        }
-        recent_users = list(db.users.find().sort('created_at', -1).limit(5))
+        snapshot = get_stats_snapshot(db, max_age=admin_metrics.max_age if admin_metrics.app else None)
+        stats = snapshot['stats']
+        recent_users = list(db.users.find({'deletion_pending': {'$ne': True}}).sort('created_at', -1).limit(5))
         for user in recent_users:
             user['_id'] = str(user['_id'])
             trial_end = user.get('trial_end')
@@ -137,6 +250,8 @@ def dashboard():
         return render_template(
             'admin/dashboard.html',
             stats=stats,
+            daily_stats=snapshot.get('daily', []),
+            stats_refreshed_at=snapshot.get('refreshed_at'),
             recent_users=recent_users,
             title=trans('admin_dashboard', default='Admin Dashboard')
         )
@@ -156,25 +271,44 @@ def manage_users():
         db = utils.get_mongo_db()
         if db is None:
             raise Exception("Failed to connect to MongoDB")
-        users = list(db.users.find({} if utils.is_admin() else {'role': {'$ne': 'admin'}}).sort('created_at', -1))
-        for user in users:
-            user['_id'] = str(user['_id'])
-            user['username'] = user['_id']
-            trial_end = user.get('trial_end')
-            subscription_end = user.get('subscription_end')
-            trial_end_aware = trial_end.replace(tzinfo=ZoneInfo("UTC")) if trial_end and trial_end.tzinfo is None else trial_end
-            subscription_end_aware = subscription_end.replace(tzinfo=ZoneInfo("UTC")) if subscription_end and subscription_end.tzinfo is None else subscription_end
-            user['is_trial_active'] = (
-                datetime.now(timezone.utc) <= trial_end_aware if user.get('is_trial') and trial_end_aware
-                else user.get('is_subscribed') and subscription_end_aware and datetime.now(timezone.utc) <= subscription_end_aware
-            )
-        return render_template('admin/users.html', users=users, title=trans('admin_manage_users_title', default='Manage Users'))
+        page = load_user_page(db, request.args)
+        return render_template('admin/users.html', users=page['users'], page=page, title=trans('admin_manage_users_title', default='Manage Users'))
     except Exception as e:
         logger.error(f"Error fetching users for admin {current_user.id}: {str(e)}",
                      extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
         flash(trans('admin_database_error', default='An error occurred while accessing the database'), 'danger')
         return render_template('error/500.html'), 500
 
+@admin_bp.route('/users/bulk', methods=['POST'])
+@login_required
+@utils.requires_role('admin')
+@utils.limiter.limit("20 per hour")
+def bulk_user_action():
+    """Suspend or reactivate the selected users in one update."""
+    action = request.form.get('action')
+    user_ids = [user_id for user_id in selected_user_ids() if user_id != current_user.id]
+    if action not in ('suspend', 'unsuspend') or not user_ids:
+        flash(trans('admin_no_users_selected', default='Select at least one user and an action'), 'danger')
+        return redirect_to_user_list('admin.manage_users')
+    try:
+        db = utils.get_mongo_db()
+        if db is None:
+            raise Exception("Failed to connect to MongoDB")
+        result = db.users.update_many(
+            {'_id': {'$in': user_ids}},
+            {'$set': {'suspended': action == 'suspend', 'updated_at': datetime.now(timezone.utc)}}
+        )
+        flash(trans('admin_users_updated', default=f'Updated {result.modified_count} users'), 'success')
+        logger.info(f"Admin {current_user.id} applied {action} to {result.modified_count} users",
+                    extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
+        log_audit_action(f'bulk_{action}_users', {'user_ids': user_ids, 'modified_count': result.modified_count})
+        return redirect_to_user_list('admin.manage_users')
+    except Exception as e:
+        logger.error(f"Error applying bulk {action} for admin {current_user.id}: {str(e)}",
+                     extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
+        flash(trans('admin_database_error', default='An error occurred while accessing the database'), 'danger')
+        return render_template('error/500.html'), 500
+
 @admin_bp.route('/users/suspend/<user_id>', methods=['POST'])
 @login_required
 @utils.requires_role('admin')
@@ -182,32 +316,23 @@ def manage_users():
 def suspend_user(user_id):
     """Suspend a user account."""
     try:
-        ObjectId(user_id)
         db = utils.get_mongo_db()
         if db is None:
             raise Exception("Failed to connect to MongoDB")
-        user_query = {'_id': ObjectId(user_id)}
-        user = db.users.find_one(user_query)
-        if user is None:
-            flash(trans('admin_user_not_found', default='User not found'), 'danger')
-            return redirect(url_for('admin.manage_users'))
         result = db.users.update_one(
-            user_query,
+            {'_id': user_id},
             {'$set': {'suspended': True, 'updated_at': datetime.now(timezone.utc)}}
         )
-        if result.modified_count == 0:
+        if result.matched_count == 0:
+            flash(trans('admin_user_not_found', default='User not found'), 'danger')
+        elif result.modified_count == 0:
             flash(trans('admin_user_not_updated', default='User could not be suspended'), 'danger')
         else:
             flash(trans('admin_user_suspended', default='User suspended successfully'), 'success')
             logger.info(f"Admin {current_user.id} suspended user {user_id}",
                         extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
             log_audit_action('suspend_user', {'user_id': user_id})
-        return redirect(url_for('admin.manage_users'))
-    except errors.InvalidId:
-        logger.error(f"Invalid user_id format: {user_id}",
-                     extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
-        flash(trans('admin_invalid_user_id', default='Invalid user ID'), 'danger')
-        return redirect(url_for('admin.manage_users'))
+        return redirect_to_user_list('admin.manage_users')
     except Exception as e:
         logger.error(f"Error suspending user {user_id}: {str(e)}",
                      extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
@@ -219,38 +344,26 @@ def suspend_user(user_id):
 @utils.requires_role('admin')
 @utils.limiter.limit("5 per hour")
 def delete_user(user_id):
-    """Delete a user and their data."""
+    """Hide a user and queue the background purge of their data."""
     try:
-        ObjectId(user_id)
         db = utils.get_mongo_db()
         if db is None:
             raise Exception("Failed to connect to MongoDB")
-        user_query = {'_id': ObjectId(user_id)}
-        user = db.users.find_one(user_query)
-        if user is None:
+        if user_id == current_user.id:
+            flash(trans('admin_cannot_delete_self', default='You cannot delete your own account'), 'danger')
+            return redirect_to_user_list('admin.manage_users')
+        job = request_user_deletion(db, user_id, current_user.id)
+        if job is None:
             flash(trans('admin_user_not_found', default='User not found'), 'danger')
-            return redirect(url_for('admin.manage_users'))
-        db.records.delete_many({'user_id': user_id})
-        db.cashflows.delete_many({'user_id': user_id})
-        db.debtors.delete_many({'user_id': user_id})
-        db.creditors.delete_many({'user_id': user_id})
-        db.funds.delete_many({'user_id': user_id})
-        db.feedback.delete_many({'user_id': user_id})
-        db.audit_logs.delete_many({'details.user_id': user_id})
-        result = db.users.delete_one(user_query)
-        if result.deleted_count == 0:
-            flash(trans('admin_user_not_deleted', default='User could not be deleted'), 'danger')
         else:
-            flash(trans('admin_user_deleted', default='User deleted successfully'), 'success')
-            logger.info(f"Admin {current_user.id} deleted user {user_id}",
+            flash(trans('admin_user_deletion_queued', default='User deletion started. Their data is being removed in the background.'), 'success')
+            logger.info(f"Admin {current_user.id} queued deletion of user {user_id}",
                         extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
-            log_audit_action('delete_user', {'user_id': user_id})
-        return redirect(url_for('admin.manage_users'))
-    except errors.InvalidId:
-        logger.error(f"Invalid user_id format: {user_id}",
-                     extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
-        flash(trans('admin_invalid_user_id', default='Invalid user ID'), 'danger')
-        return redirect(url_for('admin.manage_users'))
+            # Not details.user_id: the purge removes audit entries keyed on the deleted user
+            log_audit_action('delete_user', {'deleted_user_id': user_id})
+            # The cached all-user reports still count the user's data
+            expire_cached_reports(db)
+        return redirect_to_user_list('admin.manage_users')
     except Exception as e:
         logger.error(f"Error deleting user {user_id}: {str(e)}",
                      extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
@@ -272,10 +385,13 @@ def delete_item(collection, item_id):
         db = utils.get_mongo_db()
         if db is None:
             raise Exception("Failed to connect to MongoDB")
-        result = db[collection].delete_one({'_id': ObjectId(item_id)})
-        if result.deleted_count == 0:
+        deleted = db[collection].find_one_and_delete({'_id': ObjectId(item_id)}, projection={'user_id': 1, 'created_at': 1})
+        if deleted is None:
             flash(trans('admin_item_not_found', default='Item not found'), 'danger')
         else:
+            if collection in ('records', 'cashflows') and deleted.get('user_id'):
+                create_tombstone(db, collection, item_id, deleted['user_id'])
+                invalidate_months(db, deleted['user_id'], deleted.get('created_at'))
             flash(trans('admin_item_deleted', default='Item deleted successfully'), 'success')
             logger.info(f"Admin {current_user.id} deleted {collection} item {item_id}",
                         extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
@@ -297,53 +413,39 @@ def delete_item(collection, item_id):
 @utils.requires_role('admin')
 @utils.limiter.limit("50 per hour")
 def manage_user_roles():
-    """Manage user roles: list all users and update their roles."""
+    """Manage user roles: list users page by page and update the selected users' role."""
     try:
         db = utils.get_mongo_db()
         if db is None:
             raise Exception("Failed to connect to MongoDB")
-        users = list(db.users.find())
         form = RoleForm()
         if request.method == 'POST' and form.validate_on_submit():
-            user_id = request.form.get('user_id')
+            user_ids = selected_user_ids()
+            if not user_ids:
+                flash(trans('admin_no_users_selected', default='Select at least one user'), 'danger')
+                return redirect_to_user_list('admin.manage_user_roles')
             try:
-                ObjectId(user_id)
-                user = db.users.find_one({'_id': ObjectId(user_id)})
-                if user is None:
-                    flash(trans('user_not_found', default='User not found'), 'danger')
-                    return redirect(url_for('admin.manage_user_roles'))
                 new_role = form.role.data
-                db.users.update_one(
-                    {'_id': ObjectId(user_id)},
+                result = db.users.update_many(
+                    {'_id': {'$in': user_ids}},
                     {'$set': {'role': new_role, 'updated_at': datetime.now(timezone.utc)}}
                 )
-                logger.info(f"User role updated: id={user_id}, new_role={new_role}, admin={current_user.id}",
+                if result.matched_count == 0:
+                    flash(trans('user_not_found', default='User not found'), 'danger')
+                    return redirect_to_user_list('admin.manage_user_roles')
+                logger.info(f"User role updated: ids={user_ids}, new_role={new_role}, admin={current_user.id}",
                             extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
-                log_audit_action('update_user_role', {'user_id': user_id, 'new_role': new_role})
+                log_audit_action('update_user_role', {'user_ids': user_ids, 'new_role': new_role})
                 flash(trans('user_role_updated', default='User role updated successfully'), 'success')
-                return redirect(url_for('admin.manage_user_roles'))
-            except errors.InvalidId:
-                logger.error(f"Invalid user_id format: {user_id}",
-                             extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
-                flash(trans('admin_invalid_user_id', default='Invalid user ID'), 'danger')
-                return redirect(url_for('admin.manage_user_roles'))
+                return redirect_to_user_list('admin.manage_user_roles')
             except Exception as e:
-                logger.error(f"Error updating user role {user_id}: {str(e)}",
+                logger.error(f"Error updating user roles {user_ids}: {str(e)}",
                              extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
                 flash(trans('admin_database_error', default='An error occurred while accessing the database'), 'danger')
-                return render_template('admin/user_roles.html', form=form, users=users, title=trans('admin_manage_user_roles_title', default='Manage User Roles'))
-        
-        for user in users:
-            user['_id'] = str(user['_id'])
-            trial_end = user.get('trial_end')
-            subscription_end = user.get('subscription_end')
-            trial_end_aware = trial_end.replace(tzinfo=ZoneInfo("UTC")) if trial_end and trial_end.tzinfo is None else trial_end
-            subscription_end_aware = subscription_end.replace(tzinfo=ZoneInfo("UTC")) if subscription_end and subscription_end.tzinfo is None else subscription_end
-            user['is_trial_active'] = (
-                datetime.now(timezone.utc) <= trial_end_aware if user.get('is_trial') and trial_end_aware
-                else user.get('is_subscribed') and subscription_end_aware and datetime.now(timezone.utc) <= subscription_end_aware
-            )
-        return render_template('admin/user_roles.html', form=form, users=users, title=trans('admin_manage_user_roles_title', default='Manage User Roles'))
+                return redirect_to_user_list('admin.manage_user_roles')
+
+        page = load_user_page(db, request.args)
+        return render_template('admin/user_roles.html', form=form, users=page['users'], page=page, title=trans('admin_manage_user_roles_title', default='Manage User Roles'))
     except Exception as e:
         logger.error(f"Error in manage_user_roles for admin {current_user.id}: {str(e)}",
                      extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
@@ -355,68 +457,54 @@ def manage_user_roles():
 @utils.requires_role('admin')
 @utils.limiter.limit("50 per hour")
 def manage_user_subscriptions():
-    """Manage user subscriptions: list all users and update their subscription status."""
+    """Manage user subscriptions: list users page by page and update the selected users' subscription."""
     try:
         db = utils.get_mongo_db()
         if db is None:
             raise Exception("Failed to connect to MongoDB")
-        users = list(db.users.find())
         form = SubscriptionForm()
         if request.method == 'POST' and form.validate_on_submit():
-            user_id = request.form.get('user_id')
+            user_ids = selected_user_ids()
+            if not user_ids:
+                flash(trans('admin_no_users_selected', default='Select at least one user'), 'danger')
+                return redirect_to_user_list('admin.manage_user_subscriptions')
             try:
-                ObjectId(user_id)
-                user = db.users.find_one({'_id': ObjectId(user_id)})
-                if user is None:
-                    flash(trans('user_not_found', default='User not found'), 'danger')
-                    return redirect(url_for('admin.manage_user_subscriptions'))
                 plan_durations = {'monthly': 30, 'yearly': 365}
                 update_data = {
                     'is_subscribed': form.is_subscribed.data == 'True',
                     'subscription_plan': form.subscription_plan.data or None,
                     'subscription_start': datetime.now(timezone.utc) if form.is_subscribed.data == 'True' else None,
-                    'subscription_end': form.subscription_end.data if form.subscription_end.data else None,
+                    'subscription_end': end_of_day(form.subscription_end.data),
                     'updated_at': datetime.now(timezone.utc)
                 }
                 if form.is_subscribed.data == 'True' and not form.subscription_end.data and form.subscription_plan.data:
                     duration = plan_durations.get(form.subscription_plan.data, 30)
                     update_data['subscription_end'] = datetime.now(timezone.utc) + timedelta(days=duration)
-                db.users.update_one(
-                    {'_id': ObjectId(user_id)},
+                result = db.users.update_many(
+                    {'_id': {'$in': user_ids}},
                     {'$set': update_data}
                 )
-                logger.info(f"User subscription updated: id={user_id}, subscribed={update_data['is_subscribed']}, plan={update_data['subscription_plan']}, admin={current_user.id}",
+                if result.matched_count == 0:
+                    flash(trans('user_not_found', default='User not found'), 'danger')
+                    return redirect_to_user_list('admin.manage_user_subscriptions')
+                logger.info(f"User subscription updated: ids={user_ids}, subscribed={update_data['is_subscribed']}, plan={update_data['subscription_plan']}, admin={current_user.id}",
                             extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
                 log_audit_action('update_user_subscription', {
-                    'user_id': user_id,
+                    'user_ids': user_ids,
                     'is_subscribed': update_data['is_subscribed'],
                     'subscription_plan': update_data['subscription_plan'],
                     'subscription_end': update_data['subscription_end'].strftime('%Y-%m-%d') if update_data['subscription_end'] else None
                 })
                 flash(trans('subscription_updated', default='User subscription updated successfully'), 'success')
-                return redirect(url_for('admin.manage_user_subscriptions'))
-            except errors.InvalidId:
-                logger.error(f"Invalid user_id format: {user_id}",
-                             extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
-                flash(trans('admin_invalid_user_id', default='Invalid user ID'), 'danger')
-                return redirect(url_for('admin.manage_user_subscriptions'))
+                return redirect_to_user_list('admin.manage_user_subscriptions')
             except Exception as e:
-                logger.error(f"Error updating user subscription {user_id}: {str(e)}",
+                logger.error(f"Error updating user subscriptions {user_ids}: {str(e)}",
                              extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
                 flash(trans('admin_database_error', default='An error occurred while accessing the database'), 'danger')
-                return render_template('admin/user_subscriptions.html', form=form, users=users, title=trans('admin_manage_user_subscriptions_title', default='Manage User Subscriptions'))
-        
-        for user in users:
-            user['_id'] = str(user['_id'])
-            trial_end = user.get('trial_end')
-            subscription_end = user.get('subscription_end')
-            trial_end_aware = trial_end.replace(tzinfo=ZoneInfo("UTC")) if trial_end and trial_end.tzinfo is None else trial_end
-            subscription_end_aware = subscription_end.replace(tzinfo=ZoneInfo("UTC")) if subscription_end and subscription_end.tzinfo is None else subscription_end
-            user['is_trial_active'] = (
-                datetime.now(timezone.utc) <= trial_end_aware if user.get('is_trial') and trial_end_aware
-                else user.get('is_subscribed') and subscription_end_aware and datetime.now(timezone.utc) <= subscription_end_aware
-            )
-        return render_template('admin/user_subscriptions.html', form=form, users=users, title=trans('admin_manage_user_subscriptions_title', default='Manage User Subscriptions'))
+                return redirect_to_user_list('admin.manage_user_subscriptions')
+
+        page = load_user_page(db, request.args)
+        return render_template('admin/user_subscriptions.html', form=form, users=page['users'], page=page, title=trans('admin_manage_user_subscriptions_title', default='Manage User Subscriptions'))
     except Exception as e:
         logger.error(f"Error in manage_user_subscriptions for admin {current_user.id}: {str(e)}",
                      extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
@@ -433,21 +521,21 @@ def manage_receipts():
         db = utils.get_mongo_db()
         if db is None:
             raise Exception("Failed to connect to MongoDB")
-        
-        # Get all payment receipts with user information
-        receipts = list(db.payment_receipts.find().sort('uploaded_at', -1))
-        
-        # Enrich receipts with user information
+        page, per_page, status = page_args(request.args, RECEIPT_STATUSES)
+        query = {'status': status} if status else {}
+        receipts_page = paginate_query(db.payment_receipts, query, [('uploaded_at', -1)], page, per_page)
+        receipts = attach_users(db, receipts_page['items'])
         for receipt in receipts:
             receipt['_id'] = str(receipt['_id'])
-            user = db.users.find_one({'_id': receipt['user_id']})
+            user = receipt.pop('user')
             receipt['user_email'] = user.get('email', 'Unknown') if user else 'Unknown'
             receipt['user_display_name'] = user.get('display_name', receipt['user_id']) if user else receipt['user_id']
-        
+        receipts_page['filters'] = {'status': status} if status else {}
+
         logger.info(f"Admin {current_user.id} accessed receipts management",
                     extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
         
-        return render_template('admin/receipts.html', receipts=receipts, 
+        return render_template('admin/receipts.html', receipts=receipts, page=receipts_page,
                              title=trans('admin_manage_receipts_title', default='Manage Payment Receipts'))
     except Exception as e:
         logger.error(f"Error fetching receipts for admin {current_user.id}: {str(e)}",
@@ -455,6 +543,53 @@ def manage_receipts():
         flash(trans('admin_database_error', default='An error occurred while accessing the database'), 'danger')
         return render_template('error/500.html'), 500
 
+def send_blob(key):
+    """
+    Stream a stored blob; blobs are content-addressed, so the key doubles as the ETag.
+
+    These are ID photos and payment receipts, so shared caches must never keep them.
+    """
+    blob, stream = blob_storage.open(key)
+    if blob is None:
+        return render_template('error/404.html'), 404
+    response = send_file(
+        stream,
+        mimetype=blob['content_type'],
+        download_name=blob.get('filename') or key,
+        etag=key
+    )
+    response.headers['Cache-Control'] = 'private, no-store'
+    return response
+
+@admin_bp.route('/blobs/<key>', methods=['GET'])
+@login_required
+@utils.requires_role('admin')
+@utils.limiter.limit("300 per hour")
+def view_blob(key):
+    """Serve an uploaded document (KYC ID photo or payment receipt) for review."""
+    try:
+        return send_blob(key)
+    except Exception as e:
+        logger.error(f"Error serving blob {key} for admin {current_user.id}: {str(e)}",
+                     extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
+        return render_template('error/500.html'), 500
+
+@admin_bp.route('/blobs/<key>/thumbnail', methods=['GET'])
+@login_required
+@utils.requires_role('admin')
+@utils.limiter.limit("1000 per hour")
+def blob_thumbnail(key):
+    """Serve a thumbnail of an uploaded image, generating it on first request."""
+    try:
+        thumb_key = blob_storage.thumbnail(key, request.args.get('size', 256, type=int))
+        if thumb_key is None:
+            return render_template('error/404.html'), 404
+        return send_blob(thumb_key)
+    except Exception as e:
+        logger.error(f"Error generating thumbnail for blob {key} for admin {current_user.id}: {str(e)}",
+                     extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
+        return render_template('error/500.html'), 500
+
 @admin_bp.route('/receipts/approve/<receipt_id>', methods=['POST'])
 @login_required
 @utils.requires_role('admin')
@@ -568,63 +703,90 @@ def reject_receipt(receipt_id):
 @utils.requires_role('admin')
 @utils.limiter.limit("50 per hour")
 def manage_user_trials():
-    """Manage user trials: list all users and update their trial status, including bulk updates."""
+    """Manage user trials: list users page by page and update trials for selected users or whole registration cohorts."""
     try:
         db = utils.get_mongo_db()
         if db is None:
             raise Exception("Failed to connect to MongoDB")
-        users = list(db.users.find())
         form = TrialForm()
         if request.method == 'POST' and form.validate_on_submit():
-            # Handle individual trial update
-            user_id = request.form.get('user_id')
-            if user_id:
+            action = request.form.get('action', 'update')
+            user_ids = selected_user_ids()
+
+            # Set trial status for the selected users
+            if action == 'update':
+                if not user_ids:
+                    flash(trans('admin_no_users_selected', default='Select at least one user'), 'danger')
+                    return redirect_to_user_list('admin.manage_user_trials')
                 try:
-                    ObjectId(user_id)
-                    user = db.users.find_one({'_id': ObjectId(user_id)})
-                    if user is None:
-                        flash(trans('user_not_found', default='User not found'), 'danger')
-                        return redirect(url_for('admin.manage_user_trials'))
                     update_data = {
                         'is_trial': form.is_trial.data == 'True',
-                        'trial_end': form.trial_end.data if form.trial_end.data else None,
+                        'trial_end': end_of_day(form.trial_end.data),
                         'updated_at': datetime.now(timezone.utc)
                     }
                     if form.is_trial.data == 'True' and not form.trial_end.data:
                         update_data['trial_end'] = datetime.now(timezone.utc) + timedelta(days=30)
-                    db.users.update_one(
-                        {'_id': ObjectId(user_id)},
+                    result = db.users.update_many(
+                        {'_id': {'$in': user_ids}},
                         {'$set': update_data}
                     )
-                    logger.info(f"User trial updated: id={user_id}, is_trial={update_data['is_trial']}, trial_end={update_data['trial_end']}, admin={current_user.id}",
+                    if result.matched_count == 0:
+                        flash(trans('user_not_found', default='User not found'), 'danger')
+                        return redirect_to_user_list('admin.manage_user_trials')
+                    logger.info(f"User trial updated: ids={user_ids}, is_trial={update_data['is_trial']}, trial_end={update_data['trial_end']}, admin={current_user.id}",
                                 extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
                     log_audit_action('update_user_trial', {
-                        'user_id': user_id,
+                        'user_ids': user_ids,
                         'is_trial': update_data['is_trial'],
                         'trial_end': update_data['trial_end'].strftime('%Y-%m-%d') if update_data['trial_end'] else None
                     })
                     flash(trans('trial_updated', default='User trial updated successfully'), 'success')
-                    return redirect(url_for('admin.manage_user_trials'))
-                except errors.InvalidId:
-                    logger.error(f"Invalid user_id format: {user_id}",
+                    return redirect_to_user_list('admin.manage_user_trials')
+                except Exception as e:
+                    logger.error(f"Error updating user trials {user_ids}: {str(e)}",
                                  extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
-                    flash(trans('admin_invalid_user_id', default='Invalid user ID'), 'danger')
-                    return redirect(url_for('admin.manage_user_trials'))
+                    flash(trans('admin_database_error', default='An error occurred while accessing the database'), 'danger')
+                    return redirect_to_user_list('admin.manage_user_trials')
+
+            # Extend each selected user's trial from its own end date
+            if action == 'extend':
+                if not user_ids or not form.bulk_trial_days.data:
+                    flash(trans('admin_no_users_selected', default='Select at least one user and a number of days'), 'danger')
+                    return redirect_to_user_list('admin.manage_user_trials')
+                try:
+                    days = int(form.bulk_trial_days.data)
+                    now = datetime.now(timezone.utc)
+                    requests_batch = []
+                    for user in db.users.find({'_id': {'$in': user_ids}}, {'trial_end': 1}):
+                        trial_end = user.get('trial_end')
+                        if trial_end and trial_end.tzinfo is None:
+                            trial_end = trial_end.replace(tzinfo=ZoneInfo("UTC"))
+                        base = trial_end if trial_end and trial_end > now else now
+                        requests_batch.append(UpdateOne(
+                            {'_id': user['_id']},
+                            {'$set': {'is_trial': True, 'trial_end': base + timedelta(days=days), 'updated_at': now}}
+                        ))
+                    updated_count = db.users.bulk_write(requests_batch, ordered=False).modified_count if requests_batch else 0
+                    logger.info(f"Trial extension: {updated_count} users extended by {days} days, admin={current_user.id}",
+                                extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
+                    log_audit_action('extend_user_trials', {'user_ids': user_ids, 'trial_days': days, 'updated_count': updated_count})
+                    flash(trans('bulk_trial_updated', default=f'Successfully updated trial for {updated_count} users'), 'success')
+                    return redirect_to_user_list('admin.manage_user_trials')
                 except Exception as e:
-                    logger.error(f"Error updating user trial {user_id}: {str(e)}",
+                    logger.error(f"Error extending user trials {user_ids}: {str(e)}",
                                  extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
                     flash(trans('admin_database_error', default='An error occurred while accessing the database'), 'danger')
-                    return render_template('admin/user_trials.html', form=form, users=users, title=trans('admin_manage_user_trials_title', default='Manage User Trials'))
-            
-            # Handle bulk trial update
-            if form.bulk_trial_days.data and form.bulk_trial_start.data and form.bulk_trial_end.data:
+                    return redirect_to_user_list('admin.manage_user_trials')
+
+            # Handle bulk trial update by registration date
+            if action == 'registration' and form.bulk_trial_days.data and form.bulk_trial_start.data and form.bulk_trial_end.data:
                 try:
                     days = int(form.bulk_trial_days.data)
                     start_date = form.bulk_trial_start.data
                     end_date = form.bulk_trial_end.data
                     if start_date > end_date:
                         flash(trans('admin_invalid_date_range', default='Start date must be before end date'), 'danger')
-                        return redirect(url_for('admin.manage_user_trials'))
+                        return redirect_to_user_list('admin.manage_user_trials')
                     start_date_aware = datetime.combine(start_date, datetime.min.time(), tzinfo=ZoneInfo("UTC"))
                     end_date_aware = datetime.combine(end_date, datetime.max.time(), tzinfo=ZoneInfo("UTC"))
                     trial_end = datetime.now(timezone.utc) + timedelta(days=days)
@@ -649,24 +811,15 @@ def manage_user_trials():
                         'trial_end': trial_end.strftime('%Y-%m-%d')
                     })
                     flash(trans('bulk_trial_updated', default=f'Successfully updated trial for {updated_count} users'), 'success')
-                    return redirect(url_for('admin.manage_user_trials'))
+                    return redirect_to_user_list('admin.manage_user_trials')
                 except Exception as e:
                     logger.error(f"Error in bulk trial update: {str(e)}",
                                  extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
                     flash(trans('admin_database_error', default='An error occurred while accessing the database'), 'danger')
-                    return render_template('admin/user_trials.html', form=form, users=users, title=trans('admin_manage_user_trials_title', default='Manage User Trials'))
-        
-        for user in users:
-            user['_id'] = str(user['_id'])
-            trial_end = user.get('trial_end')
-            subscription_end = user.get('subscription_end')
-            trial_end_aware = trial_end.replace(tzinfo=ZoneInfo("UTC")) if trial_end and trial_end.tzinfo is None else trial_end
-            subscription_end_aware = subscription_end.replace(tzinfo=ZoneInfo("UTC")) if subscription_end and subscription_end.tzinfo is None else subscription_end
-            user['is_trial_active'] = (
-                datetime.now(timezone.utc) <= trial_end_aware if user.get('is_trial') and trial_end_aware
-                else user.get('is_subscribed') and subscription_end_aware and datetime.now(timezone.utc) <= subscription_end_aware
-            )
-        return render_template('admin/user_trials.html', form=form, users=users, title=trans('admin_manage_user_trials_title', default='Manage User Trials'))
+                    return redirect_to_user_list('admin.manage_user_trials')
+
+        page = load_user_page(db, request.args)
+        return render_template('admin/user_trials.html', form=form, users=page['users'], page=page, title=trans('admin_manage_user_trials_title', default='Manage User Trials'))
     except Exception as e:
         logger.error(f"Error in manage_user_trials for admin {current_user.id}: {str(e)}",
                      extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
@@ -678,21 +831,164 @@ def manage_user_trials():
 @utils.requires_role('admin')
 @utils.limiter.limit("50 per hour")
 def audit():
-    """View audit logs of admin actions."""
+    """Explore audit logs with filters and keyset pagination."""
     try:
         db = utils.get_mongo_db()
         if db is None:
             raise Exception("Failed to connect to MongoDB")
-        logs = list(db.audit_logs.find().sort('timestamp', -1).limit(100))
-        for log in logs:
+        page = find_audit_page(db, request.args)
+        for log in page['logs']:
             log['_id'] = str(log['_id'])
-        return render_template('admin/audit.html', logs=logs, title=trans('admin_audit_title', default='Audit Logs'))
+        return render_template('admin/audit.html', logs=page['logs'], page=page, archive_collections=list(RETENTION_POLICIES), title=trans('admin_audit_title', default='Audit Logs'))
     except Exception as e:
         logger.error(f"Error fetching audit logs for admin {current_user.id}: {str(e)}",
                      extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
         flash(trans('admin_database_error', default='An error occurred while accessing the database'), 'danger')
         return render_template('error/500.html'), 500
 
+@admin_bp.route('/api/audit', methods=['GET'])
+@login_required
+@utils.requires_role('admin')
+@utils.limiter.limit("300 per hour")
+def audit_api():
+    """Audit log query API: same filters and cursors as the explorer, as JSON."""
+    try:
+        db = utils.get_mongo_db()
+        if db is None:
+            raise Exception("Failed to connect to MongoDB")
+        try:
+            page_size = min(max(int(request.args.get('limit', AUDIT_PAGE_SIZE)), 1), AUDIT_MAX_PAGE_SIZE)
+        except ValueError:
+            page_size = AUDIT_PAGE_SIZE
+        page = find_audit_page(db, request.args, page_size)
+        return jsonify({
+            'logs': [serialize_audit_log(log) for log in page['logs']],
+            'filters': page['filters'],
+            'older': page['older'],
+            'newer': page['newer']
+        })
+    except Exception as e:
+        logger.error(f"Error querying audit logs for admin {current_user.id}: {str(e)}",
+                     extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
+        return jsonify({'error': trans('admin_database_error', default='An error occurred while accessing the database')}), 500
+
+@admin_bp.route('/audit/export', methods=['GET'])
+@login_required
+@utils.requires_role('admin')
+@utils.limiter.limit("10 per hour")
+@heavy_endpoint()
+def export_audit():
+    """Stream every audit log matching the current filters as CSV; the admission slot is held until the stream closes."""
+    try:
+        db = utils.get_mongo_db()
+        if db is None:
+            raise Exception("Failed to connect to MongoDB")
+        log_audit_action('export_audit_logs', {'filters': build_audit_query(request.args)[1]})
+        filename = f"audit_logs_{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}.csv"
+        return Response(
+            stream_with_context(iter_audit_csv(db, request.args)),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment;filename={filename}'}
+        )
+    except Exception as e:
+        logger.error(f"Error exporting audit logs for admin {current_user.id}: {str(e)}",
+                     extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
+        flash(trans('admin_database_error', default='An error occurred while accessing the database'), 'danger')
+        return redirect(url_for('admin.audit', **request.args.to_dict()))
+
+@admin_bp.route('/api/archive/<collection>', methods=['GET'])
+@login_required
+@utils.requires_role('admin')
+@utils.limiter.limit("100 per hour")
+@heavy_endpoint()
+def archive_api(collection):
+    """Read archived rows of a log collection for a day range without restoring them."""
+    if collection not in RETENTION_POLICIES:
+        return jsonify({'error': trans('admin_invalid_collection', default='Invalid collection')}), 404
+    day_range = parse_day_range(request.args)
+    if day_range is None:
+        return jsonify({'error': trans('admin_invalid_date_range', default='start_date and end_date (YYYY-MM-DD) are required')}), 400
+    try:
+        db = utils.get_mongo_db()
+        if db is None:
+            raise Exception("Failed to connect to MongoDB")
+        try:
+            limit = min(max(int(request.args.get('limit', AUDIT_PAGE_SIZE)), 1), AUDIT_MAX_PAGE_SIZE)
+        except ValueError:
+            limit = AUDIT_PAGE_SIZE
+        user_id = (request.args.get('user_id') or '').strip().lower()
+        rows = read_archive(db, retention_engine.archive_stores, collection, *day_range,
+                            match={'user_id': user_id} if user_id else None, limit=limit)
+        return Response(
+            json_util.dumps({'collection': collection, 'rows': list(rows)}, json_options=json_util.RELAXED_JSON_OPTIONS),
+            mimetype='application/json'
+        )
+    except Exception as e:
+        logger.error(f"Error reading {collection} archive for admin {current_user.id}: {str(e)}",
+                     extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
+        return jsonify({'error': trans('admin_database_error', default='An error occurred while accessing the database')}), 500
+
+@admin_bp.route('/archive/restore', methods=['POST'])
+@login_required
+@utils.requires_role('admin')
+@utils.limiter.limit("10 per hour")
+@heavy_endpoint()
+def restore_archive():
+    """Move an archived day range of a log collection back into the live collection."""
+    collection = request.form.get('collection')
+    day_range = parse_day_range(request.form)
+    if collection not in RETENTION_POLICIES or day_range is None:
+        flash(trans('admin_invalid_restore', default='Choose a log collection and a valid date range to restore'), 'danger')
+        return redirect(url_for('admin.audit'))
+    try:
+        db = utils.get_mongo_db()
+        if db is None:
+            raise Exception("Failed to connect to MongoDB")
+        restored = restore_range(db, retention_engine.archive_stores, collection, *day_range)
+        log_audit_action('restore_archive', {
+            'collection': collection,
+            'start_date': day_range[0].isoformat(),
+            'end_date': day_range[1].isoformat(),
+            'restored': restored
+        })
+        flash(trans('admin_archive_restored', default='Restored {count} archived rows').format(count=restored), 'success')
+        return redirect(url_for('admin.audit', start_date=day_range[0].isoformat(), end_date=day_range[1].isoformat()) if collection == 'audit_logs' else url_for('admin.audit'))
+    except Exception as e:
+        logger.error(f"Error restoring {collection} archive for admin {current_user.id}: {str(e)}",
+                     extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
+        flash(trans('admin_database_error', default='An error occurred while accessing the database'), 'danger')
+        return redirect(url_for('admin.audit'))
+
+USAGE_WINDOWS = (1, 2, 7, 30, 90)
+
+@admin_bp.route('/analytics/usage', methods=['GET'])
+@login_required
+@utils.requires_role('admin')
+@utils.limiter.limit("100 per hour")
+def usage_analytics():
+    """Tool usage by time, tool and role, read from the pre-aggregated buckets."""
+    try:
+        db = utils.get_mongo_db()
+        if db is None:
+            raise Exception("Failed to connect to MongoDB")
+        days = request.args.get('days', 7, type=int)
+        if days not in USAGE_WINDOWS:
+            days = 7
+        summary = usage_summary(db, days)
+        return render_template(
+            'admin/usage_analytics.html',
+            summary=summary,
+            days=days,
+            windows=USAGE_WINDOWS,
+            max_count=max((count for _, count in summary['series']), default=0),
+            title=trans('admin_usage_analytics', default='Tool Usage Analytics')
+        )
+    except Exception as e:
+        logger.error(f"Error loading usage analytics for admin {current_user.id}: {str(e)}",
+                     extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
+        flash(trans('admin_database_error', default='An error occurred while accessing the database'), 'danger')
+        return render_template('error/500.html'), 500
+
 @admin_bp.route('/feedback', methods=['GET', 'POST'])
 @login_required
 @utils.requires_role('admin')
@@ -896,10 +1192,9 @@ def manage_kyc():
         db = utils.get_mongo_db()
         if db is None:
             raise Exception("Failed to connect to MongoDB")
-        kyc_records = list(db.kyc_records.find().sort('created_at', -1))
-        for record in kyc_records:
-            record['_id'] = str(record['_id'])
-        return render_template('kyc/admin.html', kyc_records=kyc_records, title=trans('admin_kyc_title', default='Manage KYC Submissions'))
+        page, per_page, status = page_args(request.args, KYC_STATUSES)
+        kyc_page = get_kyc_records_page(db, status, page, per_page)
+        return render_template('kyc/admin.html', kyc_records=kyc_page['items'], page=kyc_page, title=trans('admin_kyc_title', default='Manage KYC Submissions'))
     except Exception as e:
         logger.error(f"Error fetching KYC records for admin {current_user.id}: {str(e)}",
                      extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
@@ -910,6 +1205,7 @@ def manage_kyc():
 @login_required
 @utils.requires_role('admin')
 @utils.limiter.limit("50 per hour")
+@heavy_endpoint(is_export_request)
 def customer_reports():
     """Generate customer reports in HTML, PDF, or CSV format."""
     try:
@@ -917,7 +1213,7 @@ def customer_reports():
         if db is None:
             raise Exception("Failed to connect to MongoDB")
         format = request.args.get('format', 'html')
-        users = list(db.users.find())
+        users = list(db.users.find({'deletion_pending': {'$ne': True}}))
         for user in users:
             user['_id'] = str(user['_id'])
             trial_end = user.get('trial_end')
@@ -945,6 +1241,7 @@ def customer_reports():
 @login_required
 @utils.requires_role('admin')
 @utils.limiter.limit("50 per hour")
+@heavy_endpoint(is_export_request)
 def investor_reports():
     """Generate investor reports summarizing financial health."""
     try:
@@ -952,24 +1249,19 @@ def investor_reports():
         if db is None:
             raise Exception("Failed to connect to MongoDB")
         format = request.args.get('format', 'html')
-        funds = list(db.funds.find())
-        total_funds = sum(fund['amount'] for fund in funds) if funds else 0
-        debtors = list(db.debtors.find())
-        total_debtors = sum(debtor['amount'] for debtor in debtors) if debtors else 0
-        creditors = list(db.creditors.find())
-        total_creditors = sum(creditor['amount'] for creditor in creditors) if creditors else 0
-        report_data = {
-            'total_funds': utils.format_currency(total_funds),
-            'total_debtors': utils.format_currency(total_debtors),
-            'total_creditors': utils.format_currency(total_creditors),
-            'net_position': utils.format_currency(total_funds - total_creditors)
-        }
+        report_data, refreshed_at = get_investor_summary(db, refresh=request.args.get('refresh') == '1')
         if format == 'pdf':
             return generate_investor_report_pdf(report_data)
         elif format == 'csv':
             return generate_investor_report_csv(report_data)
         
-        return render_template('admin/investor_reports.html', report_data=report_data, title=trans('admin_investor_reports_title', default='Investor Reports'))
+        return render_template(
+            'admin/investor_reports.html',
+            report_data=report_data,
+            report_rows=investor_report_rows(report_data),
+            refreshed_at=refreshed_at,
+            title=trans('admin_investor_reports_title', default='Investor Reports')
+        )
     except Exception as e:
         logger.error(f"Error in investor_reports for admin {current_user.id}: {str(e)}",
                      extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
@@ -1148,6 +1440,19 @@ def generate_customer_report_csv(users):
         flash(trans('admin_report_error', default='An error occurred while generating the report'), 'danger')
         return render_template('error/500.html'), 500
 
+def investor_report_rows(report_data):
+    """Label/value pairs shared by the investor report page and its exports."""
+    return [
+        (trans('fund_total', default='Total Funds'), utils.format_currency(report_data['total_funds'])),
+        (trans('debtor_total', default='Total Debtors'), utils.format_currency(report_data['total_debtors'])),
+        (trans('creditor_total', default='Total Creditors'), utils.format_currency(report_data['total_creditors'])),
+        (trans('net_position', default='Net Position'), utils.format_currency(report_data['net_position'])),
+        (trans('admin_total_receipts', default='Total Money In'), utils.format_currency(report_data['total_receipts'])),
+        (trans('admin_total_payments', default='Total Money Out'), utils.format_currency(report_data['total_payments'])),
+        (trans('admin_net_cashflow', default='Net Cash Flow'), utils.format_currency(report_data['net_cashflow'])),
+        (trans('admin_net_cashflow_30_days', default='Net Cash Flow (last 30 days)'), utils.format_currency(report_data['net_cashflow_trailing']))
+    ]
+
 def generate_investor_report_pdf(report_data):
     """Generate a PDF report for investors."""
     try:
@@ -1157,21 +1462,14 @@ def generate_investor_report_pdf(report_data):
         p.drawString(1 * inch, 10.5 * inch, trans('admin_investor_report_title', default='Investor Report'))
         p.drawString(1 * inch, 10.2 * inch, f"{trans('admin_generated_on', default='Generated on')}: {datetime.now(timezone.utc).strftime('%Y-%m-%d')}")
         y = 9.5 * inch
-        p.drawString(1 * inch, y, trans('fund_total', default='Total Funds'))
-        p.drawString(3 * inch, y, report_data['total_funds'])
-        y -= 0.3 * inch
-        p.drawString(1 * inch, y, trans('debtor_total', default='Total Debtors'))
-        p.drawString(3 * inch, y, report_data['total_debtors'])
-        y -= 0.3 * inch
-        p.drawString(1 * inch, y, trans('creditor_total', default='Total Creditors'))
-        p.drawString(3 * inch, y, report_data['total_creditors'])
-        y -= 0.3 * inch
-        p.drawString(1 * inch, y, trans('net_position', default='Net Position'))
-        p.drawString(3 * inch, y, report_data['net_position'])
+        for label, value in investor_report_rows(report_data):
+            p.drawString(1 * inch, y, label)
+            p.drawString(4 * inch, y, value)
+            y -= 0.3 * inch
         p.showPage()
         p.save()
         buffer.seek(0)
-        return Response(buffer, mimetype='application/pdf', headers={'Content-Disposition': 'attachment;filename=investor_report.pdf'})
+        return send_file(buffer, mimetype='application/pdf', as_attachment=True, download_name='investor_report.pdf')
     except Exception as e:
         logger.error(f"Error generating investor report PDF: {str(e)}",
                      extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
@@ -1179,19 +1477,21 @@ def generate_investor_report_pdf(report_data):
         return render_template('error/500.html'), 500
 
 def generate_investor_report_csv(report_data):
-    """Generate a CSV report for investors."""
+    """Generate a CSV report for investors, streamed row by row."""
     try:
-        output = [
-            [trans('fund_total', default='Total Funds'), report_data['total_funds']],
-            [trans('debtor_total', default='Total Debtors'), report_data['total_debtors']],
-            [trans('creditor_total', default='Total Creditors'), report_data['total_creditors']],
-            [trans('net_position', default='Net Position'), report_data['net_position']]
-        ]
-        buffer = BytesIO()
-        writer = csv.writer(buffer, lineterminator='\n')
-        writer.writerows(output)
-        buffer.seek(0)
-        return Response(buffer, mimetype='text/csv', headers={'Content-Disposition': 'attachment;filename=investor_report.csv'})
+        rows = [[trans('report_metric', default='Metric'), trans('report_value', default='Value')]]
+        rows.extend([label, value] for label, value in investor_report_rows(report_data))
+
+        def generate():
+            buffer = StringIO()
+            writer = csv.writer(buffer, lineterminator='\n')
+            for row in rows:
+                writer.writerow(row)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+
+        return Response(generate(), mimetype='text/csv', headers={'Content-Disposition': 'attachment;filename=investor_report.csv'})
     except Exception as e:
         logger.error(f"Error generating investor report CSV: {str(e)}",
                      extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
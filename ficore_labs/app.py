@@ -6,8 +6,9 @@ from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
 from flask import (
     Flask, jsonify, request, render_template, redirect, url_for, flash,
-    make_response, has_request_context, session, Response, current_app, abort
+    make_response, has_request_context, session, Response, current_app, abort, g
 )
+from werkzeug.local import LocalProxy
 from flask_session import Session
 from flask_cors import CORS
 from werkzeug.security import generate_password_hash
@@ -28,6 +29,19 @@ from utils import (
     _TRADER_NAV, _STARTUP_NAV, _ADMIN_NAV, _TRADER_TOOLS, _STARTUP_TOOLS, _ADMIN_TOOLS, format_date
 )
 from translations import register_translation, trans, get_translations, get_all_translations, get_module_translations
+from helpers.admission import heavy_admission
+from helpers.assets import init_assets
+from helpers.service_worker import init_service_worker
+from helpers.reminders import reminder_scheduler
+from helpers.mail_outbox import mail_outbox
+from helpers.admin_metrics import admin_metrics
+from helpers.user_deletion import user_deletion_worker
+from helpers.retention import retention_engine
+from helpers.usage_analytics import usage_compactor
+from helpers.blob_storage import blob_storage
+from helpers.forecast_engine import forecast_engine
+from helpers.fragment_cache import init_fragment_cache, LRUCache
+from helpers.page_cache import init_page_cache
 
 # Load environment variables
 load_dotenv()
@@ -281,13 +295,14 @@ def create_app():
 
     # Initialize MongoDB
     try:
+        # MONGO_TLS=false allows a plain local mongod (benchmarks, development)
+        tls_options = {'tls': True, 'tlsCAFile': certifi.where()} if os.getenv('MONGO_TLS', 'true').lower() == 'true' else {}
         client = MongoClient(
             app.config['MONGO_URI'],
             serverSelectionTimeoutMS=5000,
-            tls=True,
-            tlsCAFile=certifi.where(),
             maxPoolSize=50,
-            minPoolSize=5
+            minPoolSize=5,
+            **tls_options
         )
         app.extensions = getattr(app, 'extensions', {})
         app.extensions['mongo'] = client
@@ -306,9 +321,22 @@ def create_app():
     login_manager.init_app(app)
     login_manager.login_view = 'users.login'
     setup_session(app)
+    heavy_admission.init_app(app)
+    init_page_cache(app)
+    init_assets(app)
+    init_service_worker(app)
+    reminder_scheduler.init_app(app)
+    mail_outbox.init_app(app)
+    admin_metrics.init_app(app)
+    user_deletion_worker.init_app(app)
+    retention_engine.init_app(app)
+    usage_compactor.init_app(app)
+    blob_storage.init_app(app)
+    forecast_engine.init_app(app)
 
     # Register translation function
     register_translation(app)
+    init_fragment_cache(app)
 
     # User loader
     @login_manager.user_loader
@@ -316,7 +344,7 @@ def create_app():
         try:
             with app.app_context():
                 user = app.extensions['mongo']['bizdb'].users.find_one({'_id': user_id})
-                if not user:
+                if not user or user.get('deletion_pending'):
                     return None
                 trial_start = user.get('trial_start')
                 trial_end = user.get('trial_end')
@@ -375,6 +403,8 @@ def create_app():
     from subscribe.routes import subscribe_bp
     from kyc.routes import kyc_bp
     from settings.routes import settings_bp
+    from sync.routes import sync_bp
+    from search.routes import search_bp
 
     app.register_blueprint(users_bp, url_prefix='/users')
     app.register_blueprint(debtors_bp, url_prefix='/debtors')
@@ -393,14 +423,22 @@ def create_app():
     app.register_blueprint(notifications)
     app.register_blueprint(kyc_bp, url_prefix='/kyc')
     app.register_blueprint(settings_bp, url_prefix='/settings')
+    app.register_blueprint(sync_bp)
+    app.register_blueprint(search_bp)
     logger.info('Registered all blueprints including KYC and Settings', extra={'session_id': 'none', 'user_role': 'none', 'ip_address': 'none'})
 
     # Initialize tools and navigation after blueprints
+    # URLs are static per deploy, so resolve them on the first request only
+    navigation_state = {'initialized': False}
+
     @app.before_request
     def initialize_navigation():
+        if navigation_state['initialized']:
+            return
         with app.app_context():
             try:
                 initialize_tools_with_urls(app)
+                navigation_state['initialized'] = True
                 logger.info('Navigation initialized after blueprint registration', extra={'session_id': session.get('sid', 'no-session-id'), 'ip_address': request.remote_addr})
             except Exception as e:
                 logger.error(f'Failed to initialize navigation: {str(e)}', extra={'session_id': session.get('sid', 'no-session-id'), 'ip_address': request.remote_addr})
@@ -502,41 +540,52 @@ def create_app():
             logger.warning(f'Error formatting datetime {value}: {str(e)}', extra={'session_id': session.get('sid', 'no-session-id'), 'ip_address': request.remote_addr})
             return str(value)
 
-    @app.context_processor
-    def inject_globals():
-        def build_nav(nav_template):
+    # Nav/tools lists only depend on role and host; the host comes from the
+    # request, so the per-process cache is bounded against spoofed Host headers
+    nav_cache = LRUCache(64)
+
+    def role_navigation(role):
+        key = (role, request.host_url)
+        entry = nav_cache.get(key)
+        if entry is None:
+            nav_template, tools_template = {
+                'admin': (_ADMIN_NAV, _ADMIN_TOOLS),
+                'startup': (_STARTUP_NAV, _STARTUP_TOOLS),
+            }.get(role, (_TRADER_NAV, _TRADER_TOOLS))
             try:
-                return generate_tools_with_urls(nav_template)
+                entry = (generate_tools_with_urls(nav_template), generate_tools_with_urls(tools_template))
             except Exception as e:
                 logger.error(f"Error building nav: {e}")
-                return []
-        nav = []
-        tools = []
-        breadcrumb_items = []
-        
-        if current_user.is_authenticated:
-            role = getattr(current_user, 'role', None)
-            if role == 'admin':
-                nav = build_nav(_ADMIN_NAV)
-                tools = build_nav(_ADMIN_TOOLS)
-            elif role == 'startup':
-                nav = build_nav(_STARTUP_NAV)
-                tools = build_nav(_STARTUP_TOOLS)
-            elif role == 'trader':
-                nav = build_nav(_TRADER_NAV)
-                tools = build_nav(_TRADER_TOOLS)
-            else:
-                nav = build_nav(_TRADER_NAV)
-                tools = build_nav(_TRADER_TOOLS)
-            
-            # Generate breadcrumb items
-            try:
-                from helpers.breadcrumb_helper import get_breadcrumb_items
-                breadcrumb_items = get_breadcrumb_items()
-            except Exception as e:
-                logger.error(f"Error generating breadcrumb items: {e}")
-                breadcrumb_items = []
-        
+                return [], []
+            nav_cache.put(key, entry)
+        return entry
+
+    def lazy_navigation():
+        if not current_user.is_authenticated:
+            return []
+        return role_navigation(getattr(current_user, 'role', None))[0]
+
+    def lazy_tools():
+        if not current_user.is_authenticated:
+            return []
+        return role_navigation(getattr(current_user, 'role', None))[1]
+
+    def lazy_breadcrumb_items():
+        if not current_user.is_authenticated:
+            return []
+        try:
+            from helpers.breadcrumb_helper import get_breadcrumb_items
+            if '_breadcrumb_items' not in g:
+                g._breadcrumb_items = get_breadcrumb_items()
+            return g._breadcrumb_items
+        except Exception as e:
+            logger.error(f"Error generating breadcrumb items: {e}")
+            return []
+
+    @app.context_processor
+    def inject_globals():
+        # Navigation values are proxies so templates that never touch them
+        # (or whose fragments are cached) do not pay for building them
         return {
             'current_year': datetime.now(timezone.utc).year,
             'current_lang': session.get('lang', 'en'),
@@ -545,9 +594,9 @@ def create_app():
                 {'code': 'en', 'name': 'English'},
                 {'code': 'ha', 'name': 'Hausa'}
             ],
-            'navigation': nav,
-            'tools': tools,
-            'breadcrumb_items': breadcrumb_items,
+            'navigation': LocalProxy(lazy_navigation),
+            'tools': LocalProxy(lazy_tools),
+            'breadcrumb_items': LocalProxy(lazy_breadcrumb_items),
         }
 
     # Routes
@@ -572,7 +621,7 @@ def create_app():
     @limiter.limit('10 per minute')
     def health():
         logger.info('Performing health check', extra={'session_id': session.get('sid', 'no-session-id'), 'ip_address': request.remote_addr})
-        status = {'status': 'healthy'}
+        status = {'status': 'healthy', 'heavy_requests': heavy_admission.stats()}
         try:
             with app.app_context():
                 app.extensions['mongo'].admin.command('ping')
@@ -0,0 +1,12 @@
+"""
+Load benchmark suite for the business finance app.
+
+Seeds a local MongoDB instance with synthetic data (benchmarks.seed) and drives
+the Flask test client against the hot endpoints (benchmarks.run), producing a
+JSON artifact with p50/p95/p99 latency and DB operation counts per scenario.
+
+Usage (from the application directory, against a throwaway local mongod):
+
+    MONGO_URI=mongodb://localhost:27017 MONGO_TLS=false SECRET_KEY=bench \
+        python -m benchmarks.run --users 50 --output benchmarks/results/latest.json
+"""
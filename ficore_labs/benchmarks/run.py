@@ -0,0 +1,304 @@
+"""
+Benchmark runner: seeds the database, drives the Flask test client against the
+hot endpoints and writes a JSON artifact with latency percentiles and DB
+operation counts per scenario.
+
+Run from the application directory:
+
+    python -m benchmarks.run --output benchmarks/results/latest.json
+    python -m benchmarks.run --skip-seed --compare benchmarks/results/baseline.json
+
+Artifacts record the git commit, dataset size and random seed so results from
+different runs can be compared like for like.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pymongo import monitoring, uri_parser
+
+from benchmarks import seed as seeder
+
+ARTIFACT_VERSION = 1
+LOCAL_HOSTS = {'localhost', '127.0.0.1', '::1'}
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts MongoDB commands issued by the current thread, by command name."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    @property
+    def counts(self):
+        if not hasattr(self._local, 'counts'):
+            self._local.counts = Counter()
+        return self._local.counts
+
+    def reset(self):
+        self._local.counts = Counter()
+
+    def started(self, event):
+        self.counts[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+# (name, role, method, endpoint, form data; query args for GET)
+SCENARIOS = [
+    ('login', None, 'POST', 'users.login', None),
+    ('dashboard', 'trader', 'GET', 'dashboard.index', None),
+    ('dashboard_startup', 'startup', 'GET', 'dashboard.index', None),
+    ('general_home', 'trader', 'GET', 'general_bp.home', None),
+    ('debtors_list', 'trader', 'GET', 'debtors.index', None),
+    ('creditors_list', 'trader', 'GET', 'creditors.index', None),
+    ('receipts_list', 'trader', 'GET', 'receipts.index', None),
+    ('payments_list', 'trader', 'GET', 'payments.index', None),
+    ('funds_list', 'startup', 'GET', 'funds.index', None),
+    ('forecasts_list', 'startup', 'GET', 'forecasts.index', None),
+    ('forecast_suggestions', 'startup', 'GET', 'forecasts.suggestions', None),
+    ('debt_summary_json', 'trader', 'GET', 'business.debt_summary', None),
+    ('cashflow_summary_json', 'trader', 'GET', 'business.cashflow_summary', None),
+    ('recent_activity_json', 'trader', 'GET', 'business.recent_activity', None),
+    ('notifications_count_json', 'trader', 'GET', 'notifications.count', None),
+    ('report_profit_loss_html', 'trader', 'GET', 'reports.profit_loss', None),
+    ('report_profit_loss_csv', 'trader', 'POST', 'reports.profit_loss', {'format': 'csv'}),
+    ('report_profit_loss_pdf', 'trader', 'POST', 'reports.profit_loss', {'format': 'pdf'}),
+    ('report_trends_api', 'trader', 'GET', 'reports.trends_api', {'months': 24}),
+    ('report_aging_html', 'trader', 'GET', 'reports.aging', None),
+    ('report_debtors_creditors_pdf', 'trader', 'POST', 'reports.debtors_creditors', {'format': 'pdf'}),
+    ('admin_dashboard', 'admin', 'GET', 'admin.dashboard', None),
+    ('admin_manage_users', 'admin', 'GET', 'admin.manage_users', None),
+    ('admin_audit', 'admin', 'GET', 'admin.audit', None),
+    ('search_api', 'trader', 'GET', 'search.api', {'q': 'Aminu'}),
+    ('search_api_prefix', 'trader', 'GET', 'search.api', {'q': 'Emek'}),
+    ('party_typeahead', 'trader', 'GET', 'search.parties', {'q': 'Ha', 'kind': 'receipt'}),
+]
+
+
+def percentile(samples, pct):
+    """Linear-interpolated percentile of a list of floats."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    k = (len(ordered) - 1) * pct / 100.0
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def check_target(mongo_uri, allow_remote):
+    """Refuse to seed anything but a local instance unless explicitly allowed."""
+    hosts = {host for host, _ in uri_parser.parse_uri(mongo_uri)['nodelist']}
+    if not allow_remote and not hosts <= LOCAL_HOSTS:
+        raise SystemExit(f"Refusing to benchmark against non-local MongoDB {sorted(hosts)}; pass --allow-remote to override")
+
+
+def user_count(value):
+    """--users type: indexes 0 and 1 are the first startup and trader, so at least two are needed."""
+    count = int(value)
+    if count < 2:
+        raise argparse.ArgumentTypeError('--users must be at least 2 (one startup and one trader)')
+    return count
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Run the load benchmark suite.')
+    parser.add_argument('--users', type=user_count, default=seeder.DEFAULT_COUNTS['users'])
+    parser.add_argument('--records-per-user', type=int, default=seeder.DEFAULT_COUNTS['records_per_user'])
+    parser.add_argument('--cashflows-per-user', type=int, default=seeder.DEFAULT_COUNTS['cashflows_per_user'])
+    parser.add_argument('--audit-logs', type=int, default=seeder.DEFAULT_COUNTS['audit_logs'])
+    parser.add_argument('--notifications-per-user', type=int, default=seeder.DEFAULT_COUNTS['notifications_per_user'])
+    parser.add_argument('--seed', type=int, default=42, help='PRNG seed for the synthetic dataset')
+    parser.add_argument('--iterations', type=int, default=50, help='Measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per scenario')
+    parser.add_argument('--scenario', action='append', help='Only run the named scenario (repeatable)')
+    parser.add_argument('--skip-seed', action='store_true', help='Reuse the dataset from a previous run')
+    parser.add_argument('--purge', action='store_true', help='Remove benchmark data after the run')
+    parser.add_argument('--allow-remote', action='store_true', help='Allow a non-local MONGO_URI')
+    parser.add_argument('--output', default=os.path.join('benchmarks', 'results', 'latest.json'))
+    parser.add_argument('--compare', help='Previous artifact to diff against')
+    return parser.parse_args(argv)
+
+
+def build_app():
+    """Import the application with benchmark-friendly settings."""
+    os.environ.setdefault('ENABLE_2FA', 'false')
+    # Background workers would add unrelated queries to the measured op counts
+    os.environ.setdefault('REMINDER_SCHEDULER_ENABLED', 'false')
+    os.environ.setdefault('MAIL_OUTBOX_ENABLED', 'false')
+    os.environ.setdefault('ADMIN_METRICS_ENABLED', 'false')
+    os.environ.setdefault('USER_DELETION_ENABLED', 'false')
+    os.environ.setdefault('RETENTION_ENABLED', 'false')
+    os.environ.setdefault('USAGE_COMPACTION_ENABLED', 'false')
+    os.environ.setdefault('FORECAST_ENGINE_ENABLED', 'false')
+    # The listener must be registered before the MongoClient is created
+    counter = CommandCounter()
+    monitoring.register(counter)
+    from app import app, limiter
+    import utils
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    limiter.enabled = False
+    utils.limiter.enabled = False
+    return app, counter
+
+
+def login(app, user_id):
+    client = app.test_client()
+    response = client.post('/users/login', data={'username': user_id, 'password': seeder.BENCH_PASSWORD})
+    if response.status_code not in (200, 302):
+        raise RuntimeError(f"Benchmark login failed for {user_id}: HTTP {response.status_code}")
+    return client
+
+
+def run_scenario(app, counter, clients, scenario, iterations, warmup, user_count):
+    name, role, method, endpoint, data = scenario
+    with app.test_request_context():
+        from flask import url_for
+        url = url_for(endpoint, **(data if method == 'GET' and data else {}))
+    if method == 'GET':
+        data = None
+
+    latencies = []
+    db_ops = []
+    commands = Counter()
+    statuses = Counter()
+    for i in range(warmup + iterations):
+        if role is None:
+            # Login is measured from a fresh, anonymous client every time
+            client = app.test_client()
+            data = {'username': seeder.bench_user_id(i % max(user_count, 1)), 'password': seeder.BENCH_PASSWORD}
+        else:
+            client = clients[role]
+        counter.reset()
+        started = time.perf_counter()
+        response = client.open(url, method=method, data=data)
+        response.get_data()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if i < warmup:
+            continue
+        latencies.append(elapsed_ms)
+        db_ops.append(sum(counter.counts.values()))
+        commands.update(counter.counts)
+        statuses[str(response.status_code)] += 1
+
+    return {
+        'method': method,
+        'url': url,
+        'role': role or 'anonymous',
+        'iterations': iterations,
+        'status_codes': dict(statuses),
+        'latency_ms': {
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'mean': statistics.fmean(latencies) if latencies else None,
+            'min': min(latencies, default=None),
+            'max': max(latencies, default=None)
+        },
+        'db_ops': {
+            'per_request_mean': statistics.fmean(db_ops) if db_ops else None,
+            'per_request_max': max(db_ops, default=None),
+            'by_command': {cmd: total / iterations for cmd, total in sorted(commands.items())} if iterations else {}
+        }
+    }
+
+
+def compare(current, previous_path):
+    with open(previous_path, encoding='utf-8') as f:
+        previous = json.load(f)
+    if previous.get('dataset') != current['dataset']:
+        print('warning: datasets differ; deltas are not like for like', file=sys.stderr)
+    print(f"{'scenario':32} {'p95 ms':>10} {'prev':>10} {'delta':>8} {'db ops':>8} {'prev':>8}")
+    for name, result in current['scenarios'].items():
+        before = previous.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        p95, prev_p95 = result['latency_ms']['p95'], before['latency_ms']['p95']
+        delta = f"{(p95 - prev_p95) / prev_p95 * 100:+.1f}%" if prev_p95 else 'n/a'
+        print(f"{name:32} {p95:10.2f} {prev_p95:10.2f} {delta:>8} "
+              f"{result['db_ops']['per_request_mean']:8.1f} {before['db_ops']['per_request_mean']:8.1f}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    mongo_uri = os.getenv('MONGO_URI')
+    if not mongo_uri:
+        raise SystemExit('MONGO_URI must be set')
+    check_target(mongo_uri, args.allow_remote)
+
+    app, counter = build_app()
+    dataset = {
+        'users': args.users,
+        'records_per_user': args.records_per_user,
+        'cashflows_per_user': args.cashflows_per_user,
+        'audit_logs': args.audit_logs,
+        'notifications_per_user': args.notifications_per_user,
+        'seed': args.seed
+    }
+    with app.app_context():
+        import utils
+        db = utils.get_mongo_db()
+        if not args.skip_seed:
+            seeder.seed(db, counts={k: v for k, v in dataset.items() if k != 'seed'}, random_seed=args.seed)
+
+    trader_index = next(i for i in range(args.users) if seeder.bench_user_role(i) == 'trader')
+    startup_index = next(i for i in range(args.users) if seeder.bench_user_role(i) == 'startup')
+    clients = {
+        'trader': login(app, seeder.bench_user_id(trader_index)),
+        'startup': login(app, seeder.bench_user_id(startup_index)),
+        'admin': login(app, seeder.BENCH_ADMIN_ID)
+    }
+
+    scenarios = [s for s in SCENARIOS if not args.scenario or s[0] in args.scenario]
+    results = {}
+    for scenario in scenarios:
+        results[scenario[0]] = run_scenario(app, counter, clients, scenario, args.iterations, args.warmup, args.users)
+        print(f"{scenario[0]:32} p50={results[scenario[0]]['latency_ms']['p50']:.2f}ms "
+              f"p95={results[scenario[0]]['latency_ms']['p95']:.2f}ms "
+              f"db_ops={results[scenario[0]]['db_ops']['per_request_mean']:.1f}")
+
+    artifact = {
+        'version': ARTIFACT_VERSION,
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        'git_commit': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'dataset': dataset,
+        'iterations': args.iterations,
+        'warmup': args.warmup,
+        'scenarios': results
+    }
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(artifact, f, indent=2, sort_keys=True)
+    print(f"Wrote {args.output}")
+
+    if args.compare:
+        compare(artifact, args.compare)
+    if args.purge:
+        with app.app_context():
+            seeder.purge(utils.get_mongo_db())
+
+
+if __name__ == '__main__':
+    main()
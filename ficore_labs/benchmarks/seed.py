@@ -0,0 +1,219 @@
+"""
+Synthetic data seeder for the load benchmark suite.
+
+Documents are shaped after the $jsonSchema validators installed by
+models.initialize_app_data and written with validation enabled, so a seed that
+drifts from the schema fails loudly instead of benchmarking impossible data.
+All seeded documents are namespaced with the BENCH_PREFIX so they can be purged
+without touching real data.
+"""
+
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+from werkzeug.security import generate_password_hash
+
+logger = logging.getLogger(__name__)
+
+BENCH_PREFIX = 'bench_'
+BENCH_PASSWORD = 'bench-password'
+BENCH_ADMIN_ID = f'{BENCH_PREFIX}admin'
+
+DEFAULT_COUNTS = {
+    'users': 50,
+    'records_per_user': 200,
+    'cashflows_per_user': 400,
+    'audit_logs': 5000,
+    'notifications_per_user': 20
+}
+
+PARTY_NAMES = [
+    'Aminu Stores', 'Bello Ventures', 'Chika Foods', 'Danjuma Motors', 'Emeka Textiles',
+    'Fatima Provisions', 'Garba Electronics', 'Hadiza Fabrics', 'Ibrahim Logistics', 'Jumoke Bakery'
+]
+PAYMENT_METHODS = ['cash', 'card', 'bank']
+CASHFLOW_CATEGORIES = ['Sales', 'Services', 'Utilities', 'Rent', 'Supplies', 'Salaries', 'Marketing']
+AUDIT_ACTIONS = ['login', 'logout', 'update_user_role', 'approve_receipt', 'delete_item', 'update_subscription']
+NOTIFICATION_TYPES = ['info', 'warning', 'success', 'email', 'sms']
+
+
+def bench_user_id(index):
+    return f'{BENCH_PREFIX}user_{index:05d}'
+
+
+def bench_user_role(index):
+    """Alternate roles so both trader and startup code paths are exercised."""
+    return 'startup' if index % 3 == 0 else 'trader'
+
+
+def _random_date(rng, now, days_back=365):
+    return now - timedelta(days=rng.randint(0, days_back), seconds=rng.randint(0, 86399))
+
+
+def _flush(collection, batch):
+    if batch:
+        collection.insert_many(batch, ordered=False, bypass_document_validation=False)
+        batch.clear()
+
+
+def purge(db):
+    """Remove every document created by a previous seed run."""
+    prefix_filter = {'$regex': f'^{BENCH_PREFIX}'}
+    removed = {
+        'users': db.users.delete_many({'_id': prefix_filter}).deleted_count,
+        'records': db.records.delete_many({'user_id': prefix_filter}).deleted_count,
+        'cashflows': db.cashflows.delete_many({'user_id': prefix_filter}).deleted_count,
+        'audit_logs': db.audit_logs.delete_many({'admin_id': prefix_filter}).deleted_count,
+        'notifications': db.notifications.delete_many({'user_id': prefix_filter}).deleted_count
+    }
+    logger.info(f"Purged benchmark data: {removed}", extra={'session_id': 'no-session-id'})
+    return removed
+
+
+def seed(db, counts=None, random_seed=42, batch_size=1000):
+    """
+    Seed the benchmark dataset.
+
+    Args:
+        db: MongoDB database object with validators already installed
+        counts: Overrides for DEFAULT_COUNTS
+        random_seed: Seed for the PRNG so repeated runs produce the same data
+        batch_size: Documents per insert_many call
+
+    Returns:
+        dict: Number of documents inserted per collection
+    """
+    counts = {**DEFAULT_COUNTS, **(counts or {})}
+    rng = random.Random(random_seed)
+    now = datetime.now(timezone.utc)
+    # Hashing is deliberately slow; every benchmark user shares one hash
+    password_hash = generate_password_hash(BENCH_PASSWORD)
+    inserted = {'users': 0, 'records': 0, 'cashflows': 0, 'audit_logs': 0, 'notifications': 0}
+
+    purge(db)
+
+    users = [{
+        '_id': BENCH_ADMIN_ID,
+        'email': f'{BENCH_ADMIN_ID}@example.com',
+        'password_hash': password_hash,
+        'role': 'admin',
+        'is_admin': True,
+        'display_name': 'Benchmark Admin',
+        'setup_complete': True,
+        'language': 'en',
+        'is_trial': False,
+        'trial_start': now - timedelta(days=400),
+        'trial_end': now - timedelta(days=370),
+        'is_subscribed': True,
+        'subscription_plan': 'admin',
+        'subscription_start': now - timedelta(days=370),
+        'subscription_end': None,
+        'created_at': now - timedelta(days=400)
+    }]
+    for i in range(counts['users']):
+        created_at = _random_date(rng, now)
+        users.append({
+            '_id': bench_user_id(i),
+            'email': f'{bench_user_id(i)}@example.com',
+            'password_hash': password_hash,
+            'role': bench_user_role(i),
+            'is_admin': False,
+            'display_name': f'Bench User {i}',
+            'setup_complete': True,
+            'language': 'en',
+            'is_trial': False,
+            'trial_start': created_at,
+            'trial_end': created_at + timedelta(days=30),
+            'is_subscribed': True,
+            'subscription_plan': 'yearly',
+            'subscription_start': created_at + timedelta(days=30),
+            'subscription_end': now + timedelta(days=365),
+            'created_at': created_at,
+            'settings': {'show_kobo': False, 'incognito_mode': False, 'app_sounds': True},
+            'security_settings': {'fingerprint_password': False, 'fingerprint_pin': False, 'hide_sensitive_data': False}
+        })
+    db.users.insert_many(users, ordered=False, bypass_document_validation=False)
+    inserted['users'] = len(users)
+
+    batch = []
+    for i in range(counts['users']):
+        user_id = bench_user_id(i)
+        record_types = ['debtor', 'creditor', 'fund', 'forecast'] if bench_user_role(i) == 'startup' else ['debtor', 'creditor']
+        for _ in range(counts['records_per_user']):
+            record_type = rng.choice(record_types)
+            created_at = _random_date(rng, now)
+            record = {'user_id': user_id, 'type': record_type, 'created_at': created_at}
+            if record_type in ('debtor', 'creditor'):
+                record.update({
+                    'name': rng.choice(PARTY_NAMES),
+                    'contact': f'080{rng.randint(10000000, 99999999)}',
+                    'amount_owed': round(rng.uniform(1000, 500000), 2),
+                    'description': 'Benchmark IOU',
+                    'reminder_count': rng.randint(0, 5)
+                })
+            elif record_type == 'fund':
+                record.update({
+                    'source': rng.choice(['Angel', 'Seed Round', 'Grant', 'Personal']),
+                    'amount': round(rng.uniform(100000, 5000000), 2),
+                    'category': rng.choice(['equity', 'debt', 'grant'])
+                })
+            else:
+                record.update({
+                    'title': f'Forecast {created_at:%Y-%m}',
+                    'projected_revenue': round(rng.uniform(100000, 2000000), 2),
+                    'projected_expenses': round(rng.uniform(50000, 1500000), 2),
+                    'forecast_date': created_at + timedelta(days=30)
+                })
+            batch.append(record)
+            inserted['records'] += 1
+            if len(batch) >= batch_size:
+                _flush(db.records, batch)
+    _flush(db.records, batch)
+
+    for i in range(counts['users']):
+        user_id = bench_user_id(i)
+        for _ in range(counts['cashflows_per_user']):
+            batch.append({
+                'user_id': user_id,
+                'type': rng.choice(['receipt', 'payment']),
+                'party_name': rng.choice(PARTY_NAMES),
+                'amount': round(rng.uniform(500, 250000), 2),
+                'method': rng.choice(PAYMENT_METHODS),
+                'category': rng.choice(CASHFLOW_CATEGORIES),
+                'created_at': _random_date(rng, now)
+            })
+            inserted['cashflows'] += 1
+            if len(batch) >= batch_size:
+                _flush(db.cashflows, batch)
+    _flush(db.cashflows, batch)
+
+    for _ in range(counts['audit_logs']):
+        batch.append({
+            'admin_id': rng.choice([BENCH_ADMIN_ID, bench_user_id(rng.randrange(max(counts['users'], 1)))]),
+            'action': rng.choice(AUDIT_ACTIONS),
+            'details': {'source': 'benchmark'},
+            'timestamp': _random_date(rng, now, days_back=90)
+        })
+        inserted['audit_logs'] += 1
+        if len(batch) >= batch_size:
+            _flush(db.audit_logs, batch)
+    _flush(db.audit_logs, batch)
+
+    for i in range(counts['users']):
+        user_id = bench_user_id(i)
+        for _ in range(counts['notifications_per_user']):
+            batch.append({
+                'user_id': user_id,
+                'message': 'Benchmark notification',
+                'type': rng.choice(NOTIFICATION_TYPES),
+                'read': rng.random() < 0.7,
+                'timestamp': _random_date(rng, now, days_back=60),
+                'details': None
+            })
+            inserted['notifications'] += 1
+            if len(batch) >= batch_size:
+                _flush(db.notifications, batch)
+    _flush(db.notifications, batch)
+
+    logger.info(f"Seeded benchmark data: {inserted}", extra={'session_id': 'no-session-id'})
+    return inserted
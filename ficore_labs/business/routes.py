@@ -1,6 +1,7 @@
 from flask import Blueprint, jsonify, render_template, session, request
 from flask_login import current_user, login_required
 from datetime import datetime, timezone
+from pymongo.errors import DuplicateKeyError
 from zoneinfo import ZoneInfo
 import utils
 from utils import logger
@@ -215,105 +216,155 @@ def cashflow_summary():
             'error': trans('cashflow_error', default='An error occurred while fetching cashflow summary')
         }), 500
 
+ACTIVITY_ICONS = {
+    'debtor_added': 'bi-person-plus',
+    'creditor_added': 'bi-person-plus',
+    'money_in': 'bi-arrow-down-circle',
+    'money_out': 'bi-arrow-up-circle',
+    'feedback_submitted': 'bi-star-fill'
+}
+
+def build_activities_from_history(db, user_id, lang):
+    """
+    Rebuild recent activities from records, cashflows and feedback.
+
+    Only used to seed the activity feed with activity that predates it.
+    """
+    activities = []
+
+    # Fetch recent debt records
+    records = db.records.find({'user_id': user_id}).sort('created_at', -1).limit(3)
+    for record in records:
+        created_at = (
+            record['created_at'].replace(tzinfo=ZoneInfo("UTC"))
+            if 'created_at' in record and record['created_at'].tzinfo is None
+            else record.get('created_at')
+        )
+        if not created_at:
+            continue
+        activity_type = (
+            'debtor_added' if record.get('type') == 'debtor'
+            else 'creditor_added' if record.get('type') == 'creditor'
+            else f"{record.get('type', 'unknown')}_added"
+        )
+        description_key = f"{record.get('type', 'unknown')}_added_description"
+        name = utils.sanitize_input(
+            record.get('name', record.get('title', record.get('source', 'Unknown')))
+        )
+        description = trans(
+            description_key,
+            lang=lang,
+            default=f"{'Owed by' if record.get('type') == 'debtor' else 'Owe to' if record.get('type') == 'creditor' else record.get('type', '').capitalize()} {name}"
+        )
+        amount = utils.clean_currency(
+            record.get('amount_owed', record.get('amount', record.get('projected_revenue', 0)))
+        )
+        activities.append({
+            'type': activity_type,
+            'description': description,
+            'amount': amount,
+            'related_id': str(record['_id']),
+            'timestamp': created_at
+        })
+
+    # Fetch recent cashflows
+    cashflows = db.cashflows.find({'user_id': user_id}).sort('created_at', -1).limit(3)
+    for cashflow in cashflows:
+        created_at = (
+            cashflow['created_at'].replace(tzinfo=ZoneInfo("UTC"))
+            if 'created_at' in cashflow and cashflow['created_at'].tzinfo is None
+            else cashflow.get('created_at')
+        )
+        if not created_at:
+            continue
+        activity_type = 'money_in' if cashflow.get('type') == 'receipt' else 'money_out'
+        party_name = utils.sanitize_input(cashflow.get('party_name', 'Unknown'))
+        description = trans(
+            'money_in_description' if cashflow.get('type') == 'receipt' else 'money_out_description',
+            lang=lang,
+            default=f"{'Received from' if cashflow.get('type') == 'receipt' else 'Paid to'} {party_name}"
+        )
+        amount = utils.clean_currency(cashflow.get('amount', 0))
+        activities.append({
+            'type': activity_type,
+            'description': description,
+            'amount': amount,
+            'related_id': str(cashflow['_id']),
+            'timestamp': created_at
+        })
+
+    # Fetch recent feedback
+    feedback_records = db.feedback.find({'user_id': user_id}).sort('timestamp', -1).limit(3)
+    for feedback in feedback_records:
+        timestamp = (
+            feedback['timestamp'].replace(tzinfo=ZoneInfo("UTC"))
+            if 'timestamp' in feedback and feedback['timestamp'].tzinfo is None
+            else feedback.get('timestamp')
+        )
+        if not timestamp:
+            continue
+        tool_name = utils.sanitize_input(feedback.get('tool_name', 'unknown').capitalize())
+        activities.append({
+            'type': 'feedback_submitted',
+            'description': trans(
+                'feedback_submitted_description',
+                lang=lang,
+                default=f"Submitted feedback for {tool_name}"
+            ),
+            'amount': utils.clean_currency(feedback.get('rating', 0)),
+            'related_id': str(feedback['_id']),
+            'timestamp': timestamp
+        })
+
+    activities.sort(key=lambda x: x['timestamp'], reverse=True)
+    return activities[:utils.ACTIVITY_FEED_SIZE]
+
 @business.route('/recent_activity')
 @login_required
 @utils.requires_role(['trader', 'startup', 'admin'])
 def recent_activity():
-    """Fetch recent activities (debts, cashflows, feedback) for the authenticated user."""
+    """Serve the recent activity sidebar from the user's capped activity feed."""
     try:
         db = utils.get_mongo_db()
         user_id = current_user.id
         lang = session.get('lang', 'en')
-        activities = []
-
-        # Fetch recent debt records
-        records = db.records.find({'user_id': user_id}).sort('created_at', -1).limit(3)
-        for record in records:
-            created_at = (
-                record['created_at'].replace(tzinfo=ZoneInfo("UTC"))
-                if 'created_at' in record and record['created_at'].tzinfo is None
-                else record.get('created_at')
-            )
-            if not created_at:
-                continue
-            activity_type = (
-                'debtor_added' if record.get('type') == 'debtor'
-                else 'creditor_added' if record.get('type') == 'creditor'
-                else f"{record.get('type', 'unknown')}_added"
-            )
-            description_key = f"{record.get('type', 'unknown')}_added_description"
-            name = utils.sanitize_input(
-                record.get('name', record.get('title', record.get('source', 'Unknown')))
-            )
-            description = trans(
-                description_key,
-                lang=lang,
-                default=f"{'Owed by' if record.get('type') == 'debtor' else 'Owe to' if record.get('type') == 'creditor' else record.get('type', '').capitalize()} {name}"
-            )
-            amount = utils.clean_currency(
-                record.get('amount_owed', record.get('amount', record.get('projected_revenue', 0)))
-            )
-            activities.append({
-                'type': activity_type,
-                'description': description,
-                'amount': amount,
-                'timestamp': created_at.isoformat(),
-                'icon': 'bi-person-plus' if record.get('type') in ['debtor', 'creditor'] else 'bi-file-earmark-plus'
-            })
 
-        # Fetch recent cashflows
-        cashflows = db.cashflows.find({'user_id': user_id}).sort('created_at', -1).limit(3)
-        for cashflow in cashflows:
-            created_at = (
-                cashflow['created_at'].replace(tzinfo=ZoneInfo("UTC"))
-                if 'created_at' in cashflow and cashflow['created_at'].tzinfo is None
-                else cashflow.get('created_at')
+        feed = db.activity_feeds.find_one({'_id': user_id}, {'items': {'$slice': 5}, 'seeded': 1})
+        items = feed.get('items', []) if feed else []
+        if not (feed and feed.get('seeded')):
+            # Activity tracked before the first sidebar load may already have started the feed
+            seen = {item.get('related_id') for item in items}
+            history = [item for item in build_activities_from_history(db, user_id, lang) if item['related_id'] not in seen]
+            try:
+                db.activity_feeds.update_one(
+                    {'_id': user_id, 'seeded': {'$ne': True}},
+                    {
+                        '$push': {'items': {'$each': history, '$sort': {'timestamp': -1}, '$slice': utils.ACTIVITY_FEED_SIZE}},
+                        '$set': {'seeded': True}
+                    },
+                    upsert=True
+                )
+            except DuplicateKeyError:
+                pass  # Seeded by a concurrent request
+            items = sorted(
+                items + history,
+                key=lambda item: item['timestamp'] if item['timestamp'].tzinfo else item['timestamp'].replace(tzinfo=ZoneInfo("UTC")),
+                reverse=True
             )
-            if not created_at:
-                continue
-            activity_type = 'money_in' if cashflow.get('type') == 'receipt' else 'money_out'
-            party_name = utils.sanitize_input(cashflow.get('party_name', 'Unknown'))
-            description = trans(
-                'money_in_description' if cashflow.get('type') == 'receipt' else 'money_out_description',
-                lang=lang,
-                default=f"{'Received from' if cashflow.get('type') == 'receipt' else 'Paid to'} {party_name}"
-            )
-            amount = utils.clean_currency(cashflow.get('amount', 0))
-            activities.append({
-                'type': activity_type,
-                'description': description,
-                'amount': amount,
-                'timestamp': created_at.isoformat(),
-                'icon': 'bi-arrow-down-circle' if activity_type == 'money_in' else 'bi-arrow-up-circle'
-            })
 
-        # Fetch recent feedback
-        feedback_records = db.feedback.find({'user_id': user_id}).sort('timestamp', -1).limit(3)
-        for feedback in feedback_records:
-            timestamp = (
-                feedback['timestamp'].replace(tzinfo=ZoneInfo("UTC"))
-                if 'timestamp' in feedback and feedback['timestamp'].tzinfo is None
-                else feedback.get('timestamp')
-            )
-            if not timestamp:
-                continue
-            tool_name = utils.sanitize_input(feedback.get('tool_name', 'unknown').capitalize())
+        activities = []
+        for item in items[:5]:
+            timestamp = item['timestamp']
+            if timestamp.tzinfo is None:
+                timestamp = timestamp.replace(tzinfo=ZoneInfo("UTC"))
             activities.append({
-                'type': 'feedback_submitted',
-                'description': trans(
-                    'feedback_submitted_description',
-                    lang=lang,
-                    default=f"Submitted feedback for {tool_name}"
-                ),
-                'amount': utils.clean_currency(feedback.get('rating', 0)),
+                'type': item['type'],
+                'description': item['description'],
+                'amount': item.get('amount'),
                 'timestamp': timestamp.isoformat(),
-                'icon': 'bi-star-fill'
+                'icon': ACTIVITY_ICONS.get(item['type'], 'bi-file-earmark-plus')
             })
 
-        # Sort activities by timestamp (descending)
-        activities.sort(key=lambda x: datetime.fromisoformat(x['timestamp']), reverse=True)
-        activities = activities[:5]
-
         logger.info(
             f"Fetched {len(activities)} recent activities for user {user_id}",
             extra={'session_id': session.get('sid', 'no-session-id'), 'ip_address': request.remote_addr}
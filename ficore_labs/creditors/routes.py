@@ -11,6 +11,11 @@ import io
 import re
 import urllib.parse
 import utils
+from models import create_tombstone
+from helpers.admission import heavy_endpoint
+from helpers.reminders import schedule_reminder
+from helpers.counterparties import record_counterparty
+from helpers.monthly_analytics import invalidate_months
 from translations import trans
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
@@ -18,17 +23,6 @@ from reportlab.lib.units import inch
 
 logger = logging.getLogger(__name__)
 
-# Placeholder functions for SMS/WhatsApp reminders (implement in utils.py or with external API)
-def send_sms_reminder(recipient, message):
-    """Placeholder for sending SMS reminder."""
-    logger.info(f"Simulating SMS to {recipient}: {message}", extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id if current_user.is_authenticated else 'none'})
-    return True, {'status': 'SMS sent successfully'}  # Replace with actual API call
-
-def send_whatsapp_reminder(recipient, message):
-    """Placeholder for sending WhatsApp reminder."""
-    logger.info(f"Simulating WhatsApp to {recipient}: {message}", extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id if current_user.is_authenticated else 'none'})
-    return True, {'status': 'WhatsApp sent successfully'}  # Replace with actual API call
-
 class CreditorForm(FlaskForm):
     name = StringField(trans('creditors_creditor_name', default='Creditor Name'), validators=[DataRequired()])
     contact = StringField(trans('general_contact', default='Contact'), validators=[Optional()])
@@ -248,36 +242,24 @@ def send_reminder():
         if not creditor:
             return jsonify({'success': False, 'message': trans('creditors_record_not_found', default='Record not found')}), 404
         
-        update_data = {'$inc': {'reminder_count': 1}}
-        if snooze_days:
-            update_data['$set'] = {'reminder_date': datetime.now(timezone.utc) + timedelta(days=snooze_days)}
-        
-        success = True
-        api_response = {}
+        # Delivery happens in the reminder dispatcher, outside the request
+        when = datetime.now(timezone.utc) + timedelta(days=snooze_days) if snooze_days else datetime.now(timezone.utc)
+        channel = send_type if send_type in ('sms', 'whatsapp') else 'sms'
+        schedule_reminder(db, creditor['_id'], str(current_user.id), 'creditor', when, channel=channel, recipient=recipient, message=message)
         
-        if recipient:
-            if send_type == 'sms':
-                success, api_response = send_sms_reminder(recipient, message)
-            elif send_type == 'whatsapp':
-                success, api_response = send_whatsapp_reminder(recipient, message)
-        
-        if success:
-            db.records.update_one({'_id': ObjectId(debt_id)}, update_data)
-            
+        if snooze_days:
             db.reminder_logs.insert_one({
                 'user_id': str(current_user.id),
                 'debt_id': debt_id,
-                'recipient': recipient or 'N/A',
-                'message': message or 'Snooze',
-                'type': send_type if recipient else 'snooze',
+                'recipient': 'N/A',
+                'message': 'Snooze',
+                'type': 'snooze',
+                'status': 'scheduled',
                 'sent_at': datetime.now(timezone.utc),
-                'api_response': api_response if recipient else {'status': f'Snoozed for {snooze_days} days'}
+                'api_response': {'status': f'Snoozed for {snooze_days} days'}
             })
-            
-            return jsonify({'success': True, 'message': trans('creditors_reminder_sent' if recipient else 'creditors_snooze_set', default='Reminder sent successfully' if recipient else 'Snooze set successfully')})
-        else:
-            return jsonify({'success': False, 'message': trans('creditors_reminder_failed', default='Failed to send reminder'), 'details': api_response}), 500
-            
+        
+        return jsonify({'success': True, 'message': trans('creditors_reminder_queued' if recipient else 'creditors_snooze_set', default='Reminder queued for sending' if recipient else 'Snooze set successfully')})
     except ValueError:
         logger.error(f"Invalid creditor ID {debt_id} for user {current_user.id}", extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
         return jsonify({'error': trans('creditors_invalid_id', default='Invalid creditor ID')}), 404
@@ -288,6 +270,7 @@ def send_reminder():
 @creditors_bp.route('/generate_iou/<id>')
 @login_required
 @utils.requires_role(['trader', 'startup', 'admin'])
+@heavy_endpoint()
 def generate_iou(id):
     """Generate PDF IOU for a creditor (requires active trial/subscription)."""
     try:
@@ -380,9 +363,17 @@ def add():
                 'amount_owed': utils.clean_currency(form.amount_owed.data),
                 'description': utils.sanitize_input(form.description.data, max_length=500) if form.description.data else None,
                 'reminder_count': 0,
-                'created_at': datetime.now(timezone.utc)
+                'created_at': datetime.now(timezone.utc),
+                'updated_at': datetime.now(timezone.utc)
             }
             db.records.insert_one(record)
+            record_counterparty(db, record['user_id'], record['name'], 'creditor', record['contact'])
+            utils.track_user_activity(
+                'creditor_added',
+                trans('creditor_added_description', lang=session.get('lang', 'en'), default=f"Owe to {record['name']}"),
+                amount=record['amount_owed'],
+                related_id=str(record['_id'])
+            )
             flash(trans('creditors_create_success', default='Creditor created successfully'), 'success')
             return redirect(url_for('creditors.index'))
         except Exception as e:
@@ -438,6 +429,8 @@ def edit(id):
                     {'_id': ObjectId(id)},
                     {'$set': updated_record}
                 )
+                record_counterparty(db, str(current_user.id), updated_record['name'], 'creditor', updated_record['contact'])
+                invalidate_months(db, str(current_user.id), creditor.get('created_at'))
                 flash(trans('creditors_edit_success', default='Creditor updated successfully'), 'success')
                 return redirect(url_for('creditors.index'))
             except Exception as e:
@@ -481,6 +474,8 @@ def delete(id):
             return redirect(url_for('creditors.index'))
         result = db.records.delete_one(query)
         if result.deleted_count:
+            create_tombstone(db, 'records', id, current_user.id)
+            invalidate_months(db, str(current_user.id), creditor.get('created_at'))
             flash(trans('creditors_delete_success', default='Creditor deleted successfully'), 'success')
         else:
             flash(trans('creditors_record_not_found', default='Record not found'), 'danger')
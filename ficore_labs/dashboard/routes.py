@@ -3,6 +3,7 @@ from flask_login import login_required, current_user
 from translations import trans
 import utils
 from utils import format_date
+from helpers.runway import runway_summary
 from bson import ObjectId
 from datetime import datetime, timezone
 from zoneinfo import ZoneInfo
@@ -38,6 +39,7 @@ def index():
         'total_forecasts_amount': 0  # Added for forecasts amount
     }
     can_interact = False
+    runway = None
 
     try:
         db = utils.get_mongo_db()
@@ -112,6 +114,14 @@ def index():
                         extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
             flash(trans('dashboard_stats_error', default='Unable to calculate dashboard statistics. Displaying defaults.'), 'warning')
 
+        # Runway for startups, from cached monthly totals plus the current month
+        if current_user.role == 'startup':
+            try:
+                runway = runway_summary(db, str(current_user.id))
+            except Exception as e:
+                logger.error(f"Error calculating runway for dashboard: {str(e)}",
+                            extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
+
         # Check subscription status
         try:
             can_interact = utils.can_user_interact(current_user)
@@ -129,6 +139,7 @@ def index():
             recent_receipts=recent_receipts,
             recent_funds=recent_funds,
             stats=stats,
+            runway=runway,
             can_interact=can_interact
         )
 
@@ -139,4 +150,4 @@ def index():
         flash(trans('dashboard_critical_error', default='An error occurred while loading the dashboard. Please try again later.'), 'danger')
         return render_template('dashboard/index.html', 
                              recent_creditors=[], recent_debtors=[], recent_payments=[], 
-                             recent_receipts=[], recent_funds=[], stats=stats, can_interact=False)
+                             recent_receipts=[], recent_funds=[], stats=stats, runway=None, can_interact=False)
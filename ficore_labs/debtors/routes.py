@@ -11,26 +11,20 @@ import io
 import re
 import urllib.parse
 import utils
+from models import create_tombstone
 from translations import trans
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
 from helpers.branding_helpers import draw_ficore_pdf_header, ficore_csv_header
+from helpers.admission import heavy_endpoint
+from helpers.reminders import schedule_reminder
+from helpers.counterparties import record_counterparty
+from helpers.monthly_analytics import invalidate_months
 import csv
 
 logger = logging.getLogger(__name__)
 
-# Placeholder functions for SMS/WhatsApp reminders (implement in utils.py or with external API)
-def send_sms_reminder(recipient, message):
-    """Placeholder for sending SMS reminder."""
-    logger.info(f"Simulating SMS to {recipient}: {message}", extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id if current_user.is_authenticated else 'none'})
-    return True, {'status': 'SMS sent successfully'}  # Replace with actual API call
-
-def send_whatsapp_reminder(recipient, message):
-    """Placeholder for sending WhatsApp reminder."""
-    logger.info(f"Simulating WhatsApp to {recipient}: {message}", extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id if current_user.is_authenticated else 'none'})
-    return True, {'status': 'WhatsApp sent successfully'}  # Replace with actual API call
-
 class DebtorForm(FlaskForm):
     name = StringField(trans('debtors_debtor_name', default="Debtor's Name"), validators=[DataRequired()])
     phone_number = StringField(trans('debtors_phone_number', default="Debtor's Phone Number"), validators=[DataRequired()])
@@ -250,36 +244,24 @@ def send_reminder():
         if not debtor:
             return jsonify({'success': False, 'message': trans('debtors_record_not_found', default='Record not found')}), 404
         
-        update_data = {'$inc': {'reminder_count': 1}}
-        if snooze_days:
-            update_data['$set'] = {'reminder_date': datetime.now(timezone.utc) + timedelta(days=snooze_days)}
-        
-        success = True
-        api_response = {}
-        
-        if recipient:
-            if send_type == 'sms':
-                success, api_response = send_sms_reminder(recipient, message)
-            elif send_type == 'whatsapp':
-                success, api_response = send_whatsapp_reminder(recipient, message)
+        # Delivery happens in the reminder dispatcher, outside the request
+        when = datetime.now(timezone.utc) + timedelta(days=snooze_days) if snooze_days else datetime.now(timezone.utc)
+        channel = send_type if send_type in ('sms', 'whatsapp') else 'sms'
+        schedule_reminder(db, debtor['_id'], str(current_user.id), 'debtor', when, channel=channel, recipient=recipient, message=message)
         
-        if success:
-            db.records.update_one({'_id': ObjectId(debt_id)}, update_data)
-            
+        if snooze_days:
             db.reminder_logs.insert_one({
                 'user_id': str(current_user.id),
                 'debt_id': debt_id,
-                'recipient': recipient or 'N/A',
-                'message': message or 'Snooze',
-                'type': send_type if recipient else 'snooze',
+                'recipient': 'N/A',
+                'message': 'Snooze',
+                'type': 'snooze',
+                'status': 'scheduled',
                 'sent_at': datetime.now(timezone.utc),
-                'api_response': api_response if recipient else {'status': f'Snoozed for {snooze_days} days'}
+                'api_response': {'status': f'Snoozed for {snooze_days} days'}
             })
-            
-            return jsonify({'success': True, 'message': trans('debtors_reminder_sent' if recipient else 'debtors_snooze_set', default='Reminder sent successfully' if recipient else 'Snooze set successfully')})
-        else:
-            return jsonify({'success': False, 'message': trans('debtors_reminder_failed', default='Failed to send reminder'), 'details': api_response}), 500
-            
+        
+        return jsonify({'success': True, 'message': trans('debtors_reminder_queued' if recipient else 'debtors_snooze_set', default='Reminder queued for sending' if recipient else 'Snooze set successfully')})
     except ValueError:
         logger.error(f"Invalid debtor ID {debt_id} for user {current_user.id}", extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
         return jsonify({'error': trans('debtors_invalid_id', default='Invalid debtor ID')}), 404
@@ -290,6 +272,7 @@ def send_reminder():
 @debtors_bp.route('/generate_iou/<id>')
 @login_required
 @utils.requires_role(['trader', 'startup', 'admin'])
+@heavy_endpoint()
 def generate_iou(id):
     """Generate PDF IOU for a debtor (requires active trial/subscription)."""
     try:
@@ -372,6 +355,7 @@ def generate_iou(id):
 @debtors_bp.route('/generate_iou_csv/<id>')
 @login_required
 @utils.requires_role(['trader', 'startup', 'admin'])
+@heavy_endpoint()
 def generate_iou_csv(id):
     """Generate CSV IOU for a debtor (requires active trial/subscription)."""
     try:
@@ -457,9 +441,17 @@ def add():
                 'amount_owed': utils.clean_currency(form.amount_owed.data),
                 'description': utils.sanitize_input(form.description.data, max_length=500) if form.description.data else None,
                 'created_at': datetime.now(timezone.utc),
+                'updated_at': datetime.now(timezone.utc),
                 'reminder_count': 0
             }
             db.records.insert_one(debtor_data)
+            record_counterparty(db, debtor_data['user_id'], debtor_data['name'], 'debtor', debtor_data['phone_number'])
+            utils.track_user_activity(
+                'debtor_added',
+                trans('debtor_added_description', lang=session.get('lang', 'en'), default=f"Owed by {debtor_data['name']}"),
+                amount=debtor_data['amount_owed'],
+                related_id=str(debtor_data['_id'])
+            )
             
             flash(trans('debtors_add_success', default='Debtor added successfully'), 'success')
             return redirect(url_for('debtors.index'))
@@ -521,6 +513,8 @@ def edit(id):
                     {'_id': ObjectId(id)},
                     {'$set': updated_record}
                 )
+                record_counterparty(db, str(current_user.id), updated_record['name'], 'debtor', updated_record['phone_number'])
+                invalidate_months(db, str(current_user.id), debtor.get('created_at'))
                 flash(trans('debtors_edit_success', default='Debtor updated successfully'), 'success')
                 return redirect(url_for('debtors.index'))
             except Exception as e:
@@ -565,6 +559,8 @@ def delete(id):
             return redirect(url_for('debtors.index'))
         result = db.records.delete_one(query)
         if result.deleted_count:
+            create_tombstone(db, 'records', id, current_user.id)
+            invalidate_months(db, str(current_user.id), debtor.get('created_at'))
             flash(trans('debtors_delete_success', default='Debtor deleted successfully'), 'success')
         else:
             flash(trans('debtors_record_not_found', default='Record not found'), 'danger')
@@ -12,8 +12,11 @@ from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
 from helpers.branding_helpers import draw_ficore_pdf_header, ficore_csv_header
+from helpers.admission import heavy_endpoint
+from helpers.forecast_engine import get_forecast
 import csv
 import utils
+from models import create_tombstone
 from translations import trans
 
 logger = logging.getLogger(__name__)
@@ -28,6 +31,14 @@ class ForecastForm(FlaskForm):
 
 forecasts_bp = Blueprint('forecasts', __name__, url_prefix='/forecasts')
 
+def suggested_forecast():
+    """The current user's projections from their cashflow history, or None if they cannot be loaded."""
+    try:
+        return get_forecast(utils.get_mongo_db(), str(current_user.id))
+    except Exception as e:
+        logger.warning(f"Error loading suggested forecast for user {current_user.id}: {str(e)}", extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
+        return None
+
 @forecasts_bp.route('/')
 @login_required
 @utils.requires_role('startup')
@@ -49,6 +60,7 @@ def index():
         return render_template(
             'forecasts/index.html',
             forecasts=forecasts,
+            suggestion=suggested_forecast(),
             can_interact=can_interact,
             title=trans('forecasts_index', default='Financial Forecasts', lang=session.get('lang', 'en'))
         )
@@ -86,6 +98,22 @@ def manage():
         flash(trans('forecasts_fetch_error', default='An error occurred'), 'danger')
         return redirect(url_for('forecasts.index'))
 
+@forecasts_bp.route('/suggestions')
+@login_required
+@utils.requires_role('startup')
+@utils.limiter.limit('60 per minute')
+def suggestions():
+    """Projected money in and out for the coming months, derived from the user's cashflow history (JSON API)."""
+    try:
+        forecast = get_forecast(utils.get_mongo_db(), str(current_user.id))
+        forecast['computed_at'] = forecast['computed_at'].isoformat() if forecast.get('computed_at') else None
+        response = jsonify(forecast)
+        response.headers['Cache-Control'] = 'private, max-age=300'
+        return response
+    except Exception as e:
+        logger.error(f"Error fetching forecast suggestions for user {current_user.id}: {str(e)}", extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
+        return jsonify({'error': trans('forecasts_fetch_error', default='An error occurred')}), 500
+
 @forecasts_bp.route('/view/<id>')
 @login_required
 @utils.requires_role('startup')
@@ -148,6 +176,7 @@ def view_page(id):
 @forecasts_bp.route('/generate_report/<id>')
 @login_required
 @utils.requires_role('startup')
+@heavy_endpoint()
 def generate_report(id):
     """Generate PDF report for a forecast."""
     try:
@@ -219,6 +248,7 @@ def generate_report(id):
 @forecasts_bp.route('/generate_report_csv/<id>')
 @login_required
 @utils.requires_role('startup')
+@heavy_endpoint()
 def generate_report_csv(id):
     """Generate CSV report for a forecast."""
     try:
@@ -282,6 +312,10 @@ def add():
         return redirect(url_for('dashboard.upgrade'))
 
     form = ForecastForm()
+    suggestion = suggested_forecast() if not form.is_submitted() else None
+    if suggestion:
+        form.projected_revenue.data = suggestion['suggested_revenue']
+        form.projected_expenses.data = suggestion['suggested_expenses']
     if form.validate_on_submit():
         try:
             db = utils.get_mongo_db()
@@ -295,9 +329,16 @@ def add():
                 'projected_expenses': form.projected_expenses.data,
                 'forecast_date': forecast_date,
                 'description': form.description.data,
-                'created_at': datetime.now(timezone.utc)
+                'created_at': datetime.now(timezone.utc),
+                'updated_at': datetime.now(timezone.utc)
             }
             db.records.insert_one(forecast_data)
+            utils.track_user_activity(
+                'forecast_added',
+                trans('forecast_added_description', lang=session.get('lang', 'en'), default=f"Forecast {forecast_data['title']}"),
+                amount=forecast_data['projected_revenue'],
+                related_id=str(forecast_data['_id'])
+            )
             
             logger.info(
                 f"Forecast added for user {current_user.id}",
@@ -315,6 +356,7 @@ def add():
     return render_template(
         'forecasts/add.html',
         form=form,
+        suggestion=suggestion,
         can_interact=utils.can_user_interact(current_user),
         title=trans('forecasts_add_forecast', default='Add Forecast', lang=session.get('lang', 'en'))
     )
@@ -404,8 +446,10 @@ def delete(id):
 
         db = utils.get_mongo_db()
         query = {'_id': ObjectId(id), 'type': 'forecast'} if utils.is_admin() else {'_id': ObjectId(id), 'user_id': str(current_user.id), 'type': 'forecast'}
-        result = db.records.delete_one(query)
-        if result.deleted_count:
+        deleted = db.records.find_one_and_delete(query, projection={'user_id': 1})
+        if deleted is not None:
+            # The owner's devices sync the tombstone, which matters when an admin deletes
+            create_tombstone(db, 'records', id, deleted['user_id'])
             logger.info(
                 f"Forecast {id} deleted for user {current_user.id}",
                 extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id}
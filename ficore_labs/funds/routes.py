@@ -12,8 +12,11 @@ from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
 from helpers.branding_helpers import draw_ficore_pdf_header, ficore_csv_header
+from helpers.admission import heavy_endpoint
+from helpers.monthly_analytics import invalidate_months
 import csv
 import utils
+from models import create_tombstone
 from translations import trans
 
 logger = logging.getLogger(__name__)
@@ -156,6 +159,7 @@ def view_page(id):
 @funds_bp.route('/generate_report/<id>')
 @login_required
 @utils.requires_role(['trader', 'startup', 'admin'])
+@heavy_endpoint()
 def generate_report(id):
     """Generate PDF report for a fund."""
     try:
@@ -228,6 +232,7 @@ def generate_report(id):
 @funds_bp.route('/generate_report_csv/<id>')
 @login_required
 @utils.requires_role(['trader', 'startup', 'admin'])
+@heavy_endpoint()
 def generate_report_csv(id):
     """Generate CSV report for a fund."""
     try:
@@ -304,9 +309,16 @@ def add():
                 'amount': utils.clean_currency(form.amount.data),
                 'category': form.category.data,
                 'description': utils.sanitize_input(form.description.data, max_length=500) if form.description.data else None,
-                'created_at': datetime.now(timezone.utc)
+                'created_at': datetime.now(timezone.utc),
+                'updated_at': datetime.now(timezone.utc)
             }
             db.records.insert_one(fund_data)
+            utils.track_user_activity(
+                'fund_added',
+                trans('fund_added_description', lang=session.get('lang', 'en'), default=f"Fund {fund_data['source']}"),
+                amount=fund_data['amount'],
+                related_id=str(fund_data['_id'])
+            )
             
             flash(trans('funds_add_success', default='Fund added successfully'), 'success')
             return redirect(url_for('funds.index'))
@@ -362,6 +374,7 @@ def edit(id):
                     {'_id': ObjectId(id)},
                     {'$set': updated_record}
                 )
+                invalidate_months(db, str(current_user.id), fund.get('created_at'))
                 flash(trans('funds_edit_success', default='Fund updated successfully'), 'success')
                 return redirect(url_for('funds.index'))
             except Exception as e:
@@ -396,8 +409,10 @@ def delete(id):
 
         db = utils.get_mongo_db()
         query = {'_id': ObjectId(id), 'user_id': str(current_user.id), 'type': 'fund'}
-        result = db.records.delete_one(query)
-        if result.deleted_count:
+        deleted = db.records.find_one_and_delete(query, projection={'created_at': 1})
+        if deleted:
+            create_tombstone(db, 'records', id, current_user.id)
+            invalidate_months(db, str(current_user.id), deleted.get('created_at'))
             flash(trans('funds_delete_success', default='Fund deleted successfully'), 'success')
         else:
             flash(trans('funds_record_not_found', default='Record not found'), 'danger')
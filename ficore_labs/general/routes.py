@@ -12,6 +12,7 @@ from models import create_feedback, get_mongo_db, get_user, create_waitlist_entr
 from flask import current_app
 import utils
 from users.routes import get_post_login_redirect
+from helpers.page_cache import PAGE_CACHE_HEADERS
 
 # Use the existing limiter from utils
 from utils import limiter
@@ -57,9 +58,7 @@ def landing():
             title=trans('general_welcome', lang=session.get('lang', 'en'), default='Welcome'),
             explore_features_for_template=explore_features
         ))
-        response.headers['Cache-Control'] = 'public, max-age=300'
-        response.headers['Pragma'] = 'no-cache'
-        response.headers['Expires'] = '0'
+        response.headers.update(PAGE_CACHE_HEADERS)
         return response
     except TemplateNotFound as e:
         current_app.logger.error(
@@ -294,6 +293,12 @@ def feedback():
                     'timestamp': datetime.now(timezone.utc)
                 }
                 create_feedback(db, feedback_entry)
+                if current_user.is_authenticated:
+                    utils.track_user_activity(
+                        'feedback_submitted',
+                        trans('feedback_submitted_description', lang=session.get('lang', 'en'), default=f"Submitted feedback for {tool_name.capitalize()}"),
+                        amount=int(rating)
+                    )
                 
                 db.audit_logs.insert_one({
                     'admin_id': 'system',
@@ -0,0 +1,227 @@
+"""
+Admin dashboard metrics snapshot.
+
+The dashboard used to run an exact count_documents({}) against every
+collection on each visit, which means a full scan of audit_logs and the other
+large collections. A periodic job now computes the figures once into a single
+system_stats document and the dashboard reads just that document:
+
+  * large, append-mostly collections use estimated_document_count(), which
+    reads collection metadata instead of scanning;
+  * users and active subscriptions stay exact, since admins act on them and
+    they are served by indexes;
+  * a per-day series of totals is kept on the same document (capped to
+    METRICS_HISTORY_DAYS) so growth can be charted without extra reads.
+
+The admin investor report is cached the same way: compute_investor_summary()
+totals records and cashflows with server-side $group/$facet pipelines, so the
+report costs a handful of small result documents whatever the data size.
+The all-users debt aging report (helpers.aging) is refreshed by the same job.
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+from helpers.aging import ADMIN_AGING_ID, refresh_admin_aging
+from helpers.scheduler import ScheduledJob
+from helpers.user_deletion import pending_deletion_ids
+
+logger = logging.getLogger(__name__)
+
+STATS_DOCUMENT_ID = 'admin_dashboard'
+INVESTOR_SUMMARY_ID = 'investor_report'
+INVESTOR_SUMMARY_MAX_AGE = 600
+TRAILING_WINDOW_DAYS = 30
+METRICS_HISTORY_DAYS = 90
+ESTIMATED_COLLECTIONS = ('records', 'cashflows', 'audit_logs', 'feedback', 'notifications')
+
+
+def compute_stats(db, now=None):
+    """
+    Compute the dashboard figures.
+
+    Args:
+        db: MongoDB database instance
+        now: Reference time (defaults to the current UTC time)
+
+    Returns:
+        dict: Collection totals plus user growth figures
+    """
+    now = now or datetime.now(timezone.utc)
+    start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    stats = {name: db[name].estimated_document_count() for name in ESTIMATED_COLLECTIONS}
+    stats['users'] = db.users.count_documents({})
+    stats['new_users_today'] = db.users.count_documents({'created_at': {'$gte': start_of_day}})
+    stats['active_subscriptions'] = db.users.count_documents({
+        'is_subscribed': True,
+        'subscription_end': {'$gte': now}
+    })
+    stats['active_trials'] = db.users.count_documents({
+        'is_trial': True,
+        'trial_end': {'$gte': now}
+    })
+    return stats
+
+
+def refresh_stats(db, now=None):
+    """
+    Recompute the snapshot and fold today's totals into the daily series.
+
+    Args:
+        db: MongoDB database instance
+        now: Reference time (defaults to the current UTC time)
+
+    Returns:
+        dict: The stored snapshot document
+    """
+    now = now or datetime.now(timezone.utc)
+    stats = compute_stats(db, now)
+    today = now.strftime('%Y-%m-%d')
+    existing = db.system_stats.find_one({'_id': STATS_DOCUMENT_ID}, {'daily': 1}) or {}
+    # One entry per day: later refreshes overwrite today's totals
+    daily = [entry for entry in existing.get('daily', []) if entry.get('date') != today]
+    daily.append({
+        'date': today,
+        'users': stats['users'],
+        'new_users': stats['new_users_today'],
+        'records': stats['records'],
+        'cashflows': stats['cashflows'],
+        'active_subscriptions': stats['active_subscriptions']
+    })
+    daily = daily[-METRICS_HISTORY_DAYS:]
+    snapshot = {'stats': stats, 'daily': daily, 'refreshed_at': now}
+    db.system_stats.update_one({'_id': STATS_DOCUMENT_ID}, {'$set': snapshot}, upsert=True)
+    snapshot['_id'] = STATS_DOCUMENT_ID
+    return snapshot
+
+
+def get_stats_snapshot(db, max_age=None):
+    """
+    Return the stored snapshot, refreshing it inline when missing or stale.
+
+    Args:
+        db: MongoDB database instance
+        max_age: Maximum age in seconds before an inline refresh (None disables)
+
+    Returns:
+        dict: Snapshot with 'stats', 'daily' and 'refreshed_at'
+    """
+    snapshot = db.system_stats.find_one({'_id': STATS_DOCUMENT_ID})
+    if snapshot is None:
+        return refresh_stats(db)
+    refreshed_at = snapshot.get('refreshed_at')
+    if refreshed_at is not None and refreshed_at.tzinfo is None:
+        refreshed_at = refreshed_at.replace(tzinfo=timezone.utc)
+    if max_age is not None and (refreshed_at is None or datetime.now(timezone.utc) - refreshed_at > timedelta(seconds=max_age)):
+        return refresh_stats(db)
+    return snapshot
+
+
+def compute_investor_summary(db, now=None):
+    """
+    Total funds, receivables, payables and cash movements across all users.
+
+    Args:
+        db: MongoDB database instance
+        now: Reference time for the trailing window (defaults to the current UTC time)
+
+    Returns:
+        dict: Numeric totals and counts for the investor report
+    """
+    now = now or datetime.now(timezone.utc)
+    visible = {'user_id': {'$nin': pending_deletion_ids(db)}}
+    records = {
+        row['_id']: row for row in db.records.aggregate([
+            {'$match': dict(visible, type={'$in': ['fund', 'debtor', 'creditor']})},
+            {'$group': {
+                '_id': '$type',
+                'total': {'$sum': {'$ifNull': ['$amount_owed', {'$ifNull': ['$amount', 0]}]}},
+                'count': {'$sum': 1}
+            }}
+        ])
+    }
+    group_by_type = {'$group': {'_id': '$type', 'total': {'$sum': {'$ifNull': ['$amount', 0]}}, 'count': {'$sum': 1}}}
+    facets = next(db.cashflows.aggregate([
+        {'$match': visible},
+        {'$facet': {
+            'all_time': [group_by_type],
+            'trailing': [
+                {'$match': {'created_at': {'$gte': now - timedelta(days=TRAILING_WINDOW_DAYS)}}},
+                group_by_type
+            ]
+        }}
+    ]), {'all_time': [], 'trailing': []})
+    all_time = {row['_id']: row for row in facets['all_time']}
+    trailing = {row['_id']: row for row in facets['trailing']}
+
+    def total(rows, key):
+        return float(rows.get(key, {}).get('total', 0) or 0)
+
+    summary = {
+        'total_funds': total(records, 'fund'),
+        'total_debtors': total(records, 'debtor'),
+        'total_creditors': total(records, 'creditor'),
+        'total_receipts': total(all_time, 'receipt'),
+        'total_payments': total(all_time, 'payment'),
+        'receipts_trailing': total(trailing, 'receipt'),
+        'payments_trailing': total(trailing, 'payment'),
+        'fund_count': records.get('fund', {}).get('count', 0),
+        'debtor_count': records.get('debtor', {}).get('count', 0),
+        'creditor_count': records.get('creditor', {}).get('count', 0)
+    }
+    summary['net_cashflow'] = summary['total_receipts'] - summary['total_payments']
+    summary['net_cashflow_trailing'] = summary['receipts_trailing'] - summary['payments_trailing']
+    summary['net_position'] = summary['total_funds'] - summary['total_creditors']
+    return summary
+
+
+def get_investor_summary(db, max_age=INVESTOR_SUMMARY_MAX_AGE, refresh=False):
+    """
+    Return the cached investor summary, recomputing it when older than max_age seconds.
+
+    Returns:
+        tuple: (summary dict, refreshed_at datetime)
+    """
+    now = datetime.now(timezone.utc)
+    cached = None if refresh else db.system_stats.find_one({'_id': INVESTOR_SUMMARY_ID})
+    if cached:
+        refreshed_at = cached.get('refreshed_at')
+        if refreshed_at is not None and refreshed_at.tzinfo is None:
+            refreshed_at = refreshed_at.replace(tzinfo=timezone.utc)
+        if refreshed_at is not None and now - refreshed_at <= timedelta(seconds=max_age):
+            return cached['summary'], refreshed_at
+    summary = compute_investor_summary(db, now)
+    db.system_stats.update_one(
+        {'_id': INVESTOR_SUMMARY_ID},
+        {'$set': {'summary': summary, 'refreshed_at': now}},
+        upsert=True
+    )
+    return summary, now
+
+
+def expire_cached_reports(db):
+    """Drop the cached investor summary and aging report so the next view recomputes them."""
+    db.system_stats.delete_many({'_id': {'$in': [INVESTOR_SUMMARY_ID, ADMIN_AGING_ID]}})
+
+
+class AdminMetrics(ScheduledJob):
+    """Refreshes the admin metrics snapshot and aging report on a leased interval."""
+
+    job_id = 'refresh_admin_metrics'
+    extension = 'admin_metrics'
+    enabled_setting = 'ADMIN_METRICS_ENABLED'
+    interval_setting = 'ADMIN_METRICS_INTERVAL'
+    default_interval = 900
+    run_at_start = True
+    label = 'Admin metrics refresh'
+
+    @property
+    def max_age(self):
+        """Snapshots older than two refresh intervals mean the job is not running."""
+        return 2 * self.interval
+
+    def run(self, db):
+        refresh_stats(db)
+        refresh_admin_aging(db)
+
+
+admin_metrics = AdminMetrics()
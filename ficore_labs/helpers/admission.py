@@ -0,0 +1,233 @@
+"""
+Admission control for CPU-heavy endpoints (PDF/CSV exports).
+
+Each worker process admits at most HEAVY_MAX_CONCURRENT heavy requests at a time
+and lets up to HEAVY_MAX_QUEUE more wait HEAVY_QUEUE_TIMEOUT seconds for a slot.
+Anything beyond that is rejected immediately with 503 and Retry-After so that
+interactive pages are never stuck behind a pile of report renders.
+
+The per-process limit only engages under a threaded worker class (gunicorn
+--worker-class gthread); a sync worker serves one request at a time. To bound
+heavy work across every worker and host, an admitted request must also hold one
+of HEAVY_CLUSTER_MAX_CONCURRENT leased slot documents in the admission_slots
+collection (0 disables this). Slots are leased for HEAVY_SLOT_LEASE seconds so
+a worker that dies mid-export cannot hold one forever.
+"""
+
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+from flask import request, session, jsonify, render_template, make_response
+from flask_login import current_user
+from pymongo.errors import DuplicateKeyError
+from translations import trans
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ('pdf', 'csv')
+SLOT_POLL_INTERVAL = 0.25
+
+
+class ClusterSlots:
+    """A fixed number of leased slot documents shared by every worker."""
+
+    def __init__(self, size=4, lease_seconds=300):
+        self.size = size
+        self.lease_seconds = lease_seconds
+        self.app = None
+
+    @property
+    def collection(self):
+        return self.app.extensions['mongo']['bizdb'].admission_slots
+
+    def try_acquire(self):
+        """Lease a free or expired slot; returns (slot id, holder token) or None."""
+        now = datetime.now(timezone.utc)
+        holder = uuid.uuid4().hex
+        for index in range(self.size):
+            slot_id = f'heavy:{index}'
+            try:
+                result = self.collection.update_one(
+                    {'_id': slot_id, '$or': [{'holder': None}, {'lease_until': {'$lte': now}}]},
+                    {'$set': {'holder': holder, 'pid': os.getpid(), 'lease_until': now + timedelta(seconds=self.lease_seconds)}},
+                    upsert=True
+                )
+            except DuplicateKeyError:
+                # The slot exists and is held by someone else
+                continue
+            if result.matched_count or result.upserted_id is not None:
+                return slot_id, holder
+        return None
+
+    def acquire(self, deadline):
+        """Poll for a slot until the monotonic deadline."""
+        while True:
+            ticket = self.try_acquire()
+            if ticket is not None or time.monotonic() >= deadline:
+                return ticket
+            time.sleep(min(SLOT_POLL_INTERVAL, max(deadline - time.monotonic(), 0)))
+
+    def release(self, ticket):
+        slot_id, holder = ticket
+        self.collection.update_one({'_id': slot_id, 'holder': holder}, {'$set': {'holder': None}, '$unset': {'lease_until': ''}})
+
+
+class AdmissionController:
+    """Counting semaphore with a bounded wait queue and simple counters."""
+
+    def __init__(self, max_concurrent=2, max_queue=4, queue_timeout=5.0, retry_after=10):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._cond = threading.Condition()
+        self._active = 0
+        self._queued = 0
+        self._stats = {'admitted': 0, 'rejected_full': 0, 'rejected_timeout': 0, 'rejected_cluster': 0, 'max_queued': 0}
+        self.cluster = None
+
+    def init_app(self, app):
+        self.max_concurrent = int(app.config.setdefault('HEAVY_MAX_CONCURRENT', int(os.getenv('HEAVY_MAX_CONCURRENT', self.max_concurrent))))
+        self.max_queue = int(app.config.setdefault('HEAVY_MAX_QUEUE', int(os.getenv('HEAVY_MAX_QUEUE', self.max_queue))))
+        self.queue_timeout = float(app.config.setdefault('HEAVY_QUEUE_TIMEOUT', float(os.getenv('HEAVY_QUEUE_TIMEOUT', self.queue_timeout))))
+        self.retry_after = int(app.config.setdefault('HEAVY_RETRY_AFTER', int(os.getenv('HEAVY_RETRY_AFTER', self.retry_after))))
+        cluster_size = int(app.config.setdefault('HEAVY_CLUSTER_MAX_CONCURRENT', int(os.getenv('HEAVY_CLUSTER_MAX_CONCURRENT', 4))))
+        lease_seconds = int(app.config.setdefault('HEAVY_SLOT_LEASE', int(os.getenv('HEAVY_SLOT_LEASE', 300))))
+        if cluster_size > 0:
+            self.cluster = ClusterSlots(cluster_size, lease_seconds)
+            self.cluster.app = app
+        app.extensions['heavy_admission'] = self
+
+    def acquire(self):
+        """
+        Return a ticket once a slot is held (pass it to release()), or None if
+        the request should be shed.
+        """
+        deadline = time.monotonic() + self.queue_timeout
+        if not self._acquire_local(deadline):
+            return None
+        if self.cluster is None:
+            return True
+        try:
+            ticket = self.cluster.acquire(deadline)
+        except Exception as e:
+            # The shared store is only a guard; fall back to the per-process limit
+            logger.warning(f"Cluster admission unavailable: {str(e)}", extra={'session_id': 'no-session-id'})
+            return True
+        if ticket is None:
+            self._release_local()
+            with self._cond:
+                self._stats['rejected_cluster'] += 1
+            return None
+        return ticket
+
+    def _acquire_local(self, deadline):
+        with self._cond:
+            if self._active < self.max_concurrent and self._queued == 0:
+                self._active += 1
+                self._stats['admitted'] += 1
+                return True
+            if self._queued >= self.max_queue:
+                self._stats['rejected_full'] += 1
+                return False
+            self._queued += 1
+            self._stats['max_queued'] = max(self._stats['max_queued'], self._queued)
+            try:
+                while self._active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['rejected_timeout'] += 1
+                        return False
+                    self._cond.wait(remaining)
+                self._active += 1
+                self._stats['admitted'] += 1
+                return True
+            finally:
+                self._queued -= 1
+
+    def release(self, ticket):
+        try:
+            if ticket is not True:
+                self.cluster.release(ticket)
+        except Exception as e:
+            logger.warning(f"Failed to release cluster admission slot {ticket[0]}: {str(e)}", extra={'session_id': 'no-session-id'})
+        finally:
+            self._release_local()
+
+    def _release_local(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'active': self._active,
+                'queued': self._queued,
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'cluster_max_concurrent': self.cluster.size if self.cluster else 0,
+                'pid': os.getpid(),
+                **self._stats
+            }
+
+
+heavy_admission = AdmissionController()
+
+
+def is_export_request():
+    """True when the request asks for a PDF or CSV rendering of a report."""
+    return request.values.get('format') in EXPORT_FORMATS
+
+
+def _overloaded_response(controller):
+    message = trans('general_server_busy', default='The server is busy generating other reports. Please try again shortly.', lang=session.get('lang', 'en'))
+    if request.accept_mimetypes.best == 'application/json' or request.is_json:
+        response = make_response(jsonify({'success': False, 'message': message}), 503)
+    else:
+        response = make_response(render_template('error/503.html', message=message, retry_after=controller.retry_after), 503)
+    response.headers['Retry-After'] = str(controller.retry_after)
+    return response
+
+
+def heavy_endpoint(predicate=None, controller=None):
+    """
+    Run the view under admission control.
+
+    The slot is held until the response is sent: a streamed response (e.g. a
+    CSV built from a cursor) releases it only when the server closes it.
+
+    Args:
+        predicate: Optional callable; when given, only requests for which it
+            returns True are counted as heavy (e.g. is_export_request)
+        controller: AdmissionController to use, defaults to heavy_admission
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            ctrl = controller or heavy_admission
+            if predicate is not None and not predicate():
+                return f(*args, **kwargs)
+            ticket = ctrl.acquire()
+            if ticket is None:
+                logger.warning(
+                    f"Shedding heavy request {request.endpoint}: {ctrl.stats()}",
+                    extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id if current_user.is_authenticated else 'anonymous'}
+                )
+                return _overloaded_response(ctrl)
+            try:
+                response = make_response(f(*args, **kwargs))
+            except Exception:
+                ctrl.release(ticket)
+                raise
+            if response.is_streamed:
+                response.call_on_close(lambda: ctrl.release(ticket))
+            else:
+                ctrl.release(ticket)
+            return response
+        return decorated_function
+    return decorator
@@ -0,0 +1,233 @@
+"""
+Aging of outstanding debtor and creditor balances.
+
+A debt's age is the number of days since its record was created; records
+with nothing left owed are ignored. compute_aging() buckets them into
+0-30, 31-60, 61-90 and 90+ days in one aggregation: $dateDiff computes the
+age, and a $facet runs one $bucket per debt type, so the report is eight
+small result documents whatever the number of records. Each bucket also
+counts debts whose reminder date has passed.
+
+Without a user_id the same pipeline covers every user. The admin report
+reads that from system_stats, where AdminMetrics refreshes it on its
+schedule (refresh_admin_aging()). The CSV exports stream from batched
+cursors: per record for a user, and per user for the admin version, whose
+summary is summed from its own rows instead of the stored report.
+"""
+
+import csv
+import logging
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+from helpers.user_deletion import pending_deletion_ids
+
+logger = logging.getLogger(__name__)
+
+DEBT_TYPES = ('debtor', 'creditor')
+AGING_BOUNDARIES = [0, 31, 61, 91]
+AGING_LABELS = {0: '0-30', 31: '31-60', 61: '61-90', 91: '90+'}
+ADMIN_AGING_ID = 'aging_report'
+ADMIN_AGING_MAX_AGE = 3600
+EXPORT_BATCH_SIZE = 500
+
+
+def _outstanding(match):
+    return dict(match, type={'$in': list(DEBT_TYPES)}, amount_owed={'$gt': 0})
+
+
+def _age_stage(now):
+    return {'$project': {
+        'user_id': 1,
+        'type': 1,
+        'amount': '$amount_owed',
+        'age_days': {'$max': [0, {'$dateDiff': {'startDate': '$created_at', 'endDate': now, 'unit': 'day'}}]},
+        'overdue': {'$and': [{'$eq': [{'$type': '$reminder_date'}, 'date']}, {'$lt': ['$reminder_date', now]}]}
+    }}
+
+
+def aging_pipeline(match, now):
+    """$match, age projection and one $bucket facet per debt type."""
+    output = {
+        'total': {'$sum': '$amount'},
+        'count': {'$sum': 1},
+        'overdue': {'$sum': {'$cond': ['$overdue', 1, 0]}}
+    }
+    return [
+        {'$match': _outstanding(match)},
+        _age_stage(now),
+        {'$facet': {
+            debt_type: [
+                {'$match': {'type': debt_type}},
+                {'$bucket': {'groupBy': '$age_days', 'boundaries': AGING_BOUNDARIES, 'default': AGING_BOUNDARIES[-1], 'output': output}}
+            ]
+            for debt_type in DEBT_TYPES
+        }}
+    ]
+
+
+def compute_aging(db, user_id=None, now=None):
+    """
+    Outstanding balances per age bucket.
+
+    Args:
+        user_id: Limit to one user's records (None covers every user not
+            pending deletion)
+
+    Returns:
+        dict: For each debt type a list of {'bucket', 'total', 'count',
+            'overdue'} in bucket order (zero-filled), plus 'totals' per type
+            and 'as_of'
+    """
+    now = now or datetime.now(timezone.utc)
+    match = {'user_id': user_id} if user_id is not None else {'user_id': {'$nin': pending_deletion_ids(db)}}
+    facets = next(db.records.aggregate(aging_pipeline(match, now), allowDiskUse=True), {})
+    report = {'as_of': now, 'totals': {}}
+    for debt_type in DEBT_TYPES:
+        rows = {row['_id']: row for row in facets.get(debt_type, [])}
+        buckets = []
+        for boundary in AGING_BOUNDARIES:
+            row = rows.get(boundary, {})
+            buckets.append({
+                'bucket': AGING_LABELS[boundary],
+                'total': round(float(row.get('total', 0) or 0), 2),
+                'count': row.get('count', 0),
+                'overdue': row.get('overdue', 0)
+            })
+        report[debt_type] = buckets
+        report['totals'][debt_type] = {
+            'total': round(sum(bucket['total'] for bucket in buckets), 2),
+            'count': sum(bucket['count'] for bucket in buckets),
+            'overdue': sum(bucket['overdue'] for bucket in buckets)
+        }
+    return report
+
+
+def refresh_admin_aging(db, now=None):
+    """Recompute the all-users aging report into system_stats."""
+    now = now or datetime.now(timezone.utc)
+    report = compute_aging(db, now=now)
+    db.system_stats.update_one({'_id': ADMIN_AGING_ID}, {'$set': {'report': report, 'refreshed_at': now}}, upsert=True)
+    return report
+
+
+def get_admin_aging(db, max_age=ADMIN_AGING_MAX_AGE, refresh=False):
+    """
+    Return the stored all-users aging report, recomputing it when older than max_age seconds.
+
+    Returns:
+        tuple: (report dict, refreshed_at datetime)
+    """
+    now = datetime.now(timezone.utc)
+    cached = None if refresh else db.system_stats.find_one({'_id': ADMIN_AGING_ID})
+    if cached:
+        refreshed_at = cached.get('refreshed_at')
+        if refreshed_at is not None and refreshed_at.tzinfo is None:
+            refreshed_at = refreshed_at.replace(tzinfo=timezone.utc)
+        if refreshed_at is not None and now - refreshed_at <= timedelta(seconds=max_age):
+            return cached['report'], refreshed_at
+    return refresh_admin_aging(db, now), now
+
+
+def bucket_label(age_days):
+    for boundary in reversed(AGING_BOUNDARIES):
+        if age_days >= boundary:
+            return AGING_LABELS[boundary]
+    return AGING_LABELS[0]
+
+
+def _csv_line(writer, buffer, row):
+    buffer.seek(0)
+    buffer.truncate(0)
+    writer.writerow(row)
+    return buffer.getvalue()
+
+
+def summary_rows(report):
+    """Header plus one row per debt type and bucket, for CSV and PDF exports."""
+    rows = [['Type', 'Bucket', 'Outstanding', 'Count', 'Reminder Overdue']]
+    for debt_type in DEBT_TYPES:
+        for bucket in report[debt_type]:
+            rows.append([debt_type, bucket['bucket'], f"{bucket['total']:.2f}", bucket['count'], bucket['overdue']])
+    return rows
+
+
+def iter_user_aging_csv(db, user_id, report, now=None):
+    """
+    Yield CSV text for a user's aging report: the bucket summary, then every
+    outstanding debt, oldest first, with its age and bucket.
+    """
+    now = now or datetime.now(timezone.utc)
+    buffer = StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    for row in summary_rows(report):
+        yield _csv_line(writer, buffer, row)
+    yield _csv_line(writer, buffer, [])
+    yield _csv_line(writer, buffer, ['Type', 'Name', 'Created', 'Age (days)', 'Bucket', 'Amount Owed', 'Reminder Date'])
+    cursor = db.records.find(
+        _outstanding({'user_id': user_id}),
+        {'type': 1, 'name': 1, 'created_at': 1, 'amount_owed': 1, 'reminder_date': 1}
+    ).sort('created_at', 1).batch_size(EXPORT_BATCH_SIZE)
+    try:
+        for record in cursor:
+            created_at = record.get('created_at')
+            if created_at is not None and created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=timezone.utc)
+            age_days = max((now - created_at).days, 0) if created_at else 0
+            reminder_date = record.get('reminder_date')
+            yield _csv_line(writer, buffer, [
+                record.get('type'),
+                record.get('name', ''),
+                created_at.strftime('%Y-%m-%d') if created_at else '',
+                age_days,
+                bucket_label(age_days),
+                f"{float(record.get('amount_owed') or 0):.2f}",
+                reminder_date.strftime('%Y-%m-%d') if reminder_date else ''
+            ])
+    finally:
+        cursor.close()
+
+
+def iter_admin_aging_csv(db, now=None):
+    """
+    Yield CSV text for the all-users aging report: one row per user and debt
+    type with their balance in each bucket, then the bucket summary.
+
+    The summary is summed from those same rows rather than read from the
+    stored report, so its totals always match the rows above it.
+    """
+    now = now or datetime.now(timezone.utc)
+    buffer = StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    yield _csv_line(writer, buffer, ['User', 'Type'] + [AGING_LABELS[boundary] for boundary in AGING_BOUNDARIES] + ['Outstanding', 'Count'])
+    bucket_sums = {}
+    for boundary, upper in zip(AGING_BOUNDARIES, AGING_BOUNDARIES[1:] + [None]):
+        in_bucket = {'$and': [{'$gte': ['$age_days', boundary]}, {'$lt': ['$age_days', upper]}]} if upper else {'$gte': ['$age_days', boundary]}
+        bucket_sums[f'b{boundary}'] = {'$sum': {'$cond': [in_bucket, '$amount', 0]}}
+        bucket_sums[f'c{boundary}'] = {'$sum': {'$cond': [in_bucket, 1, 0]}}
+        bucket_sums[f'o{boundary}'] = {'$sum': {'$cond': [{'$and': [in_bucket, '$overdue']}, 1, 0]}}
+    summary = {debt_type: {boundary: {'total': 0.0, 'count': 0, 'overdue': 0} for boundary in AGING_BOUNDARIES} for debt_type in DEBT_TYPES}
+    cursor = db.records.aggregate([
+        {'$match': _outstanding({'user_id': {'$nin': pending_deletion_ids(db)}})},
+        _age_stage(now),
+        {'$group': dict(bucket_sums, _id={'user_id': '$user_id', 'type': '$type'}, total={'$sum': '$amount'}, count={'$sum': 1})},
+        {'$sort': {'_id.user_id': 1, '_id.type': 1}}
+    ], allowDiskUse=True, batchSize=EXPORT_BATCH_SIZE)
+    try:
+        for row in cursor:
+            for boundary in AGING_BOUNDARIES:
+                bucket = summary[row['_id']['type']][boundary]
+                bucket['total'] += float(row[f'b{boundary}'])
+                bucket['count'] += row[f'c{boundary}']
+                bucket['overdue'] += row[f'o{boundary}']
+            yield _csv_line(writer, buffer, [row['_id'].get('user_id'), row['_id'].get('type')]
+                            + [f"{float(row[f'b{boundary}']):.2f}" for boundary in AGING_BOUNDARIES]
+                            + [f"{float(row['total']):.2f}", row['count']])
+    finally:
+        cursor.close()
+    report = {
+        debt_type: [dict(summary[debt_type][boundary], bucket=AGING_LABELS[boundary], total=round(summary[debt_type][boundary]['total'], 2)) for boundary in AGING_BOUNDARIES]
+        for debt_type in DEBT_TYPES
+    }
+    yield _csv_line(writer, buffer, [])
+    for row in summary_rows(report):
+        yield _csv_line(writer, buffer, row)
@@ -0,0 +1,201 @@
+"""
+Fingerprinted, precompressed static asset pipeline.
+
+build_assets() copies every asset under static/ (except the web manifests,
+whose URLs must stay stable) to static/dist/ under a content-hashed name,
+rewrites relative url() references inside CSS to the hashed names, writes .gz
+and .br siblings for compressible types and records the mapping in
+static/dist/manifest.json.
+
+At runtime init_assets() exposes static_url() to templates and serves
+/assets/<hashed name> with the best precompressed variant and immutable cache
+headers, so workers never recompress the same bytes. Without a manifest (e.g.
+a fresh checkout) static_url() falls back to the plain static route.
+
+Build manually with:
+
+    python -m helpers.assets
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+import tempfile
+from flask import current_app, request, send_file, url_for, abort
+
+try:
+    import brotli
+except ImportError:  # Flask-Compress normally pulls it in; gzip still works without it
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+EXCLUDED_FILES = {'manifest.json', 'site.webmanifest', 'img/site.webmanifest'}
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.svg', '.json', '.ico', '.txt', '.map', '.woff'}
+CSS_URL_RE = re.compile(r'url\(\s*([\'"]?)([^\'")]+?)([?#][^\'")]*)?\1\s*\)')
+
+_manifest = {}
+
+
+def _hashed_name(path, digest):
+    root, ext = posixpath.splitext(path)
+    return f'{root}.{digest[:10]}{ext}'
+
+
+def _atomic_write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _rewrite_css(css_path, content, assets):
+    """Point relative url() references at the fingerprinted files."""
+    base = posixpath.dirname(css_path)
+
+    def replace(match):
+        quote, target, suffix = match.group(1), match.group(2), match.group(3) or ''
+        if target.startswith(('data:', 'http:', 'https:', '//', '/')):
+            return match.group(0)
+        resolved = posixpath.normpath(posixpath.join(base, target))
+        if resolved not in assets:
+            return match.group(0)
+        # Fragments (#iefix, #svg ids) still matter; cache-busting queries do not
+        fragment = suffix if suffix.startswith('#') else ''
+        relative = posixpath.relpath(assets[resolved], base)
+        return f'url({quote}{relative}{fragment}{quote})'
+
+    return CSS_URL_RE.sub(replace, content.decode('utf-8')).encode('utf-8')
+
+
+def _source_files(static_dir):
+    for root, dirs, files in os.walk(static_dir):
+        rel_root = os.path.relpath(root, static_dir)
+        if rel_root.split(os.sep)[0] == DIST_DIR:
+            dirs[:] = []
+            continue
+        for name in sorted(files):
+            rel_path = posixpath.normpath(posixpath.join(rel_root.replace(os.sep, '/'), name))
+            if rel_path not in EXCLUDED_FILES and not name.startswith('.'):
+                yield rel_path
+
+
+def build_assets(static_dir):
+    """
+    Fingerprint and precompress everything under static_dir.
+
+    Args:
+        static_dir: Absolute path of the Flask static folder
+
+    Returns:
+        dict: The manifest that was written
+    """
+    dist_dir = os.path.join(static_dir, DIST_DIR)
+    sources = sorted(_source_files(static_dir), key=lambda p: p.endswith('.css'))
+    assets = {}
+    for rel_path in sources:
+        with open(os.path.join(static_dir, rel_path), 'rb') as f:
+            content = f.read()
+        if rel_path.endswith('.css'):
+            # Non-CSS assets sort first, so every url() target is already hashed
+            content = _rewrite_css(rel_path, content, assets)
+        hashed = _hashed_name(rel_path, hashlib.sha256(content).hexdigest())
+        assets[rel_path] = hashed
+        out_path = os.path.join(dist_dir, hashed)
+        if os.path.exists(out_path):
+            continue
+        _atomic_write(out_path, content)
+        if posixpath.splitext(rel_path)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+            _atomic_write(out_path + '.gz', gzip.compress(content, compresslevel=9, mtime=0))
+            if brotli is not None:
+                _atomic_write(out_path + '.br', brotli.compress(content, quality=11))
+
+    version = hashlib.sha256(json.dumps(assets, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+    manifest = {'version': version, 'assets': assets}
+    _atomic_write(os.path.join(dist_dir, MANIFEST_NAME), json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    logger.info(f"Built {len(assets)} static assets, version {version}", extra={'session_id': 'none', 'user_role': 'none', 'ip_address': 'none'})
+    return manifest
+
+
+def _manifest_is_stale(static_dir):
+    manifest_path = os.path.join(static_dir, DIST_DIR, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return True
+    built_at = os.path.getmtime(manifest_path)
+    return any(os.path.getmtime(os.path.join(static_dir, p)) > built_at for p in _source_files(static_dir))
+
+
+def load_manifest(static_dir):
+    manifest_path = os.path.join(static_dir, DIST_DIR, MANIFEST_NAME)
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def asset_version():
+    """Deploy-specific version derived from the asset contents."""
+    return _manifest.get('version', 'dev')
+
+
+def asset_manifest():
+    return dict(_manifest.get('assets', {}))
+
+
+def static_url(filename):
+    """URL of the fingerprinted asset, or the plain static URL when unbuilt."""
+    hashed = _manifest.get('assets', {}).get(filename)
+    if hashed:
+        return url_for('hashed_static', filename=hashed)
+    return url_for('static', filename=filename)
+
+
+def serve_hashed_static(filename):
+    """Serve a fingerprinted file, preferring a precompressed variant."""
+    dist_dir = os.path.join(current_app.static_folder, DIST_DIR)
+    path = os.path.normpath(os.path.join(dist_dir, filename))
+    if not path.startswith(dist_dir + os.sep) or not os.path.isfile(path):
+        abort(404)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    accepted = request.accept_encodings
+    encoding = None
+    for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if accepted[candidate] and os.path.isfile(path + suffix):
+            encoding, path = candidate, path + suffix
+            break
+    response = send_file(path, mimetype=mimetype, max_age=31536000, conditional=True, etag=True)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+
+def init_assets(app):
+    global _manifest
+    static_dir = app.static_folder
+    if os.getenv('ASSET_BUILD_ON_STARTUP', 'true').lower() == 'true' and _manifest_is_stale(static_dir):
+        try:
+            build_assets(static_dir)
+        except Exception as e:
+            logger.error(f"Static asset build failed, serving unhashed files: {str(e)}", extra={'session_id': 'none', 'user_role': 'none', 'ip_address': 'none'})
+    _manifest = load_manifest(static_dir)
+    app.add_url_rule('/assets/<path:filename>', endpoint='hashed_static', view_func=serve_hashed_static)
+    app.jinja_env.globals['static_url'] = static_url
+    app.jinja_env.globals['asset_version'] = asset_version
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    manifest = build_assets(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static'))
+    print(f"Wrote {len(manifest['assets'])} assets, version {manifest['version']}")
@@ -0,0 +1,150 @@
+"""
+Query layer for the admin audit log explorer.
+
+audit_logs is append-only and grows without bound, so every query here is
+shaped to walk an index in _id order and stop after one page:
+
+  * rows are ordered by _id (newest first). ObjectIds embed their insert time,
+    so the date range filter becomes an _id range and keyset pagination is a
+    single `_id < cursor` condition;
+  * each filter has a matching (field, _id) compound index. The user filter
+    matches the acting admin, the user a row is about (details.user_id) and
+    the user who performed a self-service action (user_id); MongoDB merges the
+    three index scans without an in-memory sort.
+"""
+
+import csv
+import json
+from datetime import datetime, time, timedelta, timezone
+from io import StringIO
+from bson import ObjectId
+from bson.errors import InvalidId
+
+AUDIT_PAGE_SIZE = 50
+AUDIT_MAX_PAGE_SIZE = 500
+EXPORT_BATCH_SIZE = 1000
+CSV_FIELDS = ('timestamp', 'action', 'admin_id', 'user_id', 'ip_address', 'details')
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+    except ValueError:
+        return None
+
+
+def _parse_object_id(value):
+    try:
+        return ObjectId(value) if value else None
+    except (InvalidId, TypeError):
+        return None
+
+
+def build_audit_query(args):
+    """
+    Translate request args into an audit_logs query.
+
+    Args:
+        args: Mapping with optional user_id, action, ip_address,
+            start_date / end_date (YYYY-MM-DD, inclusive)
+
+    Returns:
+        tuple: (query dict, normalized filters dict for links and forms)
+    """
+    filters = {}
+    conditions = []
+    user_id = (args.get('user_id') or '').strip().lower()
+    if user_id:
+        filters['user_id'] = user_id
+        conditions.append({'$or': [{'user_id': user_id}, {'admin_id': user_id}, {'details.user_id': user_id}]})
+    action = (args.get('action') or '').strip()
+    if action:
+        filters['action'] = action
+        conditions.append({'action': action})
+    ip_address = (args.get('ip_address') or '').strip()
+    if ip_address:
+        filters['ip_address'] = ip_address
+        conditions.append({'ip_address': ip_address})
+    id_range = {}
+    start_date = _parse_date(args.get('start_date'))
+    if start_date:
+        filters['start_date'] = start_date.isoformat()
+        id_range['$gte'] = ObjectId.from_datetime(datetime.combine(start_date, time.min, tzinfo=timezone.utc))
+    end_date = _parse_date(args.get('end_date'))
+    if end_date:
+        filters['end_date'] = end_date.isoformat()
+        id_range['$lt'] = ObjectId.from_datetime(datetime.combine(end_date + timedelta(days=1), time.min, tzinfo=timezone.utc))
+    if id_range:
+        conditions.append({'_id': id_range})
+    return ({'$and': conditions} if conditions else {}), filters
+
+
+def find_audit_page(db, args, page_size=AUDIT_PAGE_SIZE):
+    """
+    Load one keyset page of audit logs, newest first.
+
+    'before' returns the page older than the given _id, 'after' the page newer
+    than it.
+
+    Returns:
+        dict: logs, filters, and older / newer cursors (None at either end)
+    """
+    query, filters = build_audit_query(args)
+    before = _parse_object_id(args.get('before'))
+    after = _parse_object_id(args.get('after'))
+    if after is not None:
+        cursor_query = {'$and': [query, {'_id': {'$gt': after}}]}
+        logs = list(db.audit_logs.find(cursor_query).sort('_id', 1).limit(page_size + 1))
+        has_newer = len(logs) > page_size
+        logs = logs[:page_size][::-1]
+        has_older = True
+    else:
+        cursor_query = {'$and': [query, {'_id': {'$lt': before}}]} if before is not None else query
+        logs = list(db.audit_logs.find(cursor_query).sort('_id', -1).limit(page_size + 1))
+        has_older = len(logs) > page_size
+        logs = logs[:page_size]
+        has_newer = before is not None
+    return {
+        'logs': logs,
+        'filters': filters,
+        'older': str(logs[-1]['_id']) if logs and has_older else None,
+        'newer': str(logs[0]['_id']) if logs and has_newer else None
+    }
+
+
+def serialize_audit_log(log):
+    """JSON-safe representation of an audit log row."""
+    timestamp = log.get('timestamp')
+    return {
+        'id': str(log['_id']),
+        'timestamp': timestamp.isoformat() if timestamp else None,
+        'action': log.get('action'),
+        'admin_id': log.get('admin_id'),
+        'user_id': log.get('user_id') or (log.get('details') or {}).get('user_id'),
+        'ip_address': log.get('ip_address'),
+        'details': log.get('details') or {}
+    }
+
+
+def iter_audit_csv(db, args):
+    """
+    Yield CSV text for every audit log matching args, newest first.
+
+    Rows are read through a batched cursor and written one at a time, so the
+    export never holds more than EXPORT_BATCH_SIZE documents.
+    """
+    query, _ = build_audit_query(args)
+    buffer = StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(CSV_FIELDS)
+    yield buffer.getvalue()
+    cursor = db.audit_logs.find(query).sort('_id', -1).batch_size(EXPORT_BATCH_SIZE)
+    try:
+        for log in cursor:
+            row = serialize_audit_log(log)
+            buffer.seek(0)
+            buffer.truncate(0)
+            writer.writerow([row['timestamp'], row['action'], row['admin_id'], row['user_id'], row['ip_address'], json.dumps(row['details'], default=str)])
+            yield buffer.getvalue()
+    finally:
+        cursor.close()
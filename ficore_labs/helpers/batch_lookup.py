@@ -0,0 +1,79 @@
+"""
+Batch resolution of referenced users for admin list views.
+
+Admin pages list documents (receipts, KYC submissions, ...) that reference a
+user by user_id. Rather than one users.find_one per row, collect the distinct
+ids on the page and resolve them with a single $in query, projected down to
+the fields the view shows. paginate_query() provides the page itself: a
+status-filtered, sorted skip/limit window plus the total for page links.
+"""
+
+import math
+
+DEFAULT_PER_PAGE = 25
+MAX_PER_PAGE = 100
+USER_SUMMARY_PROJECTION = {'email': 1, 'display_name': 1, 'role': 1}
+
+
+def resolve_users(db, user_ids, projection=None):
+    """
+    Fetch users by id in one query.
+
+    Args:
+        db: MongoDB database instance
+        user_ids: Iterable of user ids (duplicates and empty values are ignored)
+        projection: Fields to load (defaults to USER_SUMMARY_PROJECTION)
+
+    Returns:
+        dict: user_id -> user document, for the ids that exist
+    """
+    ids = list({user_id for user_id in user_ids if user_id})
+    if not ids:
+        return {}
+    cursor = db.users.find({'_id': {'$in': ids}}, projection or USER_SUMMARY_PROJECTION)
+    return {user['_id']: user for user in cursor}
+
+
+def attach_users(db, documents, field='user_id', target='user', projection=None):
+    """
+    Set documents[i][target] to the user referenced by documents[i][field].
+
+    Missing users resolve to None so templates can fall back explicitly.
+    """
+    users = resolve_users(db, (document.get(field) for document in documents), projection)
+    for document in documents:
+        document[target] = users.get(document.get(field))
+    return documents
+
+
+def page_args(args, allowed_statuses):
+    """
+    Read page, per_page and status from request args, clamped to sane values.
+
+    Returns:
+        tuple: (page, per_page, status or None)
+    """
+    try:
+        page = max(int(args.get('page', 1)), 1)
+    except (TypeError, ValueError):
+        page = 1
+    try:
+        per_page = min(max(int(args.get('per_page', DEFAULT_PER_PAGE)), 1), MAX_PER_PAGE)
+    except (TypeError, ValueError):
+        per_page = DEFAULT_PER_PAGE
+    status = args.get('status')
+    return page, per_page, status if status in allowed_statuses else None
+
+
+def paginate_query(collection, query, sort, page, per_page, projection=None):
+    """
+    Load one page of a sorted query.
+
+    Returns:
+        dict: items, page, per_page, total and pages
+    """
+    total = collection.count_documents(query)
+    pages = max(math.ceil(total / per_page), 1)
+    page = min(page, pages)
+    items = list(collection.find(query, projection).sort(sort).skip((page - 1) * per_page).limit(per_page))
+    return {'items': items, 'page': page, 'per_page': per_page, 'total': total, 'pages': pages}
@@ -0,0 +1,332 @@
+"""
+Content-addressed storage for user uploads (KYC ID photos, payment receipts).
+
+Uploads used to be written with file.save() to directories on the web host,
+which other workers and hosts cannot see. They now go through BlobStorage:
+
+  * the upload is read in CHUNK_SIZE chunks into a spooled temp file while its
+    SHA-256 is computed, and rejected as soon as it passes the size limit;
+  * the hash of the uploaded bytes is the blob key. If a blob with that key
+    already exists, nothing is written again;
+  * images are downscaled to MAX_IMAGE_DIMENSION and recompressed with Pillow,
+    keeping the smaller of the original and the re-encoded bytes;
+  * bytes live in a backend: GridFS (default, shared by every worker) or a
+    local directory (BLOB_STORAGE_BACKEND=local, for development). Metadata
+    lives in the blobs collection either way;
+  * thumbnails for admin review pages are generated on first request and
+    stored as blobs themselves, referenced from the original's metadata;
+  * since one blob can back several users' uploads, each blob lists the
+    user_ids that stored it in 'owners'. release_owner() drops a deleted user
+    from them and removes blobs nobody owns any more, bytes and thumbnails
+    included.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import uuid
+from datetime import datetime, timezone
+from io import BytesIO
+from gridfs import GridFSBucket
+from gridfs.errors import FileExists, NoFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+SPOOL_SIZE = 1024 * 1024
+MAX_UPLOAD_SIZE = 5 * 1024 * 1024
+MAX_IMAGE_DIMENSION = 2048
+JPEG_QUALITY = 85
+THUMBNAIL_SIZES = (128, 256, 512)
+IMAGE_FORMATS = {'JPEG': 'image/jpeg', 'PNG': 'image/png'}
+PDF_MAGIC = b'%PDF-'
+
+
+class BlobTooLarge(ValueError):
+    """The upload is larger than the allowed size."""
+
+
+class UnsupportedBlobType(ValueError):
+    """The upload is not a JPEG, PNG or PDF file."""
+
+
+class GridFSBackend:
+    """Stores blob bytes in the blob_files GridFS bucket, keyed by content hash."""
+
+    def __init__(self, db):
+        self.bucket = GridFSBucket(db, bucket_name='blob_files')
+
+    def put(self, key, stream, content_type):
+        try:
+            self.bucket.upload_from_stream_with_id(key, key, stream, chunk_size_bytes=CHUNK_SIZE, metadata={'content_type': content_type})
+        except FileExists:
+            pass
+
+    def open(self, key):
+        """Return a readable file object for the blob, or None if it is missing."""
+        try:
+            return self.bucket.open_download_stream(key)
+        except NoFile:
+            return None
+
+    def delete(self, key):
+        try:
+            self.bucket.delete(key)
+        except NoFile:
+            pass
+
+
+class LocalBackend:
+    """Stores blob bytes under a directory, fanned out by the first hash characters."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def put(self, key, stream, content_type):
+        path = self.path(key)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'wb') as f:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                f.write(chunk)
+        os.replace(tmp_path, path)
+
+    def open(self, key):
+        path = self.path(key)
+        return open(path, 'rb') if os.path.exists(path) else None
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+
+def spool_upload(stream, max_size=MAX_UPLOAD_SIZE):
+    """
+    Copy an upload stream into a spooled temp file in chunks, hashing as it goes.
+
+    Returns:
+        tuple: (spooled file positioned at 0, SHA-256 hex digest, size in bytes)
+
+    Raises:
+        BlobTooLarge: If the stream passes max_size bytes
+    """
+    digest = hashlib.sha256()
+    spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    size = 0
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+        size += len(chunk)
+        if size > max_size:
+            spooled.close()
+            raise BlobTooLarge(f"Upload exceeds {max_size} bytes")
+        digest.update(chunk)
+        spooled.write(chunk)
+    spooled.seek(0)
+    return spooled, digest.hexdigest(), size
+
+
+def detect_content_type(spooled):
+    """Identify the upload from its bytes rather than the client's filename or header."""
+    head = spooled.read(len(PDF_MAGIC))
+    spooled.seek(0)
+    if head == PDF_MAGIC:
+        return 'application/pdf'
+    try:
+        with Image.open(spooled) as image:
+            image_format = image.format
+    except (UnidentifiedImageError, OSError):
+        image_format = None
+    spooled.seek(0)
+    if image_format not in IMAGE_FORMATS:
+        raise UnsupportedBlobType("Only JPEG, PNG and PDF uploads are accepted")
+    return IMAGE_FORMATS[image_format]
+
+
+def optimize_image(spooled, size):
+    """
+    Downscale and recompress an image upload.
+
+    Returns:
+        file object: The re-encoded image if it is smaller than the original,
+            otherwise the original spooled file
+    """
+    with Image.open(spooled) as image:
+        image_format = image.format
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((MAX_IMAGE_DIMENSION, MAX_IMAGE_DIMENSION))
+        output = BytesIO()
+        if image_format == 'JPEG':
+            image.convert('RGB').save(output, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+        else:
+            image.save(output, 'PNG', optimize=True)
+    spooled.seek(0)
+    if output.tell() >= size:
+        return spooled
+    output.seek(0)
+    return output
+
+
+class BlobStorage:
+    """Flask extension fronting the configured blob backend and the blobs metadata collection."""
+
+    def __init__(self):
+        self.app = None
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('BLOB_STORAGE_BACKEND', os.getenv('BLOB_STORAGE_BACKEND', 'gridfs'))
+        app.config.setdefault('BLOB_STORAGE_DIR', os.getenv('BLOB_STORAGE_DIR', os.path.join(app.root_path, 'uploads', 'blobs')))
+        app.extensions['blob_storage'] = self
+
+    @property
+    def db(self):
+        return self.app.extensions['mongo']['bizdb']
+
+    @property
+    def backend(self):
+        if self.app.config['BLOB_STORAGE_BACKEND'] == 'local':
+            return LocalBackend(self.app.config['BLOB_STORAGE_DIR'])
+        return GridFSBackend(self.db)
+
+    def store(self, stream, filename=None, owner=None, max_size=MAX_UPLOAD_SIZE):
+        """
+        Store an upload and return its blob document.
+
+        Args:
+            stream: Readable binary stream (e.g. FileStorage.stream)
+            filename: Original filename, kept for downloads
+            owner: user_id of the uploader, added to the blob's owners
+            max_size: Largest accepted upload in bytes
+
+        Raises:
+            BlobTooLarge, UnsupportedBlobType
+        """
+        spooled, key, size = spool_upload(stream, max_size)
+        try:
+            owners = [owner] if owner is not None else []
+            existing = self.db.blobs.find_one_and_update(
+                {'_id': key},
+                {'$addToSet': {'owners': {'$each': owners}}},
+                return_document=ReturnDocument.AFTER
+            )
+            if existing:
+                return existing
+            content_type = detect_content_type(spooled)
+            data = optimize_image(spooled, size) if content_type != 'application/pdf' else spooled
+            data.seek(0, os.SEEK_END)
+            stored_size = data.tell()
+            data.seek(0)
+            self.backend.put(key, data, content_type)
+            blob = {
+                '_id': key,
+                'content_type': content_type,
+                'filename': filename,
+                'size': stored_size,
+                'original_size': size,
+                'backend': self.app.config['BLOB_STORAGE_BACKEND'],
+                'thumbnails': {},
+                'owners': owners,
+                'created_at': datetime.now(timezone.utc)
+            }
+            try:
+                self.db.blobs.insert_one(blob)
+            except DuplicateKeyError:
+                blob = self.db.blobs.find_one_and_update(
+                    {'_id': key},
+                    {'$addToSet': {'owners': {'$each': owners}}},
+                    return_document=ReturnDocument.AFTER
+                )
+            return blob
+        finally:
+            spooled.close()
+
+    def open(self, key):
+        """
+        Return (blob document, readable file object), or (None, None) if unknown.
+        """
+        blob = self.db.blobs.find_one({'_id': key})
+        if blob is None:
+            return None, None
+        stream = self.backend.open(key)
+        if stream is None:
+            logger.error(f"Blob {key} has metadata but no stored bytes", extra={'session_id': 'no-session-id'})
+            return None, None
+        return blob, stream
+
+    def thumbnail(self, key, size):
+        """
+        Return the thumbnail blob key for an image blob, generating it on first use.
+
+        Returns:
+            str or None: Thumbnail key, or None for unknown or non-image blobs
+        """
+        size = min(THUMBNAIL_SIZES, key=lambda candidate: abs(candidate - size))
+        blob, stream = self.open(key)
+        if blob is None:
+            return None
+        try:
+            if blob['content_type'] not in IMAGE_FORMATS.values():
+                return None
+            cached = blob.get('thumbnails', {}).get(str(size))
+            if cached:
+                return cached
+            with Image.open(stream) as image:
+                image = ImageOps.exif_transpose(image)
+                image.thumbnail((size, size))
+                output = BytesIO()
+                image.convert('RGB').save(output, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+        finally:
+            stream.close()
+        output.seek(0)
+        thumb = self.store(output, filename=f'thumb_{size}_{key}.jpg')
+        self.db.blobs.update_one({'_id': key}, {'$set': {f'thumbnails.{size}': thumb['_id']}})
+        return thumb['_id']
+
+    def delete(self, key):
+        """Remove a blob's bytes and metadata."""
+        self.backend.delete(key)
+        self.db.blobs.delete_one({'_id': key})
+
+    def release_owner(self, owner, limit=None):
+        """
+        Drop owner from the blobs they uploaded and delete those left without
+        owners, together with thumbnails no one else owns.
+
+        Args:
+            limit: Release at most this many blobs (None for all)
+
+        Returns:
+            int: Number of blobs released
+        """
+        cursor = self.db.blobs.find({'owners': owner}, {'_id': 1})
+        if limit:
+            cursor = cursor.limit(limit)
+        keys = [doc['_id'] for doc in cursor]
+        for key in keys:
+            blob = self.db.blobs.find_one_and_update(
+                {'_id': key},
+                {'$pull': {'owners': owner}},
+                return_document=ReturnDocument.AFTER
+            )
+            if blob is None or blob.get('owners'):
+                continue
+            for thumb_key in blob.get('thumbnails', {}).values():
+                if self.db.blobs.find_one({'_id': thumb_key, 'owners.0': {'$exists': True}}, {'_id': 1}) is None:
+                    self.delete(thumb_key)
+            # Claimed again by a concurrent upload in the meantime
+            if self.db.blobs.find_one({'_id': key, 'owners.0': {'$exists': True}}, {'_id': 1}) is None:
+                self.delete(key)
+        return len(keys)
+
+
+blob_storage = BlobStorage()
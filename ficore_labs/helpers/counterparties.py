@@ -0,0 +1,245 @@
+"""
+Per-user counterparty directory behind the party-name typeahead.
+
+Every cashflow and debtor/creditor write calls record_counterparty(), which
+upserts one counterparties document per (user, normalized name): the latest
+spelling, a use count, the last time it was used and the kinds of entry it
+has appeared on. normalize_name() folds case, punctuation and spacing, so
+"Aminu Stores", "aminu  stores." and "AMINU STORES" are one counterparty.
+
+Suggestions are ranked by frequency decayed by age (see score()), with
+parties already seen on the same kind of entry first. Active users are
+answered from a per-process LRU of their top MAX_CACHED_PARTIES
+counterparties, which this process drops on its own writes and which
+expires after CACHE_TTL_SECONDS for writes made by other workers. Users
+with larger directories fall through to an anchored prefix query on the
+(user_id, name_key) index.
+
+Users who had entries before the directory existed are backfilled from
+their cashflows and debtors/creditors on their first typeahead request,
+whether or not writes since then have already started their directory.
+"""
+
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+SUGGESTION_LIMIT = 8
+MAX_CACHED_USERS = 512
+MAX_CACHED_PARTIES = 500
+CACHE_TTL_SECONDS = 60
+HALF_LIFE_DAYS = 30
+PREFIX_CANDIDATES = 200
+PARTY_PROJECTION = {'name': 1, 'name_key': 1, 'kinds': 1, 'count': 1, 'last_used_at': 1, 'contact': 1}
+
+# Kinds that deal with the same side of the ledger rank ahead of the rest
+RELATED_KINDS = {
+    'receipt': ('receipt', 'debtor'),
+    'debtor': ('debtor', 'receipt'),
+    'payment': ('payment', 'creditor'),
+    'creditor': ('creditor', 'payment'),
+}
+
+
+def normalize_name(name):
+    """Case-, accent-, punctuation- and whitespace-insensitive key for a party name."""
+    if not name:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', name)
+    folded = ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+    return ' '.join(re.sub(r'[^\w\s]', ' ', folded).split())
+
+
+def counterparty_update(user_id, name, kind, contact=None, when=None):
+    """Build the upsert for one use of a counterparty, or None if the name is blank."""
+    name_key = normalize_name(name)
+    if not name_key:
+        return None
+    when = when or datetime.now(timezone.utc)
+    update = {
+        '$set': {'name': ' '.join(name.split()), 'user_id': user_id, 'name_key': name_key},
+        '$inc': {'count': 1},
+        '$max': {'last_used_at': when},
+        '$addToSet': {'kinds': kind},
+        '$setOnInsert': {'created_at': when}
+    }
+    if contact:
+        update['$set']['contact'] = contact
+    return UpdateOne({'_id': f'{user_id}:{name_key}'}, update, upsert=True)
+
+
+def record_counterparty(db, user_id, name, kind, contact=None, when=None):
+    """Count one use of a counterparty on a cashflow or debtor/creditor record."""
+    record_counterparties(db, user_id, [(name, kind, contact)], when)
+
+
+def record_counterparties(db, user_id, entries, when=None):
+    """
+    Count several uses at once.
+
+    The directory only feeds suggestions, so a failure is logged rather than
+    failing the ledger write that triggered it.
+
+    Args:
+        entries: Iterable of (name, kind, contact) tuples
+    """
+    try:
+        operations = [op for op in (counterparty_update(user_id, name, kind, contact, when) for name, kind, contact in entries) if op is not None]
+        if operations:
+            db.counterparties.bulk_write(operations, ordered=False)
+            _cache.invalidate(user_id)
+    except Exception as e:
+        logger.warning(f"Failed to update counterparties for user {user_id}: {str(e)}", extra={'session_id': 'no-session-id'})
+
+
+def backfill_marker_id(user_id):
+    """_id of the document marking a user's directory as backfilled; the user purge deletes it by this key."""
+    return f'backfill:{user_id}'
+
+
+def is_backfilled(db, user_id):
+    return db.counterparties.find_one({'_id': backfill_marker_id(user_id)}, {'_id': 1}) is not None
+
+
+def backfill_counterparties(db, user_id):
+    """
+    Build a user's directory from their existing cashflows and debtors/creditors.
+
+    Runs once per user: a marker document (without user_id, so it never shows
+    up in suggestions) is inserted first and later calls return immediately.
+    Entries created after the user's first directory write were counted when
+    they were made and are skipped.
+
+    Returns:
+        int: Number of counterparties written (0 if already backfilled)
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        db.counterparties.insert_one({'_id': backfill_marker_id(user_id), 'created_at': now})
+    except DuplicateKeyError:
+        return 0
+    first = db.counterparties.find_one({'user_id': user_id}, {'created_at': 1}, sort=[('created_at', 1)])
+    before = {'created_at': {'$lt': first['created_at'] if first and first.get('created_at') else now}}
+    entries = []
+    for doc in db.cashflows.find({'user_id': user_id, **before}, {'party_name': 1, 'type': 1, 'contact': 1, 'created_at': 1}):
+        entries.append((doc.get('party_name'), doc.get('type'), doc.get('contact'), doc.get('created_at')))
+    for doc in db.records.find({'user_id': user_id, 'type': {'$in': ['debtor', 'creditor']}, **before}, {'name': 1, 'type': 1, 'contact': 1, 'phone_number': 1, 'created_at': 1}):
+        entries.append((doc.get('name'), doc.get('type'), doc.get('contact') or doc.get('phone_number'), doc.get('created_at')))
+    operations = [op for op in (counterparty_update(user_id, name, kind, contact, when) for name, kind, contact, when in entries) if op is not None]
+    for start in range(0, len(operations), 1000):
+        db.counterparties.bulk_write(operations[start:start + 1000], ordered=False)
+    _cache.invalidate(user_id)
+    return len(operations)
+
+
+def score(party, now):
+    """Use count decayed by the days since the party was last used."""
+    last_used = party.get('last_used_at') or now
+    if last_used.tzinfo is None:
+        last_used = last_used.replace(tzinfo=timezone.utc)
+    age_days = max((now - last_used).total_seconds(), 0) / 86400
+    return party.get('count', 0) / (1 + age_days / HALF_LIFE_DAYS)
+
+
+def rank(parties, kind, now, limit):
+    related = RELATED_KINDS.get(kind, ())
+    ordered = sorted(
+        parties,
+        key=lambda party: (bool(related) and any(k in related for k in party.get('kinds', [])), score(party, now)),
+        reverse=True
+    )
+    return ordered[:limit]
+
+
+class PartyCache:
+    """Thread-safe LRU of each active user's top counterparties, with a TTL."""
+
+    def __init__(self, max_users=MAX_CACHED_USERS, ttl=CACHE_TTL_SECONDS):
+        self.max_users = max_users
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, user_id):
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                del self.entries[user_id]
+                return None
+            self.entries.move_to_end(user_id)
+            return entry[1]
+
+    def put(self, user_id, parties):
+        with self.lock:
+            self.entries[user_id] = (time.monotonic(), parties)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.max_users:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+
+_cache = PartyCache()
+
+
+def load_parties(db, user_id):
+    """
+    The user's most recently used counterparties, or False if there are more
+    than MAX_CACHED_PARTIES (too many to filter in memory).
+    """
+    parties = list(
+        db.counterparties.find({'user_id': user_id}, PARTY_PROJECTION)
+        .sort('last_used_at', -1)
+        .limit(MAX_CACHED_PARTIES + 1)
+    )
+    return parties if len(parties) <= MAX_CACHED_PARTIES else False
+
+
+def suggest_counterparties(db, user_id, prefix, kind=None, limit=SUGGESTION_LIMIT):
+    """
+    Counterparties whose normalized name starts with prefix, best first.
+
+    Args:
+        kind: Entry being filled in ('receipt', 'payment', 'debtor', 'creditor')
+
+    Returns:
+        list: {'name', 'contact', 'count', 'last_used_at'} dicts
+    """
+    key = normalize_name(prefix)
+    if not key:
+        return []
+    now = datetime.now(timezone.utc)
+    cached = _cache.get(user_id)
+    if cached is None:
+        if not is_backfilled(db, user_id):
+            backfill_counterparties(db, user_id)
+        cached = load_parties(db, user_id)
+        _cache.put(user_id, cached)
+    if cached is not False:
+        candidates = [party for party in cached if party['name_key'].startswith(key)]
+    else:
+        candidates = list(
+            db.counterparties.find({'user_id': user_id, 'name_key': {'$regex': '^' + re.escape(key)}}, PARTY_PROJECTION)
+            .limit(PREFIX_CANDIDATES)
+        )
+    return [
+        {
+            'name': party['name'],
+            'contact': party.get('contact'),
+            'count': party.get('count', 0),
+            'last_used_at': party.get('last_used_at')
+        }
+        for party in rank(candidates, kind, now, limit)
+    ]
@@ -0,0 +1,255 @@
+"""
+Projections of monthly money in and money out from a user's own history.
+
+A series is the monthly totals of one (user, cashflow type) pair over the
+last HISTORY_MONTHS closed months. build_history() loads the series of any
+number of users with one projected cashflows query and pivots them into a
+(series x months) array. Every method below then runs once over all series:
+
+  * moving_average: mean of the last MA_WINDOW months;
+  * seasonal_naive: the same month SEASON_MONTHS earlier;
+  * linear_trend: least-squares line through the months since the series
+    started, extended HORIZON months.
+
+Months before a series' first cashflow are left out rather than counted as
+zero, so a business that started recently is not projected as shrinking.
+The suggested projection for each series is the method with the lowest mean
+absolute error when the last HORIZON months are held out and predicted from
+the months before them.
+
+ForecastEngine stores results for every active startup user in
+cashflow_forecasts on a schedule. get_forecast() computes a single user on
+demand when their stored result is missing or stale. Only closed months
+feed a forecast, so a stored result stays valid until the month turns or a
+backdated entry changes the history (bounded by MAX_AGE).
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pandas as pd
+from pymongo import ReplaceOne
+from helpers.monthly_analytics import add_months, month_key, month_start
+from helpers.scheduler import ScheduledJob
+
+logger = logging.getLogger(__name__)
+
+HISTORY_MONTHS = 24
+HORIZON = 3
+MA_WINDOW = 3
+SEASON_MONTHS = 12
+ACTIVE_DAYS = 90
+USER_BATCH_SIZE = 200
+MAX_AGE = timedelta(hours=24)
+SERIES_TYPES = ('receipt', 'payment')
+METHODS = ('moving_average', 'seasonal_naive', 'linear_trend')
+
+
+def build_history(db, user_ids, now):
+    """
+    Monthly totals per (user_id, type) for the HISTORY_MONTHS closed months before now.
+
+    Returns:
+        pandas.DataFrame: One row per (user_id, type) in user_ids x SERIES_TYPES,
+            one column per month (pandas Periods), zero where nothing was recorded
+    """
+    end = month_start(now)
+    start = add_months(end, -HISTORY_MONTHS)
+    index = pd.MultiIndex.from_product([list(user_ids), SERIES_TYPES], names=['user_id', 'type'])
+    columns = pd.period_range(start=month_key(start), periods=HISTORY_MONTHS, freq='M')
+    cursor = db.cashflows.find(
+        {'user_id': {'$in': list(user_ids)}, 'type': {'$in': list(SERIES_TYPES)}, 'created_at': {'$gte': start, '$lt': end}},
+        {'_id': 0, 'user_id': 1, 'type': 1, 'amount': 1, 'created_at': 1}
+    )
+    frame = pd.DataFrame(list(cursor), columns=['user_id', 'type', 'amount', 'created_at'])
+    if frame.empty:
+        return pd.DataFrame(0.0, index=index, columns=columns)
+    frame['month'] = pd.to_datetime(frame['created_at'], utc=True).dt.tz_convert(None).dt.to_period('M')
+    frame['amount'] = pd.to_numeric(frame['amount'], errors='coerce').fillna(0.0)
+    table = frame.pivot_table(index=['user_id', 'type'], columns='month', values='amount', aggfunc='sum', fill_value=0.0)
+    return table.reindex(index=index, columns=columns, fill_value=0.0)
+
+
+def mask_before_start(values):
+    """Replace the months before each series' first non-zero month with NaN."""
+    started = np.cumsum(values != 0, axis=1) > 0
+    return np.where(started, values, np.nan)
+
+
+def project(values, horizon=HORIZON):
+    """
+    Project every series HORIZON months ahead with each method.
+
+    Args:
+        values: 2-D float array (series x months), NaN before a series started
+
+    Returns:
+        dict: Method name -> (series x horizon) array; seasonal_naive is NaN
+            where there is no value a season earlier
+    """
+    n_series, n_months = values.shape
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    counts = valid.sum(axis=1)
+
+    recent_counts = valid[:, -MA_WINDOW:].sum(axis=1)
+    average = np.divide(filled[:, -MA_WINDOW:].sum(axis=1), recent_counts, out=np.zeros(n_series), where=recent_counts > 0)
+
+    if n_months >= SEASON_MONTHS:
+        seasonal = values[:, n_months - SEASON_MONTHS:n_months - SEASON_MONTHS + horizon]
+    else:
+        seasonal = np.full((n_series, horizon), np.nan)
+
+    x = np.arange(n_months, dtype=float)
+    x_mean = np.divide((valid * x).sum(axis=1), counts, out=np.zeros(n_series), where=counts > 0)
+    y_mean = np.divide(filled.sum(axis=1), counts, out=np.zeros(n_series), where=counts > 0)
+    dx = np.where(valid, x - x_mean[:, None], 0.0)
+    dy = np.where(valid, filled - y_mean[:, None], 0.0)
+    sxx = (dx * dx).sum(axis=1)
+    slope = np.divide((dx * dy).sum(axis=1), sxx, out=np.zeros(n_series), where=sxx > 0)
+    future = np.arange(n_months, n_months + horizon, dtype=float)
+    trend = y_mean[:, None] + slope[:, None] * (future[None, :] - x_mean[:, None])
+
+    return {
+        'moving_average': np.repeat(average[:, None], horizon, axis=1),
+        'seasonal_naive': seasonal,
+        'linear_trend': np.clip(trend, 0.0, None)
+    }
+
+
+def backtest_errors(values, horizon=HORIZON):
+    """
+    Mean absolute error of each method when the last `horizon` months are
+    predicted from the months before them.
+
+    Returns:
+        numpy.ndarray: (series x methods), inf where a method could not be scored
+    """
+    n_series, n_months = values.shape
+    errors = np.full((n_series, len(METHODS)), np.inf)
+    if n_months < horizon + MA_WINDOW:
+        return errors
+    actual = values[:, -horizon:]
+    predicted = project(values[:, :-horizon], horizon)
+    for column, method in enumerate(METHODS):
+        difference = np.abs(predicted[method] - actual)
+        scored = ~np.isnan(difference)
+        scored_counts = scored.sum(axis=1)
+        errors[:, column] = np.divide(
+            np.where(scored, difference, 0.0).sum(axis=1), scored_counts,
+            out=np.full(n_series, np.inf), where=scored_counts > 0
+        )
+    return errors
+
+
+def _as_list(values):
+    return [None if np.isnan(value) else round(float(value), 2) for value in values]
+
+
+def forecast_users(user_ids, history, now):
+    """
+    Forecast documents for user_ids from build_history() output.
+
+    Returns:
+        dict: user_id -> cashflow_forecasts document
+    """
+    values = mask_before_start(history.to_numpy(dtype=float))
+    projections = project(values)
+    errors = backtest_errors(values)
+    best = errors.argmin(axis=1)
+    stacked = np.stack([projections[method] for method in METHODS], axis=1)
+    suggested = np.take_along_axis(stacked, best[:, None, None], axis=1)[:, 0, :]
+    suggested = np.where(np.isnan(suggested), projections['moving_average'], suggested)
+
+    current = month_start(now)
+    history_months = [str(period) for period in history.columns]
+    horizon_months = [month_key(add_months(current, step)) for step in range(HORIZON)]
+    documents = {
+        user_id: {
+            '_id': user_id,
+            'user_id': user_id,
+            'computed_at': now,
+            'history_months': history_months,
+            'horizon_months': horizon_months,
+            'series': {}
+        }
+        for user_id in user_ids
+    }
+    for row, (user_id, series_type) in enumerate(history.index):
+        documents[user_id]['series'][series_type] = {
+            'history': _as_list(history.iloc[row].to_numpy(dtype=float)),
+            'active_months': int((~np.isnan(values[row])).sum()),
+            'projections': {method: _as_list(projections[method][row]) for method in METHODS},
+            'errors': {method: None if np.isinf(errors[row, column]) else round(float(errors[row, column]), 2) for column, method in enumerate(METHODS)},
+            'suggested_method': METHODS[best[row]],
+            'suggested': _as_list(suggested[row])
+        }
+    for document in documents.values():
+        document['suggested_revenue'] = document['series']['receipt']['suggested'][0]
+        document['suggested_expenses'] = document['series']['payment']['suggested'][0]
+    return documents
+
+
+def compute_forecasts(db, user_ids, now=None):
+    """Compute and store forecasts for user_ids; returns the documents by user_id."""
+    now = now or datetime.now(timezone.utc)
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return {}
+    documents = forecast_users(user_ids, build_history(db, user_ids, now), now)
+    db.cashflow_forecasts.bulk_write(
+        [ReplaceOne({'_id': user_id}, document, upsert=True) for user_id, document in documents.items()],
+        ordered=False
+    )
+    return documents
+
+
+def active_user_ids(db, now):
+    """Startup users with a cashflow in the last ACTIVE_DAYS days."""
+    recent = db.cashflows.distinct('user_id', {'created_at': {'$gte': now - timedelta(days=ACTIVE_DAYS)}})
+    return [user['_id'] for user in db.users.find({'_id': {'$in': recent}, 'role': 'startup'}, {'_id': 1})]
+
+
+def precompute_forecasts(db, now=None):
+    """
+    Refresh stored forecasts for all active users, USER_BATCH_SIZE users per query.
+
+    Returns:
+        int: Number of users forecast
+    """
+    now = now or datetime.now(timezone.utc)
+    user_ids = active_user_ids(db, now)
+    for start in range(0, len(user_ids), USER_BATCH_SIZE):
+        compute_forecasts(db, user_ids[start:start + USER_BATCH_SIZE], now)
+    logger.info(f"Precomputed cashflow forecasts for {len(user_ids)} users", extra={'session_id': 'no-session-id'})
+    return len(user_ids)
+
+
+def get_forecast(db, user_id, now=None):
+    """The user's stored forecast, recomputed first if it is for an earlier month or older than MAX_AGE."""
+    now = now or datetime.now(timezone.utc)
+    document = db.cashflow_forecasts.find_one({'_id': user_id})
+    if document:
+        computed_at = document.get('computed_at')
+        if computed_at is not None and computed_at.tzinfo is None:
+            computed_at = computed_at.replace(tzinfo=timezone.utc)
+        if (document.get('horizon_months') or [None])[0] == month_key(month_start(now)) and computed_at and now - computed_at < MAX_AGE:
+            return document
+    return compute_forecasts(db, [user_id], now)[user_id]
+
+
+class ForecastEngine(ScheduledJob):
+    """Runs precompute_forecasts on a leased interval inside the app."""
+
+    job_id = 'precompute_forecasts'
+    extension = 'forecast_engine'
+    enabled_setting = 'FORECAST_ENGINE_ENABLED'
+    interval_setting = 'FORECAST_ENGINE_INTERVAL'
+    default_interval = 21600
+    label = 'Forecast precomputation'
+
+    def run(self, db):
+        precompute_forecasts(db)
+
+
+forecast_engine = ForecastEngine()
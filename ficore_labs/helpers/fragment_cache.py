@@ -0,0 +1,92 @@
+"""
+Fragment cache for the navigation chrome rendered by base.html.
+
+The top navigation, mobile bottom navigation and breadcrumbs only vary by the
+user's role, language, current endpoint and whether the subscribe prompt is
+shown, so the rendered HTML is cached per process under that key. Links are
+absolute, so the key also carries the request host. Host headers are
+client-controlled, so the cache is an LRU bounded by MAX_FRAGMENTS: spoofed
+hosts can only evict entries, never grow memory. Entries are otherwise never
+expired and are rebuilt when workers restart on deploy.
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from flask import request, session, current_app
+from flask_login import current_user
+from jinja2 import pass_context
+from markupsafe import Markup
+
+logger = logging.getLogger(__name__)
+
+# Roles x languages x endpoints x fragments for the real hosts fit well within this
+MAX_FRAGMENTS = 4096
+
+
+class LRUCache:
+    """Thread-safe mapping that drops its least recently used entry past max_entries."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+_fragments = LRUCache(MAX_FRAGMENTS)
+
+
+def fragment_key(template_name):
+    if current_user.is_authenticated:
+        role = getattr(current_user, 'role', 'trader')
+        needs_subscription = not current_user.is_subscribed and not current_user.is_trial_active()
+    else:
+        role = 'anonymous'
+        needs_subscription = False
+    return (template_name, role, session.get('lang', 'en'), request.endpoint, needs_subscription, request.host_url)
+
+
+@pass_context
+def cached_fragment(context, template_name):
+    """Render template_name with the caller's context, memoized per fragment_key."""
+    try:
+        key = fragment_key(template_name) if current_app.config.get('FRAGMENT_CACHE_ENABLED', True) else None
+    except Exception as e:
+        logger.warning(f"Fragment cache key failed for {template_name}: {str(e)}", extra={'session_id': session.get('sid', 'no-session-id')})
+        key = None
+    html = _fragments.get(key) if key else None
+    if html is None:
+        template = context.environment.get_template(template_name)
+        html = Markup(template.render(context.get_all()))
+        if key:
+            _fragments.put(key, html)
+    return html
+
+
+def clear_fragments():
+    _fragments.clear()
+
+
+def init_fragment_cache(app):
+    # FRAGMENT_CACHE_ENABLED=false keeps template edits live during development
+    app.config.setdefault('FRAGMENT_CACHE_ENABLED', os.getenv('FRAGMENT_CACHE_ENABLED', 'true').lower() == 'true')
+    app.jinja_env.globals['cached_fragment'] = cached_fragment
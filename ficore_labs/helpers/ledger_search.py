@@ -0,0 +1,207 @@
+"""
+Search across one user's records and cashflows.
+
+Each collection has a compound text index with user_id as an equality
+prefix (LEDGER_TEXT_INDEXES, created by models.initialize_app_data), so a
+query only walks that user's index entries and MongoDB ranks the hits by
+weighted textScore: a match on a party name counts for more than one buried
+in a description. The index uses language 'none' because party names are not
+English words and must not be stemmed or dropped as stop words.
+
+Text search only matches whole words. Queries that are still being typed
+("ade" for "Adebayo") are covered by a case-insensitive prefix match on the
+name fields, run only when the text search leaves room in the result page.
+It scans at most one user's documents of one type through the
+(user_id, type) index.
+"""
+
+import re
+from datetime import datetime, time, timedelta, timezone
+from pymongo import ASCENDING
+
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+MAX_QUERY_LENGTH = 100
+PREFIX_SCORE = 0.5
+
+RECORD_TYPES = ('debtor', 'creditor', 'fund', 'forecast', 'investor_report')
+CASHFLOW_TYPES = ('receipt', 'payment')
+
+LEDGER_TEXT_INDEXES = {
+    'records': {
+        'key': [('user_id', ASCENDING), ('name', 'text'), ('title', 'text'), ('source', 'text'), ('contact', 'text'), ('description', 'text')],
+        'weights': {'name': 10, 'title': 8, 'source': 8, 'contact': 4, 'description': 1},
+        'default_language': 'none'
+    },
+    'cashflows': {
+        'key': [('user_id', ASCENDING), ('party_name', 'text'), ('description', 'text')],
+        'weights': {'party_name': 10, 'description': 1},
+        'default_language': 'none'
+    },
+}
+
+# Fields tried in order for the result title, and the amount fields (funds carry 'amount', debts 'amount_owed')
+DISPLAY_FIELDS = {
+    'records': (('name', 'title', 'source'), ('amount_owed', 'amount')),
+    'cashflows': (('party_name', 'description'), ('amount',)),
+}
+PREFIX_FIELDS = {
+    'records': ('name', 'title', 'source'),
+    'cashflows': ('party_name',),
+}
+VIEW_ENDPOINTS = {
+    'debtor': 'debtors.view_page',
+    'creditor': 'creditors.view_page',
+    'fund': 'funds.view_page',
+    'forecast': 'forecasts.view_page',
+}
+LIST_ENDPOINTS = {
+    'receipt': 'receipts.index',
+    'payment': 'payments.index',
+    'investor_report': 'investor_reports.index',
+}
+RESULT_PROJECTION = {'type': 1, 'name': 1, 'title': 1, 'source': 1, 'contact': 1, 'description': 1, 'party_name': 1,
+                     'amount_owed': 1, 'amount': 1, 'created_at': 1}
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+    except ValueError:
+        return None
+
+
+def _parse_amount(value):
+    try:
+        return float(value) if value not in (None, '') else None
+    except ValueError:
+        return None
+
+
+def parse_search_args(args):
+    """
+    Normalize search request args.
+
+    Returns:
+        dict: q, type (or None), start_date / end_date (dates), min_amount /
+            max_amount (floats), limit
+    """
+    search_type = args.get('type')
+    try:
+        limit = min(max(int(args.get('limit', SEARCH_LIMIT)), 1), MAX_SEARCH_LIMIT)
+    except ValueError:
+        limit = SEARCH_LIMIT
+    return {
+        'q': (args.get('q') or '').strip()[:MAX_QUERY_LENGTH],
+        'type': search_type if search_type in RECORD_TYPES + CASHFLOW_TYPES else None,
+        'start_date': _parse_date(args.get('start_date')),
+        'end_date': _parse_date(args.get('end_date')),
+        'min_amount': _parse_amount(args.get('min_amount')),
+        'max_amount': _parse_amount(args.get('max_amount')),
+        'limit': limit
+    }
+
+
+def _filter_conditions(collection, params):
+    """Type, date and amount conditions shared by the text and prefix queries."""
+    types = RECORD_TYPES if collection == 'records' else CASHFLOW_TYPES
+    conditions = {'type': params['type'] if params['type'] else {'$in': list(types)}}
+    created = {}
+    if params['start_date']:
+        created['$gte'] = datetime.combine(params['start_date'], time.min, tzinfo=timezone.utc)
+    if params['end_date']:
+        created['$lt'] = datetime.combine(params['end_date'] + timedelta(days=1), time.min, tzinfo=timezone.utc)
+    if created:
+        conditions['created_at'] = created
+    amount = {}
+    if params['min_amount'] is not None:
+        amount['$gte'] = params['min_amount']
+    if params['max_amount'] is not None:
+        amount['$lte'] = params['max_amount']
+    if amount:
+        amount_fields = DISPLAY_FIELDS[collection][1]
+        if len(amount_fields) == 1:
+            conditions[amount_fields[0]] = amount
+        else:
+            # A debt's amount_owed, else the record's own amount (funds); under $and so the prefix query's $or survives
+            conditions['$and'] = [{'$or': [
+                {amount_fields[0]: amount},
+                {amount_fields[0]: None, amount_fields[1]: amount}
+            ]}]
+    return conditions
+
+
+def _collections_for(params):
+    if params['type'] in RECORD_TYPES:
+        return ('records',)
+    if params['type'] in CASHFLOW_TYPES:
+        return ('cashflows',)
+    return ('records', 'cashflows')
+
+
+def _to_result(collection, doc, score):
+    title_fields, amount_fields = DISPLAY_FIELDS[collection]
+    created_at = doc.get('created_at')
+    if created_at is not None and created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return {
+        'id': str(doc['_id']),
+        'collection': collection,
+        'type': doc.get('type'),
+        'title': next((doc[field] for field in title_fields if doc.get(field)), ''),
+        'description': doc.get('description') or doc.get('contact') or '',
+        'amount': next((doc[field] for field in amount_fields if doc.get(field) is not None), None),
+        'created_at': created_at,
+        'score': round(score, 3)
+    }
+
+
+def search_ledger(db, user_id, params):
+    """
+    Search a user's records and cashflows.
+
+    Args:
+        db: MongoDB database instance
+        user_id: Owner of the ledger
+        params: Output of parse_search_args()
+
+    Returns:
+        list: Result dicts ordered by relevance, at most params['limit']
+    """
+    if not params['q']:
+        return []
+    limit = params['limit']
+    results = []
+    seen = set()
+    for collection in _collections_for(params):
+        query = {'user_id': user_id, '$text': {'$search': params['q']}}
+        query.update(_filter_conditions(collection, params))
+        projection = dict(RESULT_PROJECTION, score={'$meta': 'textScore'})
+        cursor = db[collection].find(query, projection).sort([('score', {'$meta': 'textScore'})]).limit(limit)
+        for doc in cursor:
+            seen.add(doc['_id'])
+            results.append(_to_result(collection, doc, doc.get('score', 0)))
+    if len(results) < limit:
+        pattern = re.compile('^' + re.escape(params['q']), re.IGNORECASE)
+        for collection in _collections_for(params):
+            if len(results) >= limit:
+                break
+            query = {
+                'user_id': user_id,
+                '$or': [{field: pattern} for field in PREFIX_FIELDS[collection]],
+                '_id': {'$nin': list(seen)}
+            }
+            query.update(_filter_conditions(collection, params))
+            for doc in db[collection].find(query, RESULT_PROJECTION).sort('created_at', -1).limit(limit - len(results)):
+                results.append(_to_result(collection, doc, PREFIX_SCORE))
+    results.sort(key=lambda result: result['score'], reverse=True)
+    return results[:limit]
+
+
+def result_endpoint(result):
+    """Endpoint and url_for kwargs for opening a search result, or (None, {})."""
+    if result['type'] in VIEW_ENDPOINTS:
+        return VIEW_ENDPOINTS[result['type']], {'id': result['id']}
+    if result['type'] in LIST_ENDPOINTS:
+        return LIST_ENDPOINTS[result['type']], {}
+    return None, {}
@@ -0,0 +1,195 @@
+"""
+Durable outbox for transactional email (2FA OTPs, password resets).
+
+Requests call queue_email(), which inserts one mail_outbox document and wakes
+the sender pool, so a slow or unreachable SMTP server never holds up a
+request worker. Each sender thread:
+
+  * claims the oldest due message with find_one_and_update, so a message is
+    sent by exactly one thread across all processes, and expired leases from
+    crashed workers are reclaimed;
+  * keeps its SMTP connection open between messages and only reconnects after
+    an error or MAIL_CONNECTION_IDLE seconds without traffic;
+  * records the outcome on the message: sent, or queued again with
+    exponential backoff, or failed after MAIL_MAX_ATTEMPTS.
+
+Messages carry an optional dedupe_key, unique in the collection, so a double
+submit never queues the same email twice. Sent messages expire after
+MAIL_OUTBOX_RETENTION seconds (a TTL index on sent_at) since they contain OTPs
+and reset links.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from flask_mailman import Mail, EmailMessage
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+mail = Mail()
+
+LEASE_SECONDS = 120
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+MAIL_OUTBOX_RETENTION = 7 * 24 * 3600
+
+
+def queue_email(db, to, subject, body, kind, dedupe_key=None):
+    """
+    Queue an email for the background senders.
+
+    Args:
+        db: MongoDB database instance
+        to: Recipient address or list of addresses
+        subject: Message subject
+        body: Plain-text body
+        kind: Short label for reporting ('otp', 'password_reset', ...)
+        dedupe_key: Optional key; a second message with the same key is dropped
+
+    Returns:
+        bool: True if queued, False if a message with dedupe_key already exists
+    """
+    now = datetime.now(timezone.utc)
+    message = {
+        'to': [to] if isinstance(to, str) else list(to),
+        'subject': subject,
+        'body': body,
+        'kind': kind,
+        'status': 'queued',
+        'attempts': 0,
+        'next_attempt_at': now,
+        'created_at': now,
+    }
+    if dedupe_key:
+        message['dedupe_key'] = dedupe_key
+    try:
+        db.mail_outbox.insert_one(message)
+    except DuplicateKeyError:
+        logger.info(f"Skipping duplicate {kind} email for key {dedupe_key}", extra={'session_id': 'no-session-id'})
+        return False
+    mail_outbox.wake()
+    return True
+
+
+def backoff_delay(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * (2 ** (attempts - 1)), BACKOFF_MAX_SECONDS))
+
+
+class MailOutbox:
+    """Pool of sender threads draining the mail_outbox collection."""
+
+    def __init__(self):
+        self.app = None
+        self.threads = []
+        self.wakeup = threading.Condition()
+        self.pending_wakeups = 0
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('MAIL_SERVER', os.getenv('MAIL_SERVER', 'smtp.gmail.com'))
+        app.config.setdefault('MAIL_PORT', int(os.getenv('MAIL_PORT', 587)))
+        app.config.setdefault('MAIL_USE_TLS', os.getenv('MAIL_USE_TLS', 'true').lower() == 'true')
+        app.config.setdefault('MAIL_USERNAME', os.getenv('MAIL_USERNAME'))
+        app.config.setdefault('MAIL_PASSWORD', os.getenv('MAIL_PASSWORD'))
+        app.config.setdefault('MAIL_DEFAULT_SENDER', os.getenv('MAIL_DEFAULT_SENDER', os.getenv('MAIL_USERNAME')))
+        app.config.setdefault('MAIL_TIMEOUT', int(os.getenv('MAIL_TIMEOUT', 10)))
+        app.config.setdefault('MAIL_SENDER_THREADS', int(os.getenv('MAIL_SENDER_THREADS', 2)))
+        app.config.setdefault('MAIL_MAX_ATTEMPTS', int(os.getenv('MAIL_MAX_ATTEMPTS', 6)))
+        app.config.setdefault('MAIL_POLL_INTERVAL', int(os.getenv('MAIL_POLL_INTERVAL', 15)))
+        app.config.setdefault('MAIL_CONNECTION_IDLE', int(os.getenv('MAIL_CONNECTION_IDLE', 60)))
+        app.config.setdefault('MAIL_OUTBOX_ENABLED', os.getenv('MAIL_OUTBOX_ENABLED', 'true').lower() == 'true')
+        mail.init_app(app)
+        app.extensions['mail_outbox'] = self
+        if app.config['MAIL_OUTBOX_ENABLED'] and not app.testing:
+            self.start()
+
+    def start(self):
+        for i in range(self.app.config['MAIL_SENDER_THREADS']):
+            thread = threading.Thread(target=self.run, name=f'mail-outbox-{i}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        logger.info(f"Started {len(self.threads)} mail outbox senders", extra={'session_id': 'none', 'user_role': 'none', 'ip_address': 'none'})
+
+    def wake(self):
+        with self.wakeup:
+            self.pending_wakeups += 1
+            self.wakeup.notify()
+
+    def wait(self, timeout):
+        with self.wakeup:
+            if self.pending_wakeups == 0:
+                self.wakeup.wait(timeout)
+            self.pending_wakeups = max(0, self.pending_wakeups - 1)
+
+    def claim(self, db):
+        now = datetime.now(timezone.utc)
+        return db.mail_outbox.find_one_and_update(
+            {'$or': [
+                {'status': 'queued', 'next_attempt_at': {'$lte': now}},
+                {'status': 'sending', 'lease_until': {'$lte': now}}
+            ]},
+            {'$set': {'status': 'sending', 'lease_until': now + timedelta(seconds=LEASE_SECONDS)}, '$inc': {'attempts': 1}},
+            sort=[('next_attempt_at', ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def deliver(self, connection, message):
+        EmailMessage(
+            subject=message['subject'],
+            body=message['body'],
+            to=message['to'],
+            connection=connection
+        ).send()
+
+    def record_result(self, db, message, error=None):
+        now = datetime.now(timezone.utc)
+        if error is None:
+            update = {'$set': {'status': 'sent', 'sent_at': now}, '$unset': {'lease_until': '', 'last_error': ''}}
+        elif message['attempts'] < self.app.config['MAIL_MAX_ATTEMPTS']:
+            update = {'$set': {'status': 'queued', 'next_attempt_at': now + backoff_delay(message['attempts']), 'last_error': error}, '$unset': {'lease_until': ''}}
+        else:
+            update = {'$set': {'status': 'failed', 'failed_at': now, 'last_error': error}, '$unset': {'lease_until': ''}}
+        db.mail_outbox.update_one({'_id': message['_id']}, update)
+
+    def run(self):
+        connection = None
+        last_used = 0.0
+        while True:
+            try:
+                with self.app.app_context():
+                    db = self.app.extensions['mongo']['bizdb']
+                    while True:
+                        message = self.claim(db)
+                        if message is None:
+                            break
+                        try:
+                            if connection is None:
+                                connection = mail.get_connection(fail_silently=False)
+                                connection.open()
+                            self.deliver(connection, message)
+                            last_used = time.monotonic()
+                            self.record_result(db, message)
+                            logger.info(f"Sent {message['kind']} email {message['_id']}", extra={'session_id': 'no-session-id'})
+                        except Exception as e:
+                            # The connection may be half-broken; start fresh for the next message
+                            if connection is not None:
+                                try:
+                                    connection.close()
+                                except Exception:
+                                    pass
+                                connection = None
+                            self.record_result(db, message, error=str(e))
+                            logger.warning(f"Failed to send {message['kind']} email {message['_id']} (attempt {message['attempts']}): {str(e)}", extra={'session_id': 'no-session-id'})
+                    if connection is not None and time.monotonic() - last_used > self.app.config['MAIL_CONNECTION_IDLE']:
+                        connection.close()
+                        connection = None
+            except Exception as e:
+                logger.error(f"Mail outbox sender error: {str(e)}", exc_info=True, extra={'session_id': 'no-session-id'})
+            self.wait(self.app.config['MAIL_POLL_INTERVAL'])
+
+
+mail_outbox = MailOutbox()
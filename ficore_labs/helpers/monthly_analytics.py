@@ -0,0 +1,242 @@
+"""
+Monthly profit/loss, debt and funding series per user.
+
+Cashflows and debtor, creditor and fund records are bucketed by calendar
+month (UTC) with $dateTrunc, one aggregation per collection over the (user_id,
+created_at) index. A month that has ended is closed: the first time it is
+asked for, its summary is stored in monthly_summaries and read back from
+there afterwards. A multi-year series therefore costs one indexed read of
+stored summaries plus an aggregation over the current month.
+
+Closed summaries are never updated in place. Writes that land in a closed
+month (backdated receipts, edits, deletes, offline sync pushes) call
+invalidate_months(), which drops those months so the next read recomputes
+them.
+"""
+
+import logging
+from datetime import date, datetime, timezone
+from pymongo import ReplaceOne
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MONTHS = 12
+MAX_MONTHS = 120
+
+# Cashflow / record type -> (total field, count field)
+CASHFLOW_FIELDS = {
+    'receipt': ('receipts', 'receipt_count'),
+    'payment': ('payments', 'payment_count'),
+}
+RECORD_FIELDS = {
+    'debtor': ('debtors', 'debtor_count'),
+    'creditor': ('creditors', 'creditor_count'),
+    'fund': ('funds', 'fund_count'),
+}
+SUMMARY_FIELDS = tuple(field for fields in (CASHFLOW_FIELDS, RECORD_FIELDS) for pair in fields.values() for field in pair)
+COMPARED_FIELDS = ('receipts', 'payments', 'net', 'debtors', 'creditors')
+
+# (collection, type -> fields, amount expression); funds carry 'amount', debts 'amount_owed'
+SOURCES = (
+    ('cashflows', CASHFLOW_FIELDS, '$amount'),
+    ('records', RECORD_FIELDS, {'$cond': [{'$eq': ['$type', 'fund']}, '$amount', '$amount_owed']}),
+)
+# Bumped whenever SUMMARY_FIELDS change; stored summaries of another version are recomputed
+SUMMARY_VERSION = 2
+
+
+def month_start(value):
+    """First instant (UTC) of the month containing value; naive datetimes are taken as UTC."""
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def month_key(month):
+    return month.strftime('%Y-%m')
+
+
+def parse_month(value):
+    """'YYYY-MM' to a month start, or None."""
+    try:
+        return month_start(datetime.strptime(value, '%Y-%m')) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def iter_months(start, stop):
+    month = start
+    while month < stop:
+        yield month
+        month = add_months(month, 1)
+
+
+def summary_id(user_id, month):
+    return f'{user_id}:{month_key(month)}'
+
+
+def empty_summary(month):
+    return dict({field: 0 for field in SUMMARY_FIELDS}, month=month)
+
+
+def aggregate_months(db, user_id, start, stop):
+    """
+    Summaries for the months in [start, stop), computed from the raw collections.
+
+    Returns:
+        dict: Month start -> summary; months without activity are zero-filled
+    """
+    summaries = {month: empty_summary(month) for month in iter_months(start, stop)}
+    for collection, fields, amount in SOURCES:
+        pipeline = [
+            {'$match': {'user_id': user_id, 'created_at': {'$gte': start, '$lt': stop}, 'type': {'$in': list(fields)}}},
+            {'$group': {
+                '_id': {'month': {'$dateTrunc': {'date': '$created_at', 'unit': 'month', 'timezone': 'UTC'}}, 'type': '$type'},
+                'total': {'$sum': {'$ifNull': [amount, 0]}},
+                'count': {'$sum': 1}
+            }}
+        ]
+        for row in db[collection].aggregate(pipeline):
+            month = month_start(row['_id']['month'])
+            if month not in summaries:
+                continue
+            total_field, count_field = fields[row['_id']['type']]
+            summaries[month][total_field] = round(row['total'], 2)
+            summaries[month][count_field] = row['count']
+    return summaries
+
+
+def load_closed_months(db, user_id, start, stop, now):
+    """
+    Summaries for closed months in [start, stop), computing and storing any
+    that are not cached yet in a single aggregation.
+    """
+    summaries = {}
+    for doc in db.monthly_summaries.find({'user_id': user_id, 'month': {'$gte': start, '$lt': stop}, 'version': SUMMARY_VERSION}):
+        summaries[month_start(doc['month'])] = doc
+    missing = [month for month in iter_months(start, stop) if month not in summaries]
+    if missing:
+        computed = aggregate_months(db, user_id, missing[0], add_months(missing[-1], 1))
+        operations = []
+        for month in missing:
+            summaries[month] = computed[month]
+            operations.append(ReplaceOne(
+                {'_id': summary_id(user_id, month)},
+                dict(computed[month], user_id=user_id, version=SUMMARY_VERSION, computed_at=now),
+                upsert=True
+            ))
+        db.monthly_summaries.bulk_write(operations, ordered=False)
+    return summaries
+
+
+def monthly_series(db, user_id, start, end, now=None):
+    """
+    One point per month from start to end inclusive, ending no later than the
+    current month.
+
+    Returns:
+        list: Dicts with 'month' ('YYYY-MM'), the SUMMARY_FIELDS, 'net' and
+            'closed' (False only for the current month)
+    """
+    now = now or datetime.now(timezone.utc)
+    current = month_start(now)
+    start = month_start(start)
+    stop = min(add_months(month_start(end), 1), add_months(current, 1))
+    if start >= stop:
+        return []
+    summaries = load_closed_months(db, user_id, start, min(stop, current), now) if start < current else {}
+    if stop > current:
+        summaries.update(aggregate_months(db, user_id, max(start, current), stop))
+    series = []
+    for month in iter_months(start, stop):
+        summary = summaries[month]
+        point = {field: summary.get(field, 0) for field in SUMMARY_FIELDS}
+        point.update(
+            month=month_key(month),
+            net=round(point['receipts'] - point['payments'], 2),
+            closed=month < current
+        )
+        series.append(point)
+    return series
+
+
+def pct_change(current, previous):
+    if not previous:
+        return None
+    return round((current - previous) / abs(previous) * 100, 1)
+
+
+def period_totals(series):
+    totals = {field: 0 for field in SUMMARY_FIELDS + ('net',)}
+    for point in series:
+        for field in totals:
+            totals[field] += point[field]
+    return {field: round(value, 2) for field, value in totals.items()}
+
+
+def compare_periods(current_series, previous_series):
+    """
+    Totals of two equal-length periods and the percentage change of the
+    COMPARED_FIELDS between them (None where the previous total is zero).
+    """
+    current, previous = period_totals(current_series), period_totals(previous_series)
+    return {
+        'current': current,
+        'previous': previous,
+        'change_pct': {field: pct_change(current[field], previous[field]) for field in COMPARED_FIELDS}
+    }
+
+
+def with_month_over_month(series):
+    """Add 'net_change' and 'receipts_change_pct' against the preceding point."""
+    previous = None
+    for point in series:
+        point['net_change'] = round(point['net'] - previous['net'], 2) if previous else None
+        point['receipts_change_pct'] = pct_change(point['receipts'], previous['receipts']) if previous else None
+        previous = point
+    return series
+
+
+def trend_report(db, user_id, months=DEFAULT_MONTHS, end=None, now=None):
+    """
+    The last `months` months up to end (default: the current month), with
+    month-over-month changes and a comparison against the preceding period
+    of the same length.
+    """
+    now = now or datetime.now(timezone.utc)
+    months = min(max(months, 1), MAX_MONTHS)
+    end = min(month_start(end or now), month_start(now))
+    start = add_months(end, 1 - months)
+    series = monthly_series(db, user_id, add_months(start, -months), end, now)
+    previous, current = series[:-months], series[-months:]
+    return {
+        'start': month_key(start),
+        'end': month_key(end),
+        'series': with_month_over_month(current),
+        'comparison': compare_periods(current, previous)
+    }
+
+
+def invalidate_months(db, user_id, *dates):
+    """
+    Drop the stored summaries for the closed months containing dates.
+
+    Called after any write that can change a closed month. Failures are
+    logged rather than raised so they never fail the ledger write itself.
+    """
+    months = {month_start(value) for value in dates if isinstance(value, (datetime, date))}
+    current = month_start(datetime.now(timezone.utc))
+    months = [month for month in months if month < current]
+    if not months:
+        return
+    try:
+        db.monthly_summaries.delete_many({'user_id': user_id, 'month': {'$in': months}})
+        # Runway totals that already folded in one of these months are rebuilt (see helpers.runway)
+        db.runway_state.delete_one({'_id': user_id, 'through': {'$gte': min(months)}})
+    except Exception as e:
+        logger.warning(f"Failed to invalidate monthly summaries for user {user_id}: {str(e)}", extra={'session_id': 'no-session-id'})
@@ -0,0 +1,121 @@
+"""
+Whole-page cache for the public general pages.
+
+Anonymous GETs of the pages in CACHEABLE_ENDPOINTS are rendered once per
+(endpoint, language, dark mode, host) and then served straight from the cache
+by a before_request hook that runs ahead of every other hook, so cache hits
+skip Jinja, navigation setup and the default-language session write.
+Authenticated users and requests with pending flash messages always bypass the
+cache.
+
+The backend is Flask-Caching: SimpleCache (per process) by default, or any
+shared backend via CACHE_TYPE / CACHE_REDIS_URL. Keys are prefixed with
+APP_VERSION so a deploy never serves pages rendered by the previous release.
+"""
+
+import logging
+import os
+from flask import request, session, g, make_response
+from flask_caching import Cache
+from flask_login import current_user
+from flask_wtf.csrf import generate_csrf
+
+logger = logging.getLogger(__name__)
+
+cache = Cache()
+
+CACHEABLE_ENDPOINTS = {
+    'general_bp.landing',
+    'general_bp.about',
+    'general_bp.contact',
+    'general_bp.privacy',
+    'general_bp.terms',
+    'general_bp.business_finance_tips',
+}
+
+# Stands in for the per-session CSRF token inside cached HTML
+CSRF_PLACEHOLDER = '__PAGE_CACHE_CSRF_TOKEN__'
+
+PAGE_CACHE_HEADERS = {
+    # private: the body carries the visitor's CSRF token, so shared caches must not store it
+    'Cache-Control': 'private, max-age=300',
+    'Vary': 'Cookie, Accept-Language',
+}
+
+
+def _is_cacheable_request():
+    if request.method != 'GET' or request.endpoint not in CACHEABLE_ENDPOINTS:
+        return False
+    if request.args or session.get('_flashes'):
+        return False
+    return not current_user.is_authenticated
+
+
+def _page_key():
+    lang = session.get('lang') or request.accept_languages.best_match(['en', 'ha'], 'en')
+    dark_mode = 'dark' if session.get('dark_mode', False) else 'light'
+    return f"{request.endpoint}:{lang}:{dark_mode}:{request.host}"
+
+
+def _apply_headers(response):
+    for header, value in PAGE_CACHE_HEADERS.items():
+        response.headers[header] = value
+    response.headers.pop('Pragma', None)
+    response.headers.pop('Expires', None)
+    return response
+
+
+def serve_cached_page():
+    """before_request hook: return the cached page for anonymous visitors."""
+    try:
+        if not _is_cacheable_request():
+            return None
+        g.page_cache_key = _page_key()
+        body = cache.get(g.page_cache_key)
+        if body is None:
+            return None
+        g.page_cache_hit = True
+        response = make_response(body.replace(CSRF_PLACEHOLDER, generate_csrf()))
+        response.headers['X-Page-Cache'] = 'HIT'
+        return _apply_headers(response)
+    except Exception as e:
+        logger.warning(f"Page cache lookup failed for {request.endpoint}: {str(e)}", extra={'session_id': session.get('sid', 'no-session-id')})
+        return None
+
+
+def store_cached_page(response):
+    """after_request hook: keep successful anonymous renders for later hits."""
+    key = g.get('page_cache_key')
+    if not key or g.get('page_cache_hit'):
+        return response
+    try:
+        if response.status_code != 200 or response.direct_passthrough or response.mimetype != 'text/html':
+            return response
+        if current_user.is_authenticated:
+            return response
+        body = response.get_data(as_text=True)
+        token = g.get('csrf_token')
+        if token:
+            body = body.replace(token, CSRF_PLACEHOLDER)
+        cache.set(key, body)
+        response.headers['X-Page-Cache'] = 'MISS'
+        _apply_headers(response)
+    except Exception as e:
+        logger.warning(f"Page cache store failed for {request.endpoint}: {str(e)}", extra={'session_id': session.get('sid', 'no-session-id')})
+    return response
+
+
+def init_page_cache(app):
+    cache_type = os.getenv('CACHE_TYPE', 'SimpleCache')
+    config = {
+        'CACHE_TYPE': cache_type,
+        'CACHE_DEFAULT_TIMEOUT': int(os.getenv('PAGE_CACHE_TIMEOUT', 300)),
+        'CACHE_KEY_PREFIX': f"page:{os.getenv('APP_VERSION', 'dev')}:",
+    }
+    if os.getenv('CACHE_REDIS_URL'):
+        config['CACHE_REDIS_URL'] = os.getenv('CACHE_REDIS_URL')
+    cache.init_app(app, config=config)
+    # Must run before every other before_request hook to skip their work on hits
+    app.before_request_funcs.setdefault(None, []).insert(0, serve_cached_page)
+    app.after_request(store_cached_page)
+    logger.info(f"Page cache initialized with {cache_type}", extra={'session_id': 'none', 'user_role': 'none', 'ip_address': 'none'})
@@ -0,0 +1,296 @@
+"""
+Scheduled reminder dispatch for debtors and creditors.
+
+The send_reminder routes no longer talk to SMS/WhatsApp providers inside the
+request. They mark the record with reminder_status='scheduled' and a
+reminder_date, and an APScheduler job in every worker periodically:
+
+  1. leases a batch of due records through the (reminder_date, user_id) index,
+     so concurrent workers never pick up the same reminder;
+  2. sends each one through the provider registered for its channel, throttled
+     by a per-provider token bucket;
+  3. reschedules transient failures with exponential backoff and gives up after
+     REMINDER_MAX_ATTEMPTS;
+  4. writes all outcomes of the batch to reminder_logs with one insert_many.
+
+Every send carries an idempotency key (record id + reminder_count) that is also
+unique among successful reminder_logs entries, so a reminder is never logged as
+sent twice and providers that support keys can drop duplicates.
+"""
+
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError
+from helpers.scheduler import ScheduledJob
+from translations import trans
+
+logger = logging.getLogger(__name__)
+
+REMINDER_TYPES = ['debtor', 'creditor']
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 60
+BACKOFF_MAX_SECONDS = 6 * 3600
+
+
+class TransientProviderError(Exception):
+    """Raised by providers for failures worth retrying (timeouts, 5xx, rate limits)."""
+
+
+class ReminderProvider:
+    """
+    Interface for reminder delivery channels.
+
+    send() returns (success, response_dict). Raise TransientProviderError for
+    retryable failures; a False result is treated as permanent.
+    """
+
+    name = 'base'
+
+    def __init__(self, rate_per_second=5.0):
+        self.bucket = TokenBucket(rate_per_second)
+
+    def send(self, recipient, message, idempotency_key):
+        raise NotImplementedError
+
+
+class LoggingProvider(ReminderProvider):
+    """Default provider until a real gateway is configured: logs and reports success."""
+
+    def __init__(self, name, rate_per_second=5.0):
+        super().__init__(rate_per_second)
+        self.name = name
+
+    def send(self, recipient, message, idempotency_key):
+        logger.info(f"Simulating {self.name} to {recipient}: {message}", extra={'session_id': 'no-session-id'})
+        return True, {'status': f'{self.name} sent successfully', 'idempotency_key': idempotency_key}
+
+
+class FakeProvider(ReminderProvider):
+    """
+    In-memory provider for tests and local runs.
+
+    Args:
+        failures: Number of initial sends that raise TransientProviderError
+    """
+
+    def __init__(self, name='fake', failures=0, rate_per_second=1000.0):
+        super().__init__(rate_per_second)
+        self.name = name
+        self.failures = failures
+        self.sent = []
+
+    def send(self, recipient, message, idempotency_key):
+        if self.failures > 0:
+            self.failures -= 1
+            raise TransientProviderError('simulated failure')
+        if any(key == idempotency_key for key, _, _ in self.sent):
+            return True, {'status': 'duplicate ignored'}
+        self.sent.append((idempotency_key, recipient, message))
+        return True, {'status': 'queued'}
+
+
+class TokenBucket:
+    """Blocking rate limiter: at most rate_per_second sends with a burst of one second."""
+
+    def __init__(self, rate_per_second):
+        self.rate = float(rate_per_second)
+        self.capacity = max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                time.sleep((1 - self.tokens) / self.rate)
+
+
+_providers = {}
+
+
+def register_provider(channel, provider):
+    """Route reminders for channel ('sms', 'whatsapp', ...) through provider."""
+    _providers[channel] = provider
+
+
+def get_provider(channel):
+    return _providers.get(channel)
+
+
+def backoff_delay(attempt):
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * (2 ** (attempt - 1)), BACKOFF_MAX_SECONDS))
+
+
+def default_recipient(record):
+    return record.get('phone_number') or record.get('contact')
+
+
+def default_message(record):
+    amount = record.get('amount_owed') or 0
+    if record.get('type') == 'creditor':
+        return trans('creditors_reminder_default_message', default=f"Reminder: payment of {amount:,.2f} to {record.get('name', '')} is due.")
+    return trans('debtors_reminder_default_message', default=f"Hello {record.get('name', '')}, this is a friendly reminder that {amount:,.2f} is still outstanding.")
+
+
+def schedule_reminder(db, record_id, user_id, record_type, when, channel='sms', recipient=None, message=None):
+    """
+    Queue a reminder for the dispatcher.
+
+    Returns:
+        bool: True if the record exists and was scheduled
+    """
+    update = {
+        'reminder_status': 'scheduled',
+        'reminder_date': when,
+        'reminder_channel': channel,
+        'reminder_attempts': 0,
+    }
+    if recipient:
+        update['reminder_recipient'] = recipient
+    if message:
+        update['reminder_message'] = message
+    result = db.records.update_one(
+        {'_id': record_id, 'user_id': user_id, 'type': record_type},
+        {'$set': update, '$unset': {'reminder_lease_until': '', 'reminder_lease_owner': ''}}
+    )
+    return result.matched_count > 0
+
+
+def claim_due_reminders(db, now, batch_size, lease_seconds):
+    """Lease up to batch_size due reminders to this dispatcher run."""
+    due = {
+        'reminder_status': 'scheduled',
+        'reminder_date': {'$lte': now},
+        'type': {'$in': REMINDER_TYPES},
+        '$or': [{'reminder_lease_until': {'$exists': False}}, {'reminder_lease_until': {'$lte': now}}],
+    }
+    ids = [doc['_id'] for doc in db.records.find(due, {'_id': 1}).sort([('reminder_date', ASCENDING), ('user_id', ASCENDING)]).limit(batch_size)]
+    if not ids:
+        return []
+    owner = uuid.uuid4().hex
+    db.records.update_many(
+        {**due, '_id': {'$in': ids}},
+        {'$set': {'reminder_lease_until': now + timedelta(seconds=lease_seconds), 'reminder_lease_owner': owner}}
+    )
+    return list(db.records.find({'_id': {'$in': ids}, 'reminder_lease_owner': owner}))
+
+
+def dispatch_due_reminders(db, now=None, batch_size=DEFAULT_BATCH_SIZE, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Send one batch of due reminders.
+
+    Returns:
+        dict: Counts of sent, retried, failed and skipped reminders
+    """
+    now = now or datetime.now(timezone.utc)
+    counts = {'sent': 0, 'retried': 0, 'failed': 0, 'skipped': 0}
+    logs = []
+    for record in claim_due_reminders(db, now, batch_size, lease_seconds):
+        channel = record.get('reminder_channel', 'sms')
+        recipient = record.get('reminder_recipient') or default_recipient(record)
+        message = record.get('reminder_message') or default_message(record)
+        attempt = record.get('reminder_attempts', 0) + 1
+        idempotency_key = f"{record['_id']}:{record.get('reminder_count') or 0}"
+        provider = get_provider(channel)
+        release = {'$unset': {'reminder_lease_until': '', 'reminder_lease_owner': '', 'reminder_recipient': '', 'reminder_message': ''}}
+        log = {
+            'user_id': record['user_id'],
+            'debt_id': str(record['_id']),
+            'recipient': recipient or 'N/A',
+            'message': message,
+            'type': channel,
+            'attempt': attempt,
+            'idempotency_key': idempotency_key,
+            'sent_at': datetime.now(timezone.utc),
+        }
+
+        if not recipient or provider is None:
+            counts['skipped'] += 1
+            db.records.update_one({'_id': record['_id']}, {'$set': {'reminder_status': 'skipped'}, **release})
+            logs.append({**log, 'status': 'skipped', 'api_response': {'status': 'no recipient' if not recipient else f'no provider for {channel}'}})
+            continue
+
+        try:
+            provider.bucket.acquire()
+            success, api_response = provider.send(recipient, message, idempotency_key)
+        except TransientProviderError as e:
+            success, api_response = None, {'status': 'transient error', 'error': str(e)}
+        except Exception as e:
+            success, api_response = False, {'status': 'error', 'error': str(e)}
+
+        if success:
+            counts['sent'] += 1
+            db.records.update_one(
+                {'_id': record['_id']},
+                {'$set': {'reminder_status': 'sent', 'last_reminder_at': now}, '$inc': {'reminder_count': 1}, **release}
+            )
+            logs.append({**log, 'status': 'sent', 'api_response': api_response})
+        elif success is None and attempt < max_attempts:
+            counts['retried'] += 1
+            db.records.update_one(
+                {'_id': record['_id']},
+                {'$set': {'reminder_attempts': attempt, 'reminder_date': now + backoff_delay(attempt)},
+                 '$unset': {'reminder_lease_until': '', 'reminder_lease_owner': ''}}
+            )
+            logs.append({**log, 'status': 'retrying', 'api_response': api_response})
+        else:
+            counts['failed'] += 1
+            db.records.update_one({'_id': record['_id']}, {'$set': {'reminder_status': 'failed', 'reminder_attempts': attempt}, **release})
+            logs.append({**log, 'status': 'failed', 'api_response': api_response})
+
+    if logs:
+        try:
+            db.reminder_logs.insert_many(logs, ordered=False)
+        except BulkWriteError as e:
+            # Duplicate idempotency keys mean another run already logged that send
+            duplicates = [err for err in e.details.get('writeErrors', []) if err.get('code') == 11000]
+            if len(duplicates) != len(e.details.get('writeErrors', [])):
+                raise
+            logger.warning(f"Skipped {len(duplicates)} duplicate reminder log entries", extra={'session_id': 'no-session-id'})
+    return counts
+
+
+class ReminderScheduler(ScheduledJob):
+    """Runs dispatch_due_reminders on a leased interval inside the app."""
+
+    job_id = 'dispatch_due_reminders'
+    extension = 'reminder_scheduler'
+    enabled_setting = 'REMINDER_SCHEDULER_ENABLED'
+    interval_setting = 'REMINDER_SCAN_INTERVAL'
+    default_interval = 60
+    label = 'Reminder scheduler'
+
+    def configure(self, app):
+        app.config.setdefault('REMINDER_BATCH_SIZE', int(os.getenv('REMINDER_BATCH_SIZE', DEFAULT_BATCH_SIZE)))
+        app.config.setdefault('REMINDER_MAX_ATTEMPTS', int(os.getenv('REMINDER_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)))
+        if not _providers:
+            register_provider('sms', LoggingProvider('SMS', float(os.getenv('REMINDER_SMS_RATE', 5))))
+            register_provider('whatsapp', LoggingProvider('WhatsApp', float(os.getenv('REMINDER_WHATSAPP_RATE', 5))))
+
+    def run(self, db):
+        while True:
+            counts = dispatch_due_reminders(
+                db,
+                batch_size=self.app.config['REMINDER_BATCH_SIZE'],
+                max_attempts=self.app.config['REMINDER_MAX_ATTEMPTS']
+            )
+            if any(counts.values()):
+                logger.info(f"Reminder dispatch: {counts}", extra={'session_id': 'no-session-id'})
+            if sum(counts.values()) < self.app.config['REMINDER_BATCH_SIZE']:
+                break
+
+
+reminder_scheduler = ReminderScheduler()
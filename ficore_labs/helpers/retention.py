@@ -0,0 +1,393 @@
+"""
+Tiered retention for the append-only log collections.
+
+audit_logs, tool_usage, user_activities and reminder_logs gain one to three
+rows per user action and are rarely read past the last few weeks. Each has a
+policy in RETENTION_POLICIES (timestamp field and days kept hot). A scheduled
+run moves older rows out in batches:
+
+  1. read the oldest RETENTION_BATCH_SIZE rows past the cutoff;
+  2. write them, per day, as gzip-compressed JSON Lines partitions named
+     <collection>/YYYY/MM/DD/<first id>-<last id>.jsonl.gz (MongoDB extended
+     JSON, so types round-trip);
+  3. record each partition in archive_manifest, then delete the rows.
+
+Partitions go to the archive_files GridFS bucket by default, so every worker
+and host can read what any of them archived. RETENTION_ARCHIVE_BACKEND=local
+writes them under RETENTION_ARCHIVE_DIR instead, which is only safe when that
+directory is shared storage. Each manifest entry records the store that holds
+its partition (entries without one predate GridFS and are local).
+
+A crash between 2 and 3 leaves a row in both places. Reads and restores key
+on _id, so the duplicate is harmless.
+
+Archived ranges can be read in place with read_archive(), or moved back into
+the hot collection with restore_range(). Restored rows carry
+archive_hold_until so the next run does not archive them again straight away.
+
+Manifest entries also list the user_ids whose rows the partition holds, so
+purge_archived_user() can rewrite just those partitions when a user is
+deleted.
+"""
+
+import gzip
+import logging
+import os
+import tempfile
+import uuid
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone
+from bson import json_util
+from gridfs import GridFSBucket
+from gridfs.errors import FileExists, NoFile
+from pymongo import ReplaceOne
+from helpers.scheduler import ScheduledJob
+
+logger = logging.getLogger(__name__)
+
+RETENTION_BATCH_SIZE = 5000
+RESTORE_BATCH_SIZE = 1000
+RESTORE_HOLD_DAYS = 30
+ARCHIVE_PURGE_PARTITIONS = 20
+JSON_OPTIONS = json_util.CANONICAL_JSON_OPTIONS
+
+RETENTION_POLICIES = {
+    'audit_logs': {'field': 'timestamp', 'days': 180, 'owner': 'details.user_id'},
+    'tool_usage': {'field': 'timestamp', 'days': 90, 'owner': 'user_id'},
+    'user_activities': {'field': 'timestamp', 'days': 90, 'owner': 'user_id'},
+    'reminder_logs': {'field': 'sent_at', 'days': 180, 'owner': 'user_id'},
+}
+
+
+def policy_days(collection):
+    """Days a collection keeps rows hot; RETENTION_<COLLECTION>_DAYS overrides the default."""
+    return int(os.getenv(f'RETENTION_{collection.upper()}_DAYS', RETENTION_POLICIES[collection]['days']))
+
+
+def _as_utc(value):
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def partition_name(collection, day, first_id, last_id, revision=None):
+    suffix = f'-{revision}' if revision else ''
+    return f'{collection}/{day:%Y}/{day:%m}/{day:%d}/{first_id}-{last_id}{suffix}.jsonl.gz'
+
+
+def row_owner(collection, document):
+    """The user a row belongs to, following the policy's (possibly dotted) owner field."""
+    value = document
+    for key in RETENTION_POLICIES[collection]['owner'].split('.'):
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+def owner_ids(collection, documents):
+    return sorted({row_owner(collection, document) for document in documents} - {None}, key=str)
+
+
+def _write_jsonl(f, documents):
+    with gzip.open(f, 'wt', encoding='utf-8') as out:
+        for document in documents:
+            out.write(json_util.dumps(document, json_options=JSON_OPTIONS))
+            out.write('\n')
+
+
+def _read_jsonl(f):
+    with gzip.open(f, 'rt', encoding='utf-8') as lines:
+        for line in lines:
+            if line.strip():
+                yield json_util.loads(line, json_options=JSON_OPTIONS)
+
+
+class GridFSArchiveStore:
+    """Partitions in the archive_files GridFS bucket, keyed by partition name."""
+
+    name = 'gridfs'
+
+    def __init__(self, db):
+        self.bucket = GridFSBucket(db, bucket_name='archive_files')
+
+    def write(self, name, documents):
+        with tempfile.SpooledTemporaryFile(max_size=4 * 1024 * 1024) as spooled:
+            _write_jsonl(spooled, documents)
+            spooled.seek(0)
+            try:
+                self.bucket.upload_from_stream_with_id(name, name, spooled)
+            except FileExists:
+                # Same name means same rows: a retried batch after a crash
+                pass
+
+    def read(self, name):
+        """Iterate the partition's documents, or return None if it is missing."""
+        try:
+            stream = self.bucket.open_download_stream(name)
+        except NoFile:
+            return None
+        return _read_jsonl(stream)
+
+    def delete(self, name):
+        try:
+            self.bucket.delete(name)
+        except NoFile:
+            pass
+
+
+class LocalArchiveStore:
+    """Partitions as files under a directory; written via a temp file and an atomic rename."""
+
+    name = 'local'
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, name):
+        return os.path.join(self.root, *name.split('/'))
+
+    def write(self, name, documents):
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        _write_jsonl(tmp_path, documents)
+        os.replace(tmp_path, path)
+
+    def read(self, name):
+        path = self.path(name)
+        return _read_jsonl(path) if os.path.exists(path) else None
+
+    def delete(self, name):
+        try:
+            os.remove(self.path(name))
+        except FileNotFoundError:
+            pass
+
+
+def store_for(stores, entry):
+    """The store holding a manifest entry's partition."""
+    return stores[entry.get('store', LocalArchiveStore.name)]
+
+
+def archive_batch(db, store, collection, now=None, batch_size=RETENTION_BATCH_SIZE):
+    """
+    Archive and delete one batch of expired rows from collection.
+
+    Returns:
+        int: Number of rows archived (0 when nothing is past the cutoff)
+    """
+    now = now or datetime.now(timezone.utc)
+    field = RETENTION_POLICIES[collection]['field']
+    cutoff = now - timedelta(days=policy_days(collection))
+    documents = list(
+        db[collection].find({field: {'$lt': cutoff}, 'archive_hold_until': {'$not': {'$gt': now}}})
+        .sort(field, 1)
+        .limit(batch_size)
+    )
+    if not documents:
+        return 0
+    by_day = defaultdict(list)
+    for document in documents:
+        by_day[_as_utc(document[field]).date()].append(document)
+    manifest = []
+    for day, rows in sorted(by_day.items()):
+        name = partition_name(collection, day, rows[0]['_id'], rows[-1]['_id'])
+        store.write(name, rows)
+        manifest.append({
+            'collection': collection,
+            'day': datetime.combine(day, time.min, tzinfo=timezone.utc),
+            'store': store.name,
+            'path': name,
+            'count': len(rows),
+            'user_ids': owner_ids(collection, rows),
+            'created_at': now
+        })
+    db.archive_manifest.insert_many(manifest)
+    db[collection].delete_many({'_id': {'$in': [document['_id'] for document in documents]}})
+    return len(documents)
+
+
+def run_retention(db, store, now=None, batch_size=RETENTION_BATCH_SIZE, max_batches=100):
+    """
+    Apply every policy, up to max_batches batches per collection.
+
+    Returns:
+        dict: collection -> rows archived in this run
+    """
+    counts = {}
+    for collection in RETENTION_POLICIES:
+        counts[collection] = 0
+        for _ in range(max_batches):
+            archived = archive_batch(db, store, collection, now, batch_size)
+            counts[collection] += archived
+            if archived < batch_size:
+                break
+    return counts
+
+
+def parse_day_range(args):
+    """
+    Read an inclusive start_date / end_date (YYYY-MM-DD) range from request args.
+
+    Returns:
+        tuple: (start date, end date), or None if either is missing, invalid or reversed
+    """
+    try:
+        start = datetime.strptime(args.get('start_date') or '', '%Y-%m-%d').date()
+        end = datetime.strptime(args.get('end_date') or '', '%Y-%m-%d').date()
+    except ValueError:
+        return None
+    return (start, end) if start <= end else None
+
+
+def _manifest_range(db, collection, start, end):
+    """Manifest entries for collection whose day falls in [start, end] (dates, inclusive)."""
+    return db.archive_manifest.find({
+        'collection': collection,
+        'day': {
+            '$gte': datetime.combine(start, time.min, tzinfo=timezone.utc),
+            '$lt': datetime.combine(end + timedelta(days=1), time.min, tzinfo=timezone.utc)
+        }
+    }).sort('day', 1)
+
+
+def read_archive(db, stores, collection, start, end, match=None, limit=None):
+    """
+    Yield archived rows of collection for days start..end without restoring them.
+
+    Args:
+        stores: Store name -> archive store (RetentionEngine.archive_stores)
+        match: Optional {field: value} equality filter on top-level fields
+        limit: Stop after this many rows
+    """
+    seen = set()
+    for entry in _manifest_range(db, collection, start, end):
+        documents = store_for(stores, entry).read(entry['path'])
+        if documents is None:
+            logger.warning(f"Archive partition missing: {entry['path']}", extra={'session_id': 'no-session-id'})
+            continue
+        for document in documents:
+            if document['_id'] in seen:
+                continue
+            if match and any(document.get(key) != value for key, value in match.items()):
+                continue
+            seen.add(document['_id'])
+            yield document
+            if limit is not None and len(seen) >= limit:
+                return
+
+
+def restore_range(db, stores, collection, start, end, now=None):
+    """
+    Move archived rows for days start..end back into the hot collection.
+
+    Rows are upserted by _id, so restoring twice is safe. Their partitions are
+    removed once restored, and the rows are held for RESTORE_HOLD_DAYS before
+    they become eligible for archiving again.
+
+    Returns:
+        int: Number of rows restored
+    """
+    now = now or datetime.now(timezone.utc)
+    hold_until = now + timedelta(days=RESTORE_HOLD_DAYS)
+    restored = 0
+    for entry in list(_manifest_range(db, collection, start, end)):
+        store = store_for(stores, entry)
+        documents = store.read(entry['path'])
+        if documents is not None:
+            batch = []
+            for document in documents:
+                document['archive_hold_until'] = hold_until
+                batch.append(ReplaceOne({'_id': document['_id']}, document, upsert=True))
+                if len(batch) >= RESTORE_BATCH_SIZE:
+                    db[collection].bulk_write(batch, ordered=False)
+                    restored += len(batch)
+                    batch = []
+            if batch:
+                db[collection].bulk_write(batch, ordered=False)
+                restored += len(batch)
+            store.delete(entry['path'])
+        db.archive_manifest.delete_one({'_id': entry['_id']})
+    return restored
+
+
+def purge_archived_user(db, stores, user_id, limit=ARCHIVE_PURGE_PARTITIONS):
+    """
+    Remove a user's rows from a batch of archived partitions.
+
+    Each partition is rewritten without the user's rows under a new name, its
+    manifest entry pointed at the new partition, and the old one deleted.
+    Partitions left empty are dropped with their entry. Entries recorded before
+    user_ids existed are scanned too, and given their user_ids on the way.
+
+    Returns:
+        int: Number of partitions processed
+    """
+    entries = list(
+        db.archive_manifest.find({'$or': [{'user_ids': user_id}, {'user_ids': {'$exists': False}}]})
+        .sort('_id', 1)
+        .limit(limit)
+    )
+    for entry in entries:
+        collection = entry['collection']
+        store = store_for(stores, entry)
+        documents = store.read(entry['path'])
+        if documents is None:
+            logger.warning(f"Archive partition missing: {entry['path']}", extra={'session_id': 'no-session-id'})
+            db.archive_manifest.delete_one({'_id': entry['_id'], 'path': entry['path']})
+            continue
+        documents = list(documents)
+        kept = [document for document in documents if row_owner(collection, document) != user_id]
+        if len(kept) == len(documents):
+            db.archive_manifest.update_one(
+                {'_id': entry['_id'], 'path': entry['path']},
+                {'$set': {'user_ids': owner_ids(collection, kept)}}
+            )
+            continue
+        if not kept:
+            db.archive_manifest.delete_one({'_id': entry['_id'], 'path': entry['path']})
+            store.delete(entry['path'])
+            continue
+        day = _as_utc(entry['day']).date()
+        name = partition_name(collection, day, kept[0]['_id'], kept[-1]['_id'], uuid.uuid4().hex[:8])
+        store.write(name, kept)
+        # Matched on path: a concurrent restore or purge of this entry wins
+        result = db.archive_manifest.update_one(
+            {'_id': entry['_id'], 'path': entry['path']},
+            {'$set': {'path': name, 'count': len(kept), 'user_ids': owner_ids(collection, kept)}}
+        )
+        store.delete(entry['path'] if result.matched_count else name)
+    return len(entries)
+
+
+class RetentionEngine(ScheduledJob):
+    """Runs run_retention on a leased interval inside the app."""
+
+    job_id = 'run_retention'
+    extension = 'retention_engine'
+    enabled_setting = 'RETENTION_ENABLED'
+    interval_setting = 'RETENTION_INTERVAL'
+    default_interval = 6 * 3600
+    label = 'Retention run'
+
+    def configure(self, app):
+        app.config.setdefault('RETENTION_ARCHIVE_BACKEND', os.getenv('RETENTION_ARCHIVE_BACKEND', GridFSArchiveStore.name))
+        app.config.setdefault('RETENTION_ARCHIVE_DIR', os.getenv('RETENTION_ARCHIVE_DIR', os.path.join(app.root_path, 'archive')))
+
+    @property
+    def archive_stores(self):
+        """Every store a manifest entry may point at, for reads, restores and purges."""
+        return {
+            GridFSArchiveStore.name: GridFSArchiveStore(self.db),
+            LocalArchiveStore.name: LocalArchiveStore(self.app.config['RETENTION_ARCHIVE_DIR'])
+        }
+
+    @property
+    def archive_store(self):
+        """The store new partitions are written to."""
+        return self.archive_stores[self.app.config['RETENTION_ARCHIVE_BACKEND']]
+
+    def run(self, db):
+        counts = run_retention(db, self.archive_store)
+        if any(counts.values()):
+            logger.info(f"Retention run archived: {counts}", extra={'session_id': 'no-session-id'})
+
+
+retention_engine = RetentionEngine()
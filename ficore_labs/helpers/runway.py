@@ -0,0 +1,110 @@
+"""
+Burn rate and runway for startup users.
+
+Cash on hand is every fund raised plus money in, minus money out. A month's
+burn is its money out minus money in; the rolling burn averages the last
+ROLLING_MONTHS closed months, and runway is cash on hand divided by it.
+
+Totals over closed months are kept in runway_state and extended a month at a
+time: when a month closes, refresh_runway() folds in that month's summary
+(via the monthly_summaries cache in helpers.monthly_analytics) instead of
+re-reading the whole history. The current month is aggregated live on every
+call, so new cashflows count immediately. invalidate_months() drops the state
+when a write lands in a month it has already folded in, and the next call
+rebuilds it from the stored monthly summaries.
+"""
+
+from datetime import datetime, timezone
+from helpers.monthly_analytics import add_months, aggregate_months, month_key, month_start, monthly_series
+
+ROLLING_MONTHS = 3
+# Past this a runway end month is meaningless (and tiny burns overflow the calendar)
+RUNWAY_HORIZON_MONTHS = 120
+TOTAL_FIELDS = ('funds', 'receipts', 'payments')
+
+
+def first_activity_month(db, user_id):
+    """Month of the user's earliest cashflow or fund, or None."""
+    months = []
+    for collection, types in (('cashflows', ['receipt', 'payment']), ('records', ['fund'])):
+        doc = db[collection].find_one({'user_id': user_id, 'type': {'$in': types}}, {'created_at': 1}, sort=[('created_at', 1)])
+        if doc and doc.get('created_at'):
+            months.append(month_start(doc['created_at']))
+    return min(months) if months else None
+
+
+def refresh_runway(db, user_id, now=None):
+    """
+    The user's runway_state, after folding in any months closed since it was last saved.
+
+    Returns:
+        dict: Cumulative TOTAL_FIELDS through 'through' (last folded month
+            start, or None) and 'recent', the last ROLLING_MONTHS monthly
+            entries
+    """
+    now = now or datetime.now(timezone.utc)
+    last_closed = add_months(month_start(now), -1)
+    state = db.runway_state.find_one({'_id': user_id})
+    if state and state.get('through'):
+        start = add_months(month_start(state['through']), 1)
+    else:
+        state = dict({field: 0 for field in TOTAL_FIELDS}, _id=user_id, user_id=user_id, through=None, recent=[])
+        start = first_activity_month(db, user_id)
+    if start is None or start > last_closed:
+        return state
+    for point in monthly_series(db, user_id, start, last_closed, now):
+        for field in TOTAL_FIELDS:
+            state[field] = round(state[field] + point[field], 2)
+        state['recent'] = (state['recent'] + [{
+            'month': point['month'],
+            'funds': point['funds'],
+            'receipts': point['receipts'],
+            'payments': point['payments'],
+            'burn': round(point['payments'] - point['receipts'], 2)
+        }])[-ROLLING_MONTHS:]
+    state['through'] = last_closed
+    state['updated_at'] = now
+    db.runway_state.replace_one({'_id': user_id}, state, upsert=True)
+    return state
+
+
+def runway_summary(db, user_id, now=None):
+    """
+    Cash on hand, rolling burn and months of runway for a user.
+
+    Returns:
+        dict: cash_on_hand, total_funds, rolling_burn / gross_burn (None
+            without a closed month), runway_months (None unless cash is
+            being burned), runway_until ('YYYY-MM'; None past
+            RUNWAY_HORIZON_MONTHS), month_to_date and the
+            recent monthly entries
+    """
+    now = now or datetime.now(timezone.utc)
+    current = month_start(now)
+    state = refresh_runway(db, user_id, now)
+    live = aggregate_months(db, user_id, current, add_months(current, 1))[current]
+    totals = {field: state[field] + live[field] for field in TOTAL_FIELDS}
+    cash_on_hand = round(totals['funds'] + totals['receipts'] - totals['payments'], 2)
+
+    recent = state['recent']
+    rolling_burn = round(sum(entry['burn'] for entry in recent) / len(recent), 2) if recent else None
+    gross_burn = round(sum(entry['payments'] for entry in recent) / len(recent), 2) if recent else None
+    runway_months = None
+    if rolling_burn is not None and rolling_burn > 0:
+        runway_months = round(max(cash_on_hand, 0) / rolling_burn, 1)
+    return {
+        'cash_on_hand': cash_on_hand,
+        'total_funds': round(totals['funds'], 2),
+        'rolling_burn': rolling_burn,
+        'gross_burn': gross_burn,
+        'runway_months': runway_months,
+        'runway_until': month_key(add_months(current, int(runway_months))) if runway_months is not None and runway_months <= RUNWAY_HORIZON_MONTHS else None,
+        'month_to_date': {
+            'funds': live['funds'],
+            'receipts': live['receipts'],
+            'payments': live['payments'],
+            'burn': round(live['payments'] - live['receipts'], 2)
+        },
+        'recent': recent,
+        'through': month_key(month_start(state['through'])) if state.get('through') else None
+    }
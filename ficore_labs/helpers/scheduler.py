@@ -0,0 +1,152 @@
+"""
+Base for the background jobs that run on an APScheduler interval inside the app.
+
+Every gunicorn worker builds the app, so every worker starts every job's
+scheduler. A run therefore first takes the job's lease in the scheduler_leases
+collection (one document per job id) and does nothing when another process
+holds it:
+
+  * while a run is in progress its lease lasts LEASE_SECONDS (or the interval,
+    if longer), so a worker that dies mid-run is replaced once it expires;
+  * a finished run keeps the lease for one more interval. The same process
+    renews it on its next tick, and the other workers skip, so each job runs
+    once per interval across all workers and hosts.
+
+Subclasses name their settings and implement run(db).
+"""
+
+import atexit
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+LEASE_SECONDS = 600
+
+
+class ScheduledJob:
+    """
+    A job run every <interval_setting> seconds by whichever worker holds its lease.
+
+    Subclasses set job_id (APScheduler id and lease key), extension (the
+    app.extensions key), enabled_setting, interval_setting, default_interval
+    and label, may add settings in configure(), and implement run(db).
+    """
+
+    job_id = None
+    extension = None
+    enabled_setting = None
+    interval_setting = None
+    default_interval = 300
+    run_at_start = False
+    label = 'Scheduled job'
+
+    def __init__(self):
+        self.scheduler = None
+        self.app = None
+        self.owner = None
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault(self.enabled_setting, os.getenv(self.enabled_setting, 'true').lower() == 'true')
+        app.config.setdefault(self.interval_setting, int(os.getenv(self.interval_setting, self.default_interval)))
+        self.configure(app)
+        app.extensions[self.extension] = self
+        if app.config[self.enabled_setting] and not app.testing:
+            self.start()
+
+    def configure(self, app):
+        """Hook for job-specific settings."""
+
+    @property
+    def interval(self):
+        return self.app.config[self.interval_setting]
+
+    @property
+    def db(self):
+        return self.app.extensions['mongo']['bizdb']
+
+    def start(self):
+        from apscheduler.schedulers.background import BackgroundScheduler
+        # Taken here rather than in __init__ so forked workers never share it
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.scheduler = BackgroundScheduler(timezone='UTC')
+        options = {'next_run_time': datetime.now(timezone.utc)} if self.run_at_start else {}
+        self.scheduler.add_job(
+            self.run_once,
+            'interval',
+            seconds=self.interval,
+            id=self.job_id,
+            max_instances=1,
+            coalesce=True,
+            **options
+        )
+        self.scheduler.start()
+        atexit.register(self.shutdown)
+        logger.info(f"{self.label} started", extra={'session_id': 'none', 'user_role': 'none', 'ip_address': 'none'})
+
+    def shutdown(self):
+        if self.scheduler and self.scheduler.running:
+            self.scheduler.shutdown(wait=False)
+
+    def wake(self):
+        """Run the job now instead of waiting for the next interval."""
+        if self.scheduler and self.scheduler.running:
+            self.scheduler.modify_job(self.job_id, next_run_time=datetime.now(timezone.utc))
+
+    def claim(self, db):
+        """Take the job's lease; False if another process holds it."""
+        now = datetime.now(timezone.utc)
+        owner = self.owner or f'{socket.gethostname()}:{os.getpid()}'
+        try:
+            db.scheduler_leases.update_one(
+                {'_id': self.job_id, '$or': [
+                    {'lease_until': {'$lte': now}},
+                    {'owner': owner, 'running': False}
+                ]},
+                {'$set': {
+                    'owner': owner,
+                    'running': True,
+                    'started_at': now,
+                    'lease_until': now + timedelta(seconds=max(LEASE_SECONDS, self.interval))
+                }},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # The lease document exists and is held by another process
+            return False
+        return True
+
+    def release(self, db):
+        """Mark the run finished, keeping the lease for one more interval."""
+        now = datetime.now(timezone.utc)
+        db.scheduler_leases.update_one(
+            {'_id': self.job_id, 'owner': self.owner or f'{socket.gethostname()}:{os.getpid()}'},
+            {'$set': {'running': False, 'finished_at': now, 'lease_until': now + timedelta(seconds=self.interval)}}
+        )
+
+    def run_once(self):
+        with self.app.app_context():
+            try:
+                db = self.db
+                if not self.claim(db):
+                    return
+            except Exception as e:
+                logger.error(f"{self.label} could not take its lease: {str(e)}", exc_info=True, extra={'session_id': 'no-session-id'})
+                return
+            try:
+                self.run(db)
+            except Exception as e:
+                logger.error(f"{self.label} failed: {str(e)}", exc_info=True, extra={'session_id': 'no-session-id'})
+            finally:
+                try:
+                    self.release(db)
+                except Exception as e:
+                    logger.warning(f"{self.label} could not release its lease: {str(e)}", extra={'session_id': 'no-session-id'})
+
+    def run(self, db):
+        raise NotImplementedError
@@ -0,0 +1,70 @@
+"""
+Server-generated service worker.
+
+/sw.js is rendered from templates/sw.js on each request so that it always
+carries the current asset manifest: the fingerprinted stylesheets, fonts and
+chrome images are precached, and the cache names embed the deploy version, so
+a deploy installs a new worker that drops the previous release's caches.
+
+Runtime strategies (implemented in the template):
+  * navigations: network-first; only the public general pages are kept, in a
+    small LRU cache, and the precached offline page is the last resort
+  * JSON summaries (/business/*/summary): stale-while-revalidate, LRU-bounded
+  * other same-origin static files: cache-first, LRU-bounded
+Everything else, including authenticated HTML, goes straight to the network.
+"""
+
+import os
+import posixpath
+from flask import make_response, render_template, url_for
+from helpers.assets import asset_manifest, asset_version, static_url
+from helpers.page_cache import CACHEABLE_ENDPOINTS
+
+PRECACHE_EXTENSIONS = {'.css', '.js', '.woff2'}
+PRECACHE_FILES = [
+    'img/favicon.ico',
+    'img/favicon-16x16.png',
+    'img/favicon-32x32.png',
+    'img/apple-touch-icon.png',
+    'img/default_profile.png',
+    'img/ficore_africa_logo.png',
+]
+RUNTIME_CACHE_LIMITS = {'pages': 10, 'json': 20, 'static': 60}
+JSON_SWR_PATTERN = r'^/business/[^/]+/summary$'
+
+
+def precache_urls():
+    """Fingerprinted URLs worth having before the first offline visit."""
+    files = [name for name in asset_manifest() if posixpath.splitext(name)[1] in PRECACHE_EXTENSIONS]
+    files.extend(name for name in PRECACHE_FILES if name not in files)
+    return [static_url(name) for name in sorted(files)] + [url_for('offline')]
+
+
+def service_worker_version():
+    return f"{os.getenv('APP_VERSION', 'dev')}-{asset_version()}"
+
+
+def service_worker():
+    response = make_response(render_template(
+        'sw.js',
+        version=service_worker_version(),
+        precache_urls=precache_urls(),
+        public_pages=sorted(url_for(endpoint) for endpoint in CACHEABLE_ENDPOINTS),
+        cache_limits=RUNTIME_CACHE_LIMITS,
+        json_swr_pattern=JSON_SWR_PATTERN,
+        offline_url=url_for('offline'),
+    ))
+    response.mimetype = 'application/javascript'
+    # Browsers must revalidate the worker script itself so deploys are picked up
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Service-Worker-Allowed'] = '/'
+    return response
+
+
+def offline():
+    return render_template('offline.html')
+
+
+def init_service_worker(app):
+    app.add_url_rule('/sw.js', endpoint='service_worker', view_func=service_worker)
+    app.add_url_rule('/offline', endpoint='offline', view_func=offline)
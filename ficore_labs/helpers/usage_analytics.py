@@ -0,0 +1,172 @@
+"""
+Pre-aggregated tool usage counters.
+
+log_tool_usage() writes one raw tool_usage row per event. A periodic
+compaction job folds those rows into tool_usage_buckets, one document per
+(granularity, bucket start, tool_name, role) holding a running count, so
+usage charts read a few hundred small documents instead of scanning raw rows:
+
+  * raw rows are read in _id order past a watermark kept in system_stats.
+    Rows newer than COMPACTION_LAG_SECONDS are left for the next run, since
+    ObjectIds from different app processes are only roughly ordered;
+  * each batch is applied with upserted $inc updates tagged with the batch's
+    last _id. A bucket that already carries the tag is skipped, so a batch
+    retried after a crash is not counted twice;
+  * the watermark is advanced only after the buckets are written, and only
+    ever forwards. The job runs under a cross-worker lease, so a single
+    process compacts at a time.
+"""
+
+import logging
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from helpers.scheduler import ScheduledJob
+
+logger = logging.getLogger(__name__)
+
+COMPACTION_STATE_ID = 'tool_usage_compaction'
+COMPACTION_BATCH_SIZE = 5000
+COMPACTION_LAG_SECONDS = 60
+APPLIED_BATCHES_KEPT = 20
+HOURLY_MAX_DAYS = 2
+DUPLICATE_KEY = 11000
+
+
+def bucket_start(value, granularity):
+    """Truncate a timestamp to the start of its hour or day (UTC)."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    value = value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0) if granularity == 'day' else value
+
+
+def bucket_id(granularity, start, tool_name, role):
+    return f'{granularity}:{start:%Y-%m-%dT%H}:{tool_name}:{role}'
+
+
+def fold_rows(rows):
+    """Count rows per (granularity, bucket start, tool_name, role)."""
+    counts = Counter()
+    for row in rows:
+        timestamp = row.get('timestamp')
+        if timestamp is None:
+            continue
+        tool_name = row.get('tool_name') or 'unknown'
+        role = row.get('role') or 'unknown'
+        for granularity in ('hour', 'day'):
+            counts[(granularity, bucket_start(timestamp, granularity), tool_name, role)] += 1
+    return counts
+
+
+def apply_counts(db, counts, batch_key):
+    """Upsert $inc buckets for one batch; buckets already tagged with batch_key are left alone."""
+    operations = [
+        UpdateOne(
+            {'_id': bucket_id(granularity, start, tool_name, role), 'batches': {'$ne': batch_key}},
+            {
+                '$inc': {'count': count},
+                '$set': {'granularity': granularity, 'bucket': start, 'tool_name': tool_name, 'role': role},
+                '$push': {'batches': {'$each': [batch_key], '$slice': -APPLIED_BATCHES_KEPT}}
+            },
+            upsert=True
+        )
+        for (granularity, start, tool_name, role), count in counts.items()
+    ]
+    if not operations:
+        return
+    try:
+        db.tool_usage_buckets.bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        # A duplicate key here means the bucket exists and already has this batch
+        if any(error.get('code') != DUPLICATE_KEY for error in e.details.get('writeErrors', [])):
+            raise
+
+
+def compact_tool_usage(db, now=None, batch_size=COMPACTION_BATCH_SIZE, max_batches=100):
+    """
+    Fold raw tool_usage rows past the watermark into the hourly and daily buckets.
+
+    Returns:
+        int: Number of raw rows folded
+    """
+    now = now or datetime.now(timezone.utc)
+    horizon = ObjectId.from_datetime(now - timedelta(seconds=COMPACTION_LAG_SECONDS))
+    state = db.system_stats.find_one({'_id': COMPACTION_STATE_ID}) or {}
+    watermark = state.get('last_id')
+    folded = 0
+    for _ in range(max_batches):
+        id_range = {'$lt': horizon}
+        if watermark is not None:
+            id_range['$gt'] = watermark
+        rows = list(
+            db.tool_usage.find({'_id': id_range}, {'tool_name': 1, 'role': 1, 'timestamp': 1})
+            .sort('_id', 1)
+            .limit(batch_size)
+        )
+        if not rows:
+            break
+        watermark = rows[-1]['_id']
+        apply_counts(db, fold_rows(rows), str(watermark))
+        # $max: a run that started from an older watermark must never move it back
+        db.system_stats.update_one(
+            {'_id': COMPACTION_STATE_ID},
+            {'$max': {'last_id': watermark}, '$set': {'compacted_at': now}, '$inc': {'rows': len(rows)}},
+            upsert=True
+        )
+        folded += len(rows)
+        if len(rows) < batch_size:
+            break
+    return folded
+
+
+def usage_summary(db, days, now=None):
+    """
+    Usage totals for the last `days` days, read from the buckets only.
+
+    Hourly buckets are used for windows of up to HOURLY_MAX_DAYS days, daily
+    buckets otherwise.
+
+    Returns:
+        dict: granularity, since, series [(bucket, count)] oldest first,
+            by_tool and by_role [(name, count)] largest first, and total
+    """
+    now = now or datetime.now(timezone.utc)
+    granularity = 'hour' if days <= HOURLY_MAX_DAYS else 'day'
+    since = bucket_start(now - timedelta(days=days), granularity)
+    series, by_tool, by_role = Counter(), Counter(), Counter()
+    cursor = db.tool_usage_buckets.find(
+        {'granularity': granularity, 'bucket': {'$gte': since}},
+        {'bucket': 1, 'tool_name': 1, 'role': 1, 'count': 1}
+    )
+    for bucket in cursor:
+        series[bucket['bucket']] += bucket['count']
+        by_tool[bucket['tool_name']] += bucket['count']
+        by_role[bucket['role']] += bucket['count']
+    return {
+        'granularity': granularity,
+        'since': since,
+        'series': sorted(series.items()),
+        'by_tool': by_tool.most_common(),
+        'by_role': by_role.most_common(),
+        'total': sum(series.values())
+    }
+
+
+class UsageCompactor(ScheduledJob):
+    """Runs compact_tool_usage on a leased interval inside the app."""
+
+    job_id = 'compact_tool_usage'
+    extension = 'usage_compactor'
+    enabled_setting = 'USAGE_COMPACTION_ENABLED'
+    interval_setting = 'USAGE_COMPACTION_INTERVAL'
+    default_interval = 300
+    label = 'Tool usage compaction'
+
+    def run(self, db):
+        compact_tool_usage(db)
+
+
+usage_compactor = UsageCompactor()
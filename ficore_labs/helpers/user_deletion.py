@@ -0,0 +1,279 @@
+"""
+Background deletion of a user and everything they own.
+
+admin.delete_user used to run a delete_many per collection inside the request,
+including an unindexed audit_logs scan, which timed out for heavy accounts.
+Deletion is now a job:
+
+  * request_user_deletion() marks the user deletion_pending (they can no longer
+    log in and drop out of admin user lists) and records a deletion_jobs
+    document, so the admin request returns immediately;
+  * a scheduler claims jobs with a lease and purges PURGE_STEPS in order, in
+    batches of PURGE_BATCH_SIZE documents, recording per-step progress on the
+    job after every batch;
+  * a crashed worker's lease expires and the next run resumes from the job's
+    current step. Each batch deletes by owner, so repeating one is harmless;
+  * a job that raises is marked failed with a retry_at backoff and claimed
+    again once it passes, up to MAX_JOB_ATTEMPTS times.
+
+Until the purge completes, admin reports and totals leave out users listed by
+pending_deletion_ids().
+
+Uploaded blobs can be shared between users, so the blobs step only drops the
+user from each blob's owners and deletes the blobs left without one. Archived
+log partitions hold many users' rows, so the archives step rewrites each one
+without the user's rows.
+
+The user document itself is removed last, once every step is done.
+"""
+
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from helpers.blob_storage import blob_storage
+from helpers.counterparties import backfill_marker_id
+from helpers.retention import ARCHIVE_PURGE_PARTITIONS, purge_archived_user, retention_engine
+from helpers.scheduler import ScheduledJob
+
+logger = logging.getLogger(__name__)
+
+PURGE_BATCH_SIZE = 500
+LEASE_SECONDS = 300
+MAX_JOB_ATTEMPTS = 8
+RETRY_BASE_SECONDS = 60
+RETRY_MAX_SECONDS = 6 * 3600
+
+# (step name, collection, owner field); activity_feeds, cashflow_forecasts and runway_state are keyed by the user id itself
+PURGE_STEPS = [
+    ('records', 'records', 'user_id'),
+    ('cashflows', 'cashflows', 'user_id'),
+    ('notifications', 'notifications', 'user_id'),
+    ('feedback', 'feedback', 'user_id'),
+    ('reminder_logs', 'reminder_logs', 'user_id'),
+    ('user_activities', 'user_activities', 'user_id'),
+    ('activity_feeds', 'activity_feeds', '_id'),
+    ('tool_usage', 'tool_usage', 'user_id'),
+    ('counterparties', 'counterparties', 'user_id'),
+    ('counterparty_backfill', 'counterparties', '_id'),
+    ('monthly_summaries', 'monthly_summaries', 'user_id'),
+    ('cashflow_forecasts', 'cashflow_forecasts', '_id'),
+    ('runway_state', 'runway_state', '_id'),
+    ('sync_tombstones', 'sync_tombstones', 'user_id'),
+    ('temp_passwords', 'temp_passwords', 'user_id'),
+    # Before kyc_records and payment_receipts, which identify uploads stored before blobs had owners
+    ('blobs', 'blobs', 'owners'),
+    ('kyc_records', 'kyc_records', 'user_id'),
+    ('payment_receipts', 'payment_receipts', 'user_id'),
+    ('audit_logs', 'audit_logs', 'details.user_id'),
+    # Rows retention already moved out of the log collections above
+    ('archives', 'archive_manifest', 'user_ids'),
+]
+
+
+def request_user_deletion(db, user_id, requested_by):
+    """
+    Hide a user and queue the purge of their data.
+
+    Args:
+        db: MongoDB database instance
+        user_id: Username (_id) of the user to delete
+        requested_by: Id of the admin requesting the deletion
+
+    Returns:
+        dict or None: The deletion job, or None if the user does not exist
+    """
+    now = datetime.now(timezone.utc)
+    result = db.users.update_one(
+        {'_id': user_id},
+        {'$set': {'deletion_pending': True, 'suspended': True, 'updated_at': now}}
+    )
+    if result.matched_count == 0:
+        return None
+    job = {
+        '_id': user_id,
+        'status': 'pending',
+        'requested_by': requested_by,
+        'step': 0,
+        'progress': {name: 0 for name, _, _ in PURGE_STEPS},
+        'created_at': now,
+        'updated_at': now
+    }
+    try:
+        db.deletion_jobs.insert_one(job)
+    except DuplicateKeyError:
+        # A failed job resumes where it stopped; a completed one means the username was reused
+        db.deletion_jobs.update_one(
+            {'_id': user_id, 'status': 'failed'},
+            {'$set': {'status': 'pending', 'requested_by': requested_by, 'attempts': 0, 'updated_at': now}, '$unset': {'last_error': '', 'retry_at': ''}}
+        )
+        db.deletion_jobs.replace_one({'_id': user_id, 'status': 'completed'}, job)
+        job = db.deletion_jobs.find_one({'_id': user_id})
+    user_deletion_worker.wake()
+    return job
+
+
+def pending_deletion_ids(db):
+    """Ids of users whose deletion has been requested but not completed."""
+    return db.users.distinct('_id', {'deletion_pending': True})
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(RETRY_BASE_SECONDS * (2 ** (attempts - 1)), RETRY_MAX_SECONDS))
+
+
+def claim_job(db, owner):
+    """Lease the oldest pending, abandoned or due-for-retry deletion job to owner."""
+    now = datetime.now(timezone.utc)
+    return db.deletion_jobs.find_one_and_update(
+        {'$or': [
+            {'status': 'pending'},
+            {'status': 'running', 'lease_until': {'$lte': now}},
+            {'status': 'failed', 'retry_at': {'$lte': now}}
+        ]},
+        {'$set': {'status': 'running', 'lease_owner': owner, 'lease_until': now + timedelta(seconds=LEASE_SECONDS), 'updated_at': now}},
+        sort=[('created_at', 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def purge_blobs(db, user_id, batch_size):
+    """
+    Release a batch of the user's uploaded blobs.
+
+    Blobs stored before owners were recorded are first given as owners every
+    user whose KYC record or payment receipt references them.
+
+    Returns:
+        int: Number of blobs released
+    """
+    keys = [doc['id_photo_blob'] for doc in db.kyc_records.find({'user_id': user_id, 'id_photo_blob': {'$exists': True}}, {'id_photo_blob': 1})]
+    keys += [doc['blob_key'] for doc in db.payment_receipts.find({'user_id': user_id, 'blob_key': {'$exists': True}}, {'blob_key': 1})]
+    for blob in db.blobs.find({'_id': {'$in': keys}, 'owners': {'$exists': False}}, {'_id': 1}):
+        owners = set(db.kyc_records.distinct('user_id', {'id_photo_blob': blob['_id']}))
+        owners.update(db.payment_receipts.distinct('user_id', {'blob_key': blob['_id']}))
+        db.blobs.update_one({'_id': blob['_id'], 'owners': {'$exists': False}}, {'$set': {'owners': sorted(owners)}})
+    return blob_storage.release_owner(user_id, limit=batch_size)
+
+
+def purge_counterparty_backfill(db, user_id, batch_size):
+    """Delete the marker recording that the user's counterparty directory was backfilled."""
+    return db.counterparties.delete_one({'_id': backfill_marker_id(user_id)}).deleted_count
+
+
+def purge_archives(db, user_id, batch_size):
+    """Rewrite a batch of archived partitions without the user's rows."""
+    return purge_archived_user(db, retention_engine.archive_stores, user_id, limit=batch_size)
+
+
+# Steps that do more than delete the owner's documents
+PURGE_HANDLERS = {
+    'counterparty_backfill': purge_counterparty_backfill,
+    'blobs': purge_blobs,
+    'archives': purge_archives,
+}
+
+# Steps whose batches are heavier than deleting documents
+PURGE_BATCH_LIMITS = {
+    'archives': ARCHIVE_PURGE_PARTITIONS,
+}
+
+
+def purge_step(db, job, owner, batch_size=PURGE_BATCH_SIZE):
+    """
+    Delete one batch from the job's current step.
+
+    Returns:
+        bool: True if the step may have more documents, False once it is empty
+    """
+    name, collection, field = PURGE_STEPS[job['step']]
+    if name in PURGE_HANDLERS:
+        limit = min(batch_size, PURGE_BATCH_LIMITS.get(name, batch_size))
+        deleted = PURGE_HANDLERS[name](db, job['_id'], limit)
+        more = deleted == limit
+    else:
+        ids = [doc['_id'] for doc in db[collection].find({field: job['_id']}, {'_id': 1}).limit(batch_size)]
+        deleted = db[collection].delete_many({'_id': {'$in': ids}}).deleted_count if ids else 0
+        more = len(ids) == batch_size
+    now = datetime.now(timezone.utc)
+    update = {
+        '$inc': {f'progress.{name}': deleted},
+        '$set': {'lease_until': now + timedelta(seconds=LEASE_SECONDS), 'updated_at': now}
+    }
+    if not more:
+        update['$inc']['step'] = 1
+    # Only the lease holder may advance the job
+    result = db.deletion_jobs.update_one({'_id': job['_id'], 'lease_owner': owner}, update)
+    if result.matched_count == 0:
+        raise RuntimeError(f"Lost lease on deletion job {job['_id']}")
+    if not more:
+        job['step'] += 1
+    return more
+
+
+def run_job(db, job, owner, batch_size=PURGE_BATCH_SIZE):
+    """Purge every remaining step of a claimed job, then remove the user."""
+    while job['step'] < len(PURGE_STEPS):
+        purge_step(db, job, owner, batch_size)
+    db.users.delete_one({'_id': job['_id'], 'deletion_pending': True})
+    db.deletion_jobs.update_one(
+        {'_id': job['_id'], 'lease_owner': owner},
+        {'$set': {'status': 'completed', 'completed_at': datetime.now(timezone.utc)}, '$unset': {'lease_until': '', 'lease_owner': ''}}
+    )
+    logger.info(f"Deleted user {job['_id']} and their data: {job.get('progress')}", extra={'session_id': 'no-session-id'})
+
+
+def process_deletion_jobs(db, batch_size=PURGE_BATCH_SIZE):
+    """
+    Claim and run deletion jobs until none are left.
+
+    Returns:
+        int: Number of jobs completed
+    """
+    completed = 0
+    owner = uuid.uuid4().hex
+    while True:
+        job = claim_job(db, owner)
+        if job is None:
+            return completed
+        try:
+            run_job(db, job, owner, batch_size)
+            completed += 1
+        except Exception as e:
+            now = datetime.now(timezone.utc)
+            attempts = job.get('attempts', 0) + 1
+            update = {
+                '$set': {'status': 'failed', 'attempts': attempts, 'last_error': str(e), 'updated_at': now},
+                '$unset': {'lease_until': ''}
+            }
+            if attempts < MAX_JOB_ATTEMPTS:
+                update['$set']['retry_at'] = now + retry_delay(attempts)
+            else:
+                # Left for an admin to re-request; the user stays hidden meanwhile
+                update['$unset']['retry_at'] = ''
+            db.deletion_jobs.update_one({'_id': job['_id'], 'lease_owner': owner}, update)
+            logger.error(f"Deletion job for user {job['_id']} failed at step {job['step']} (attempt {attempts}): {str(e)}", exc_info=True, extra={'session_id': 'no-session-id'})
+
+
+class UserDeletionWorker(ScheduledJob):
+    """Runs process_deletion_jobs on a leased interval inside the app."""
+
+    job_id = 'process_deletion_jobs'
+    extension = 'user_deletion_worker'
+    enabled_setting = 'USER_DELETION_ENABLED'
+    interval_setting = 'USER_DELETION_INTERVAL'
+    default_interval = 60
+    label = 'User deletion worker'
+
+    def configure(self, app):
+        app.config.setdefault('USER_DELETION_BATCH_SIZE', int(os.getenv('USER_DELETION_BATCH_SIZE', PURGE_BATCH_SIZE)))
+
+    def run(self, db):
+        completed = process_deletion_jobs(db, batch_size=self.app.config['USER_DELETION_BATCH_SIZE'])
+        if completed:
+            logger.info(f"Completed {completed} user deletion jobs", extra={'session_id': 'no-session-id'})
+
+
+user_deletion_worker = UserDeletionWorker()
@@ -13,8 +13,11 @@ from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
 from helpers.branding_helpers import draw_ficore_pdf_header, ficore_csv_header
+from helpers.admission import heavy_endpoint
+from helpers.runway import runway_summary
 import csv
 import utils
+from models import create_tombstone
 from translations import trans
 
 # Try to use zoneinfo, fall back to pytz for compatibility
@@ -38,6 +41,36 @@ class InvestorReportForm(FlaskForm):
 
 investor_reports_bp = Blueprint('investor_reports', __name__, url_prefix='/investor_reports')
 
+def report_runway():
+    """Current runway figures for the user's investor reports, or None if they cannot be computed."""
+    try:
+        return runway_summary(utils.get_mongo_db(), str(current_user.id))
+    except Exception as e:
+        logger.warning(
+            f"Error calculating runway for investor report of user {current_user.id}: {str(e)}",
+            extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id}
+        )
+        return None
+
+def runway_lines(runway):
+    """(label, value) pairs describing runway for the PDF and CSV exports."""
+    if not runway:
+        return []
+    if runway['runway_months'] is not None and runway['runway_until'] is None:
+        months = trans('runway_months_value', default='{months} months').format(months=runway['runway_months'])
+    elif runway['runway_months'] is not None:
+        months = trans('runway_months_until', default='{months} months (until {until})').format(months=runway['runway_months'], until=runway['runway_until'])
+    elif runway['rolling_burn'] is not None:
+        months = trans('runway_not_burning', default='Not burning cash')
+    else:
+        months = trans('runway_needs_history', default='Available after your first full month')
+    return [
+        (trans('runway_cash_on_hand', default='Cash on hand'), utils.format_currency(runway['cash_on_hand'])),
+        (trans('runway_total_funds', default='Total funds raised'), utils.format_currency(runway['total_funds'])),
+        (trans('runway_rolling_burn', default='Average monthly burn'), utils.format_currency(runway['rolling_burn']) if runway['rolling_burn'] is not None else '-'),
+        (trans('runway_title', default='Runway'), months)
+    ]
+
 @investor_reports_bp.route('/')
 @login_required
 @utils.requires_role(['startup', 'admin'])
@@ -158,6 +191,7 @@ def view_page(id):
         return render_template(
             'investor_reports/view.html',
             report=report,
+            runway=report_runway(),
             title=trans('investor_reports_details', default='Investor Report Details', lang=session.get('lang', 'en')),
             can_interact=utils.can_user_interact(current_user)
         )
@@ -179,6 +213,7 @@ def view_page(id):
 @investor_reports_bp.route('/generate_report/<id>')
 @login_required
 @utils.requires_role(['startup', 'admin'])
+@heavy_endpoint()
 def generate_report(id):
     """Generate PDF report for an investor report."""
     try:
@@ -256,6 +291,16 @@ def generate_report(id):
         y_position -= 0.3
         p.drawString(inch, y_position * inch, f"{trans('investor_reports_date_recorded', default='Date Recorded')}: {utils.format_date(report['created_at'])}")
         
+        runway = runway_lines(report_runway())
+        if runway:
+            y_position -= 0.5
+            p.setFont("Helvetica-Bold", 14)
+            p.drawString(inch, y_position * inch, trans('runway_section_title', default='Runway and Burn'))
+            p.setFont("Helvetica", 12)
+            for label, value in runway:
+                y_position -= 0.3
+                p.drawString(inch, y_position * inch, f"{label}: {value}")
+        
         p.setFont("Helvetica-Oblique", 10)
         p.drawString(inch, inch, trans('investor_reports_report_footer', default='This document serves as an investor report recorded on FiCore Records.'))
         
@@ -282,6 +327,7 @@ def generate_report(id):
 @investor_reports_bp.route('/generate_report_csv/<id>')
 @login_required
 @utils.requires_role(['startup', 'admin'])
+@heavy_endpoint()
 def generate_report_csv(id):
     """Generate CSV report for an investor report."""
     try:
@@ -332,6 +378,11 @@ def generate_report_csv(id):
         output.append([trans('investor_reports_summary', default='Summary'), report['summary']])
         output.append([trans('investor_reports_financial_highlights', default='Financial Highlights'), report['financial_highlights']])
         output.append([trans('investor_reports_date_recorded', default='Date Recorded'), utils.format_date(report['created_at'])])
+        runway = runway_lines(report_runway())
+        if runway:
+            output.append([''])
+            output.append([trans('runway_section_title', default='Runway and Burn')])
+            output.extend([label, value] for label, value in runway)
         output.append([''])
         output.append([trans('investor_reports_report_footer', default='This document serves as an investor report recorded on FiCore Records.')])
         
@@ -389,9 +440,15 @@ def add():
                     'report_date': report_date,
                     'summary': utils.sanitize_input(form.summary.data, max_length=1000),
                     'financial_highlights': utils.sanitize_input(form.financial_highlights.data, max_length=1000) if form.financial_highlights.data else None,
-                    'created_at': datetime.now(UTC_TZ)
+                    'created_at': datetime.now(UTC_TZ),
+                    'updated_at': datetime.now(UTC_TZ)
                 }
                 result = db.records.insert_one(report_data)
+                utils.track_user_activity(
+                    'investor_report_added',
+                    trans('investor_report_added_description', lang=session.get('lang', 'en'), default=f"Investor report {report_data['title']}"),
+                    related_id=str(result.inserted_id)
+                )
                 logger.info(
                     f"Created investor report with ID {result.inserted_id} for user {current_user.id}",
                     extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id}
@@ -563,6 +620,7 @@ def delete(id):
         query = {'_id': ObjectId(id), 'user_id': str(current_user.id), 'type': 'investor_report'}
         result = db.records.delete_one(query)
         if result.deleted_count:
+            create_tombstone(db, 'records', id, current_user.id)
             logger.info(
                 f"Deleted investor report with ID {id} for user {current_user.id}",
                 extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id}
@@ -9,11 +9,13 @@ from datetime import datetime, timezone
 from zoneinfo import ZoneInfo
 from bson import ObjectId
 import os
-import uuid
 import logging
 import utils
 from utils import get_mongo_db
 from translations import trans
+from models import get_kyc_records_page, KYC_STATUSES
+from helpers.batch_lookup import page_args
+from helpers.blob_storage import blob_storage, BlobTooLarge, UnsupportedBlobType
 
 logger = logging.getLogger(__name__)
 
@@ -46,28 +48,21 @@ def submit():
                 flash(trans('kyc_file_required', default='ID photo is required'), 'danger')
                 return render_template('kyc/submit.html', form=form)
             
-            # Validate file extension and size
+            # Validate file extension, then store it; size and content are checked while streaming
             allowed_extensions = {'.jpg', '.jpeg', '.png', '.pdf'}
             file_ext = os.path.splitext(secure_filename(file.filename))[1].lower()
             if file_ext not in allowed_extensions:
                 flash(trans('kyc_invalid_file_type', default='Invalid file type. Allowed types: jpg, jpeg, png, pdf'), 'danger')
                 return render_template('kyc/submit.html', form=form)
             
-            file_size = len(file.read())
-            file.seek(0)  # Reset file pointer
-            max_size = 5 * 1024 * 1024  # 5MB
-            if file_size > max_size:
+            try:
+                blob = blob_storage.store(file.stream, filename=secure_filename(file.filename), owner=str(current_user.id))
+            except BlobTooLarge:
                 flash(trans('kyc_file_too_large', default='File size exceeds 5MB limit'), 'danger')
                 return render_template('kyc/submit.html', form=form)
-            
-            # Ensure Uploads directory exists
-            upload_dir = 'uploads'
-            os.makedirs(upload_dir, exist_ok=True)
-            
-            # Save file with unique filename
-            unique_filename = f"{uuid.uuid4()}{file_ext}"
-            file_path = os.path.join(upload_dir, unique_filename)
-            file.save(file_path)
+            except UnsupportedBlobType:
+                flash(trans('kyc_invalid_file_type', default='Invalid file type. Allowed types: jpg, jpeg, png, pdf'), 'danger')
+                return render_template('kyc/submit.html', form=form)
             
             # Sanitize inputs
             full_name = utils.sanitize_input(form.full_name.data, max_length=100)
@@ -79,7 +74,7 @@ def submit():
                 'full_name': full_name,
                 'id_type': form.id_type.data,
                 'id_number': id_number,
-                'uploaded_id_photo_url': file_path,
+                'id_photo_blob': blob['_id'],
                 'status': 'pending',
                 'created_at': datetime.now(timezone.utc),
                 'updated_at': datetime.now(timezone.utc)
@@ -161,21 +156,16 @@ def admin():
     """Admin dashboard to view all KYC records."""
     try:
         db = get_mongo_db()
-        kyc_records = list(db.kyc_records.find())
-        # Convert naive datetimes to timezone-aware
-        for record in kyc_records:
-            if record.get('created_at') and record['created_at'].tzinfo is None:
-                record['created_at'] = record['created_at'].replace(tzinfo=ZoneInfo("UTC"))
-            if record.get('updated_at') and record['updated_at'].tzinfo is None:
-                record['updated_at'] = record['updated_at'].replace(tzinfo=ZoneInfo("UTC"))
-        
+        page, per_page, status = page_args(request.args, KYC_STATUSES)
+        kyc_page = get_kyc_records_page(db, status, page, per_page)
         logger.info(
             f"Admin accessed KYC records dashboard",
             extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id}
         )
         return render_template(
             'kyc/admin.html',
-            kyc_records=kyc_records,
+            kyc_records=kyc_page['items'],
+            page=kyc_page,
             title=trans('kyc_admin_title', default='Admin KYC Dashboard', lang=session.get('lang', 'en'))
         )
     except Exception as e:
@@ -8,6 +8,9 @@ from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError, Dupli
 from functools import lru_cache
 from translations import trans
 from utils import get_mongo_db, logger
+from helpers.mail_outbox import MAIL_OUTBOX_RETENTION
+from helpers.batch_lookup import attach_users, paginate_query
+from helpers.ledger_search import LEDGER_TEXT_INDEXES
 import time
 from zoneinfo import ZoneInfo
 
@@ -15,6 +18,9 @@ from zoneinfo import ZoneInfo
 logger = logging.getLogger('business_finance_app')
 logger.setLevel(logging.INFO)
 
+# Deletions older than this are forgotten; clients whose cursor predates it must do a full sync
+SYNC_TOMBSTONE_TTL = 90 * 24 * 3600
+
 def manage_index(collection, keys, options=None, name=None):
     """
     Manage MongoDB index creation with conflict resolution.
@@ -40,6 +46,19 @@ def manage_index(collection, keys, options=None, name=None):
         existing_indexes = collection.index_information()
         index_key_tuple = tuple(keys)
         
+        # A collection holds one text index, stored under _fts/_ftsx keys; replace it when its fields change
+        if any(direction == 'text' for _, direction in keys):
+            for existing_name, existing_info in existing_indexes.items():
+                if ('_fts', 'text') in existing_info['key']:
+                    if existing_name == name and existing_info.get('weights') == options.get('weights'):
+                        logger.info(f"Text index already exists on {collection.name}: {name}",
+                                   extra={'session_id': 'no-session-id'})
+                        return False
+                    logger.info(f"Dropping outdated text index {existing_name} on {collection.name}",
+                               extra={'session_id': 'no-session-id'})
+                    collection.drop_index(existing_name)
+                    break
+
         # Check if index with same key pattern already exists
         for existing_name, existing_info in existing_indexes.items():
             if tuple(existing_info['key']) == index_key_tuple:
@@ -186,6 +205,39 @@ def migrate_naive_datetimes():
         logger.error(f"Failed to migrate naive datetimes: {str(e)}", exc_info=True, extra={'session_id': 'no-session-id'})
         raise
 
+def backfill_sync_timestamps():
+    """
+    One-time migration giving every record and cashflow an updated_at, which the
+    delta sync API uses as its change cursor.
+    """
+    try:
+        db = get_db()
+        migration_flag = db.system_config.find_one({'_id': 'sync_timestamps_backfilled'})
+        if migration_flag and migration_flag.get('value'):
+            logger.info("Sync timestamp backfill already completed, skipping.", extra={'session_id': 'no-session-id'})
+            return
+
+        for collection_name in ('records', 'cashflows'):
+            result = db[collection_name].update_many(
+                {'updated_at': None},
+                [{'$set': {'updated_at': {'$ifNull': ['$created_at', '$$NOW']}}}]
+            )
+            logger.info(
+                f"Backfilled updated_at for {result.modified_count} documents in {collection_name}",
+                extra={'session_id': 'no-session-id'}
+            )
+
+        db.system_config.update_one(
+            {'_id': 'sync_timestamps_backfilled'},
+            {'$set': {'value': True}},
+            upsert=True
+        )
+        logger.info("Marked sync timestamp backfill as completed in system_config", extra={'session_id': 'no-session-id'})
+
+    except Exception as e:
+        logger.error(f"Failed to backfill sync timestamps: {str(e)}", exc_info=True, extra={'session_id': 'no-session-id'})
+        raise
+
 def initialize_app_data(app):
     """
     Initialize MongoDB collections, indexes, and perform one-off migrations for business finance modules.
@@ -324,7 +376,10 @@ def initialize_app_data(app):
                     'indexes': [
                         {'key': [('email', ASCENDING)], 'unique': True},
                         {'key': [('reset_token', ASCENDING)], 'sparse': True},
-                        {'key': [('role', ASCENDING)]}
+                        {'key': [('role', ASCENDING)]},
+                        {'key': [('created_at', DESCENDING)]},
+                        {'key': [('is_subscribed', ASCENDING), ('subscription_end', ASCENDING)]},
+                        {'key': [('is_trial', ASCENDING), ('trial_end', ASCENDING)]}
                     ]
                 },
                 'records': {
@@ -357,7 +412,12 @@ def initialize_app_data(app):
                     },
                     'indexes': [
                         {'key': [('user_id', ASCENDING), ('type', ASCENDING)]},
-                        {'key': [('created_at', DESCENDING)]}
+                        {'key': [('created_at', DESCENDING)]},
+                        {'key': [('user_id', ASCENDING), ('updated_at', ASCENDING)]},
+                        {'key': [('user_id', ASCENDING), ('client_id', ASCENDING)], 'unique': True, 'partialFilterExpression': {'client_id': {'$exists': True}}},
+                        {'key': [('reminder_date', ASCENDING), ('user_id', ASCENDING)], 'partialFilterExpression': {'reminder_status': 'scheduled'}},
+                        {'key': [('user_id', ASCENDING), ('created_at', ASCENDING)]},
+                        LEDGER_TEXT_INDEXES['records']
                     ]
                 },
                 'cashflows': {
@@ -379,7 +439,11 @@ def initialize_app_data(app):
                     },
                     'indexes': [
                         {'key': [('user_id', ASCENDING), ('type', ASCENDING)]},
-                        {'key': [('created_at', DESCENDING)]}
+                        {'key': [('created_at', DESCENDING)]},
+                        {'key': [('user_id', ASCENDING), ('updated_at', ASCENDING)]},
+                        {'key': [('user_id', ASCENDING), ('client_id', ASCENDING)], 'unique': True, 'partialFilterExpression': {'client_id': {'$exists': True}}},
+                        {'key': [('user_id', ASCENDING), ('created_at', ASCENDING)]},
+                        LEDGER_TEXT_INDEXES['cashflows']
                     ]
                 },
                 'audit_logs': {
@@ -397,7 +461,13 @@ def initialize_app_data(app):
                     },
                     'indexes': [
                         {'key': [('admin_id', ASCENDING)], 'sparse': True},
-                        {'key': [('timestamp', DESCENDING)]}
+                        {'key': [('timestamp', DESCENDING)]},
+                        # Audit explorer: every filter walks (field, _id) newest first
+                        {'key': [('admin_id', ASCENDING), ('_id', DESCENDING)], 'partialFilterExpression': {'admin_id': {'$exists': True}}},
+                        {'key': [('user_id', ASCENDING), ('_id', DESCENDING)], 'partialFilterExpression': {'user_id': {'$exists': True}}},
+                        {'key': [('details.user_id', ASCENDING), ('_id', DESCENDING)], 'partialFilterExpression': {'details.user_id': {'$exists': True}}},
+                        {'key': [('action', ASCENDING), ('_id', DESCENDING)]},
+                        {'key': [('ip_address', ASCENDING), ('_id', DESCENDING)], 'partialFilterExpression': {'ip_address': {'$exists': True}}}
                     ]
                 },
                 'temp_passwords': {
@@ -459,14 +529,93 @@ def initialize_app_data(app):
                     },
                     'indexes': [
                         {'key': [('user_id', ASCENDING), ('read', ASCENDING)]},
-                        {'key': [('timestamp', DESCENDING)]}
+                        {'key': [('timestamp', DESCENDING)]},
+                        {'key': [('user_id', ASCENDING), ('timestamp', ASCENDING)]}
+                    ]
+                },
+                'tool_usage': {
+                    'indexes': [
+                        {'key': [('user_id', ASCENDING)], 'sparse': True},
+                        {'key': [('timestamp', ASCENDING)]}
+                    ]
+                },
+                'counterparties': {
+                    'indexes': [
+                        {'key': [('user_id', ASCENDING), ('name_key', ASCENDING)]},
+                        {'key': [('user_id', ASCENDING), ('last_used_at', DESCENDING)]}
+                    ]
+                },
+                'tool_usage_buckets': {
+                    'indexes': [
+                        {'key': [('granularity', ASCENDING), ('bucket', ASCENDING)]}
+                    ]
+                },
+                'blobs': {
+                    'indexes': [
+                        {'key': [('owners', ASCENDING)], 'sparse': True}
+                    ]
+                },
+                'monthly_summaries': {
+                    'indexes': [
+                        {'key': [('user_id', ASCENDING), ('month', ASCENDING)]}
+                    ]
+                },
+                'archive_manifest': {
+                    'indexes': [
+                        {'key': [('collection', ASCENDING), ('day', ASCENDING)]},
+                        {'key': [('user_ids', ASCENDING)], 'sparse': True}
+                    ]
+                },
+                'deletion_jobs': {
+                    'indexes': [
+                        {'key': [('status', ASCENDING), ('created_at', ASCENDING)]},
+                        {'key': [('status', ASCENDING), ('retry_at', ASCENDING)], 'sparse': True}
+                    ]
+                },
+                'mail_outbox': {
+                    'indexes': [
+                        {'key': [('status', ASCENDING), ('next_attempt_at', ASCENDING)]},
+                        {'key': [('dedupe_key', ASCENDING)], 'unique': True, 'sparse': True},
+                        {'key': [('sent_at', ASCENDING)], 'expireAfterSeconds': MAIL_OUTBOX_RETENTION}
+                    ]
+                },
+                'reminder_logs': {
+                    'indexes': [
+                        {'key': [('user_id', ASCENDING), ('sent_at', DESCENDING)]},
+                        {'key': [('idempotency_key', ASCENDING)], 'unique': True, 'partialFilterExpression': {'status': 'sent'}},
+                        {'key': [('sent_at', ASCENDING)]}
+                    ]
+                },
+                'user_activities': {
+                    'indexes': [
+                        {'key': [('user_id', ASCENDING), ('timestamp', DESCENDING)]},
+                        {'key': [('timestamp', ASCENDING)]}
+                    ]
+                },
+                'sync_tombstones': {
+                    'validator': {
+                        '$jsonSchema': {
+                            'bsonType': 'object',
+                            'required': ['user_id', 'collection', 'record_id', 'deleted_at'],
+                            'properties': {
+                                '_id': {'bsonType': 'objectId'},
+                                'user_id': {'bsonType': 'string'},
+                                'collection': {'enum': ['records', 'cashflows', 'notifications']},
+                                'record_id': {'bsonType': 'string'},
+                                'deleted_at': {'bsonType': 'date'}
+                            }
+                        }
+                    },
+                    'indexes': [
+                        {'key': [('user_id', ASCENDING), ('deleted_at', ASCENDING)]},
+                        {'key': [('deleted_at', ASCENDING)], 'expireAfterSeconds': SYNC_TOMBSTONE_TTL}
                     ]
                 },
                 'kyc_records': {
                     'validator': {
                         '$jsonSchema': {
                             'bsonType': 'object',
-                            'required': ['user_id', 'full_name', 'id_type', 'id_number', 'uploaded_id_photo_url', 'status', 'created_at', 'updated_at'],
+                            'required': ['user_id', 'full_name', 'id_type', 'id_number', 'status', 'created_at', 'updated_at'],
                             'properties': {
                                 '_id': {'bsonType': 'objectId'},
                                 'user_id': {'bsonType': 'string'},
@@ -474,6 +623,7 @@ def initialize_app_data(app):
                                 'id_type': {'enum': ['NIN', 'Voters Card', 'Passport']},
                                 'id_number': {'bsonType': 'string'},
                                 'uploaded_id_photo_url': {'bsonType': 'string'},
+                                'id_photo_blob': {'bsonType': 'string'},
                                 'status': {'enum': ['pending', 'approved', 'rejected']},
                                 'created_at': {'bsonType': 'date'},
                                 'updated_at': {'bsonType': 'date'}
@@ -482,7 +632,7 @@ def initialize_app_data(app):
                     },
                     'indexes': [
                         {'key': [('user_id', ASCENDING)], 'unique': True},
-                        {'key': [('status', ASCENDING)]},
+                        {'key': [('status', ASCENDING), ('created_at', DESCENDING)]},
                         {'key': [('created_at', DESCENDING)]}
                     ]
                 },
@@ -512,12 +662,13 @@ def initialize_app_data(app):
                     'validator': {
                         '$jsonSchema': {
                             'bsonType': 'object',
-                            'required': ['user_id', 'filename', 'file_path', 'plan_type', 'amount_paid', 'payment_date', 'status', 'uploaded_at'],
+                            'required': ['user_id', 'filename', 'plan_type', 'amount_paid', 'payment_date', 'status', 'uploaded_at'],
                             'properties': {
                                 '_id': {'bsonType': 'objectId'},
                                 'user_id': {'bsonType': 'string'},
                                 'filename': {'bsonType': 'string'},
                                 'file_path': {'bsonType': 'string'},
+                                'blob_key': {'bsonType': 'string'},
                                 'plan_type': {'enum': ['monthly', 'yearly']},
                                 'amount_paid': {'bsonType': 'number', 'minimum': 0},
                                 'payment_date': {'bsonType': 'date'},
@@ -533,7 +684,7 @@ def initialize_app_data(app):
                     },
                     'indexes': [
                         {'key': [('user_id', ASCENDING)]},
-                        {'key': [('status', ASCENDING)]},
+                        {'key': [('status', ASCENDING), ('uploaded_at', DESCENDING)]},
                         {'key': [('uploaded_at', DESCENDING)]}
                     ]
                 }
@@ -695,6 +846,7 @@ def initialize_app_data(app):
             # Run datetime migration
             try:
                 migrate_naive_datetimes()
+                backfill_sync_timestamps()
             except Exception as e:
                 logger.error(f"Failed to run datetime migration: {str(e)}", 
                             exc_info=True, extra={'session_id': 'no-session-id'})
@@ -1012,6 +1164,7 @@ def create_record(db, record_data):
         required_fields = ['user_id', 'type', 'created_at']
         if not all(field in record_data for field in required_fields):
             raise ValueError(trans('general_missing_record_fields', default='Missing required record fields'))
+        record_data.setdefault('updated_at', datetime.now(timezone.utc))
         result = db.records.insert_one(record_data)
         logger.info(f"{trans('general_record_created', default='Created record with ID')}: {result.inserted_id}", 
                    extra={'session_id': record_data.get('session_id', 'no-session-id')})
@@ -1084,6 +1237,7 @@ def create_cashflow(db, cashflow_data):
         required_fields = ['user_id', 'type', 'party_name', 'amount', 'created_at']
         if not all(field in cashflow_data for field in required_fields):
             raise ValueError(trans('general_missing_cashflow_fields', default='Missing required cashflow fields'))
+        cashflow_data.setdefault('updated_at', datetime.now(timezone.utc))
         result = db.cashflows.insert_one(cashflow_data)
         logger.info(f"{trans('general_cashflow_created', default='Created cashflow record with ID')}: {result.inserted_id}", 
                    extra={'session_id': cashflow_data.get('session_id', 'no-session-id')})
@@ -1123,6 +1277,28 @@ def update_cashflow(db, cashflow_id, update_data):
                     exc_info=True, extra={'session_id': 'no-session-id'})
         raise
 
+def create_tombstone(db, collection_name, record_id, user_id):
+    """
+    Record the deletion of a synced document so offline clients can drop it.
+    
+    Args:
+        db: MongoDB database instance
+        collection_name: Collection the document was deleted from
+        record_id: The ID of the deleted document
+        user_id: Owner of the deleted document
+    """
+    try:
+        db.sync_tombstones.insert_one({
+            'user_id': str(user_id),
+            'collection': collection_name,
+            'record_id': str(record_id),
+            'deleted_at': datetime.now(timezone.utc)
+        })
+    except Exception as e:
+        # A missing tombstone only delays the client noticing; never fail the delete
+        logger.error(f"Error recording sync tombstone for {collection_name} {record_id}: {str(e)}", 
+                    exc_info=True, extra={'session_id': 'no-session-id'})
+
 def get_audit_logs(db, filter_kwargs):
     """
     Retrieve audit log records based on filter criteria.
@@ -1372,7 +1548,7 @@ def create_kyc_record(db, kyc_data):
         str: ID of the created KYC record
     """
     try:
-        required_fields = ['user_id', 'full_name', 'id_type', 'id_number', 'uploaded_id_photo_url', 'status', 'created_at', 'updated_at']
+        required_fields = ['user_id', 'full_name', 'id_type', 'id_number', 'id_photo_blob', 'status', 'created_at', 'updated_at']
         if not all(field in kyc_data for field in required_fields):
             raise ValueError(trans('general_missing_kyc_fields', default='Missing required KYC fields'))
         result = db.kyc_records.insert_one(kyc_data)
@@ -1432,6 +1608,37 @@ def get_kyc_record(db, filter_kwargs):
                     exc_info=True, extra={'session_id': 'no-session-id'})
         raise
 
+KYC_STATUSES = ('pending', 'approved', 'rejected')
+
+def get_kyc_records_page(db, status=None, page=1, per_page=25):
+    """
+    Retrieve one page of KYC records for the admin review screens.
+
+    Args:
+        db: MongoDB database instance
+        status: Optional status filter ('pending', 'approved', 'rejected')
+        page: 1-based page number
+        per_page: Records per page
+
+    Returns:
+        dict: items (with the submitting user attached as 'user'), page, per_page, total, pages
+    """
+    try:
+        query = {'status': status} if status else {}
+        kyc_page = paginate_query(db.kyc_records, query, [('created_at', DESCENDING)], page, per_page)
+        attach_users(db, kyc_page['items'])
+        for record in kyc_page['items']:
+            record['_id'] = str(record['_id'])
+            for field in ('created_at', 'updated_at'):
+                if record.get(field) and record[field].tzinfo is None:
+                    record[field] = record[field].replace(tzinfo=ZoneInfo("UTC"))
+        kyc_page['filters'] = {'status': status} if status else {}
+        return kyc_page
+    except Exception as e:
+        logger.error(f"{trans('general_kyc_fetch_error', default='Error getting KYC records')}: {str(e)}", 
+                    exc_info=True, extra={'session_id': 'no-session-id'})
+        raise
+
 def to_dict_kyc_record(record):
     """
     Convert KYC record to dictionary.
@@ -1451,6 +1658,7 @@ def to_dict_kyc_record(record):
         'id_type': record.get('id_type', ''),
         'id_number': record.get('id_number', ''),
         'uploaded_id_photo_url': record.get('uploaded_id_photo_url', ''),
+        'id_photo_blob': record.get('id_photo_blob'),
         'status': record.get('status', ''),
         'created_at': record.get('created_at'),
         'updated_at': record.get('updated_at')
@@ -4,6 +4,10 @@ from flask_wtf import FlaskForm
 from flask_wtf.csrf import CSRFError
 from translations import trans
 import utils
+from models import create_tombstone
+from helpers.admission import heavy_endpoint
+from helpers.counterparties import record_counterparty
+from helpers.monthly_analytics import invalidate_months
 from bson import ObjectId
 from datetime import datetime, timezone, date
 from zoneinfo import ZoneInfo
@@ -130,6 +134,7 @@ def view(id):
 @payments_bp.route('/generate_pdf/<id>')
 @login_required
 @utils.requires_role(['trader', 'startup', 'admin'])
+@heavy_endpoint()
 def generate_pdf(id):
     """Generate PDF receipt for a payment transaction."""
     try:
@@ -235,6 +240,14 @@ def add():
                     'updated_at': datetime.now(timezone.utc)
                 }
                 db.cashflows.insert_one(cashflow)
+                record_counterparty(db, cashflow['user_id'], cashflow['party_name'], 'payment', cashflow['contact'])
+                invalidate_months(db, cashflow['user_id'], cashflow['created_at'])
+                utils.track_user_activity(
+                    'money_out',
+                    trans('money_out_description', lang=session.get('lang', 'en'), default=f"Paid to {cashflow['party_name']}"),
+                    amount=cashflow['amount'],
+                    related_id=str(cashflow['_id'])
+                )
                 logger.info(
                     f"Payment added for user {current_user.id}",
                     extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id}
@@ -316,6 +329,8 @@ def edit(id):
                     'updated_at': datetime.now(timezone.utc)
                 }
                 db.cashflows.update_one({'_id': ObjectId(id)}, {'$set': updated_cashflow})
+                record_counterparty(db, str(current_user.id), updated_cashflow['party_name'], 'payment', updated_cashflow['contact'])
+                invalidate_months(db, str(current_user.id), payment['created_at'], updated_cashflow['created_at'])
                 logger.info(
                     f"Payment {id} updated for user {current_user.id}",
                     extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id}
@@ -376,8 +391,10 @@ def delete(id):
         
         db = utils.get_mongo_db()
         query = {'_id': ObjectId(id), 'user_id': str(current_user.id), 'type': 'payment'}
-        result = db.cashflows.delete_one(query)
-        if result.deleted_count:
+        deleted = db.cashflows.find_one_and_delete(query, projection={'created_at': 1})
+        if deleted:
+            create_tombstone(db, 'cashflows', id, current_user.id)
+            invalidate_months(db, str(current_user.id), deleted.get('created_at'))
             logger.info(
                 f"Payment {id} deleted for user {current_user.id}",
                 extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id}
@@ -1,4 +1,4 @@
-from flask import Blueprint, session, request, render_template, redirect, url_for, flash, jsonify, current_app, Response
+from flask import Blueprint, session, request, render_template, redirect, url_for, flash, jsonify, current_app, Response, stream_with_context
 from flask_login import login_required, current_user
 from flask_wtf import FlaskForm
 from flask_wtf.csrf import CSRFError
@@ -16,7 +16,11 @@ from wtforms import DateField, StringField, SubmitField, SelectField
 from wtforms.validators import Optional, Length
 import csv
 import logging
+from itertools import chain
 from helpers.branding_helpers import draw_ficore_pdf_header, ficore_csv_header
+from helpers.admission import heavy_endpoint, is_export_request
+from helpers.monthly_analytics import DEFAULT_MONTHS, MAX_MONTHS, parse_month, trend_report
+from helpers.aging import DEBT_TYPES, compute_aging, get_admin_aging, iter_admin_aging_csv, iter_user_aging_csv
 import pymongo.errors
 
 logger = logging.getLogger(__name__)
@@ -213,6 +217,7 @@ def index():
 @login_required
 @utils.requires_role(['trader', 'startup', 'admin'])
 @utils.limiter.limit('10 per minute')
+@heavy_endpoint(is_export_request)
 def profit_loss():
     form = ReportForm()
     can_interact = utils.can_user_interact(current_user)
@@ -306,10 +311,59 @@ def profit_loss():
             can_interact=can_interact
         ), 400
 
+def trend_args():
+    """months (1..MAX_MONTHS) and end ('YYYY-MM') query args for the trend views."""
+    months = request.args.get('months', DEFAULT_MONTHS, type=int) or DEFAULT_MONTHS
+    return min(max(months, 1), MAX_MONTHS), parse_month(request.args.get('end'))
+
+@reports_bp.route('/trends')
+@login_required
+@utils.requires_role(['trader', 'startup', 'admin'])
+@utils.limiter.limit('30 per minute')
+def trends():
+    """Monthly money in/out, net and debt trends with a period-over-period comparison."""
+    months, end = trend_args()
+    try:
+        report = trend_report(utils.get_mongo_db(), str(current_user.id), months=months, end=end)
+        return render_template(
+            'reports/trends.html',
+            report=report,
+            months=months,
+            month_options=(3, 6, 12, 24, 36),
+            title=trans('reports_trends', default='Monthly Trends', lang=session.get('lang', 'en')),
+            can_interact=utils.can_user_interact(current_user)
+        )
+    except Exception as e:
+        logger.error(
+            f"Error building monthly trends for user {current_user.id}: {str(e)}",
+            extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id}
+        )
+        flash(trans('reports_generation_error', default='An error occurred'), 'danger')
+        return redirect(url_for('reports.index'))
+
+@reports_bp.route('/api/trends')
+@login_required
+@utils.requires_role(['trader', 'startup', 'admin'])
+@utils.limiter.limit('60 per minute')
+def trends_api():
+    """JSON monthly series for charts: months (default 12) ending at end (default: this month)."""
+    months, end = trend_args()
+    try:
+        response = jsonify(trend_report(utils.get_mongo_db(), str(current_user.id), months=months, end=end))
+        response.headers['Cache-Control'] = 'private, max-age=60'
+        return response
+    except Exception as e:
+        logger.error(
+            f"Error in monthly trends API for user {current_user.id}: {str(e)}",
+            extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id}
+        )
+        return jsonify({'success': False, 'message': trans('reports_generation_error', default='An error occurred', lang=session.get('lang', 'en'))}), 500
+
 @reports_bp.route('/debtors_creditors', methods=['GET', 'POST'])
 @login_required
 @utils.requires_role(['trader', 'startup', 'admin'])
 @utils.limiter.limit('10 per minute')
+@heavy_endpoint(is_export_request)
 def debtors_creditors():
     form = ReportForm()
     can_interact = utils.can_user_interact(current_user)
@@ -403,10 +457,86 @@ def debtors_creditors():
             can_interact=can_interact
         ), 400
 
+@reports_bp.route('/aging')
+@login_required
+@utils.requires_role(['trader', 'startup', 'admin'])
+@utils.limiter.limit('10 per minute')
+@heavy_endpoint(is_export_request)
+def aging():
+    """Outstanding debtor and creditor balances by age, as HTML, streamed CSV or PDF."""
+    output_format = request.args.get('format', 'html')
+    if output_format not in ['html', 'pdf', 'csv']:
+        flash(trans('reports_invalid_format', default='Invalid report format'), 'danger')
+        return redirect(url_for('reports.aging'))
+    try:
+        db = utils.get_mongo_db()
+        user_id = str(current_user.id)
+        report = compute_aging(db, user_id)
+        logger.info(
+            f"Generating aging report for user {current_user.id}, format: {output_format}",
+            extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id}
+        )
+        if output_format == 'pdf':
+            return generate_aging_pdf(report, trans('reports_aging', default='Debt Aging Report'))
+        if output_format == 'csv':
+            return stream_aging_csv(iter_user_aging_csv(db, user_id, report, report['as_of']), 'aging_report.csv')
+        return render_template(
+            'reports/aging.html',
+            report=report,
+            debt_types=DEBT_TYPES,
+            refreshed_at=None,
+            export_endpoint='reports.aging',
+            title=trans('reports_aging', default='Debt Aging Report', lang=session.get('lang', 'en')),
+            can_interact=utils.can_user_interact(current_user)
+        )
+    except Exception as e:
+        logger.error(
+            f"Error generating aging report for user {current_user.id}: {str(e)}",
+            extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id}
+        )
+        flash(trans('reports_generation_error', default='An error occurred'), 'danger')
+        return redirect(url_for('reports.index'))
+
+@reports_bp.route('/admin/aging')
+@login_required
+@utils.requires_role('admin')
+@utils.limiter.limit('10 per minute')
+@heavy_endpoint(is_export_request)
+def admin_aging():
+    """All users' outstanding balances by age, from the scheduled snapshot."""
+    output_format = request.args.get('format', 'html')
+    if output_format not in ['html', 'pdf', 'csv']:
+        flash(trans('reports_invalid_format', default='Invalid report format'), 'danger')
+        return redirect(url_for('reports.admin_aging'))
+    try:
+        db = utils.get_mongo_db()
+        if output_format == 'csv':
+            return stream_aging_csv(iter_admin_aging_csv(db), 'aging_report_all_users.csv')
+        report, refreshed_at = get_admin_aging(db, refresh=request.args.get('refresh') == '1')
+        if output_format == 'pdf':
+            return generate_aging_pdf(report, trans('reports_admin_aging', default='Debt Aging Report - All Users'))
+        return render_template(
+            'reports/aging.html',
+            report=report,
+            debt_types=DEBT_TYPES,
+            refreshed_at=refreshed_at,
+            export_endpoint='reports.admin_aging',
+            title=trans('reports_admin_aging', default='Debt Aging Report - All Users', lang=session.get('lang', 'en')),
+            can_interact=True
+        )
+    except Exception as e:
+        logger.error(
+            f"Error generating admin aging report for user {current_user.id}: {str(e)}",
+            extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id}
+        )
+        flash(trans('reports_generation_error', default='An error occurred'), 'danger')
+        return redirect(url_for('reports.index'))
+
 @reports_bp.route('/funds', methods=['GET', 'POST'])
 @login_required
 @utils.requires_role(['startup', 'admin'])
 @utils.limiter.limit('10 per minute')
+@heavy_endpoint(is_export_request)
 def funds():
     form = ReportForm()
     can_interact = utils.can_user_interact(current_user)
@@ -504,6 +634,7 @@ def funds():
 @login_required
 @utils.requires_role(['startup', 'admin'])
 @utils.limiter.limit('10 per minute')
+@heavy_endpoint(is_export_request)
 def forecasts():
     form = ReportForm()
     can_interact = utils.can_user_interact(current_user)
@@ -601,6 +732,7 @@ def forecasts():
 @login_required
 @utils.requires_role(['startup', 'admin'])
 @utils.limiter.limit('10 per minute')
+@heavy_endpoint(is_export_request)
 def investor_reports():
     form = ReportForm()
     can_interact = utils.can_user_interact(current_user)
@@ -698,6 +830,7 @@ def investor_reports():
 @login_required
 @utils.requires_role('admin')
 @utils.limiter.limit('10 per minute')
+@heavy_endpoint(is_export_request)
 def customer_reports():
     form = CustomerReportForm()
     can_interact = utils.can_user_interact(current_user)  # Should always be True for admins
@@ -1023,6 +1156,63 @@ def generate_debtors_creditors_csv(records):
     )
     return Response(buffer.getvalue(), mimetype='text/csv', headers={'Content-Disposition': 'attachment;filename=debtors_creditors.csv'})
 
+def stream_aging_csv(lines, filename):
+    header = StringIO()
+    csv.writer(header, lineterminator='\n').writerows(ficore_csv_header(current_user))
+    return Response(
+        stream_with_context(chain([header.getvalue()], lines)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment;filename={filename}'}
+    )
+
+def generate_aging_pdf(report, title):
+    buffer = BytesIO()
+    p = canvas.Canvas(buffer, pagesize=A4)
+    header_height = 0.7
+    extra_space = 0.2
+    row_height = 0.3
+    max_y = 10.5
+    title_y = max_y - header_height - extra_space
+
+    def draw_table_headers(y):
+        p.setFillColor(colors.black)
+        p.drawString(1 * inch, y * inch, trans('reports_aging_bucket', default='Age (days)'))
+        p.drawString(2.5 * inch, y * inch, trans('reports_aging_outstanding', default='Outstanding'))
+        p.drawString(4.5 * inch, y * inch, trans('reports_aging_count', default='Count'))
+        p.drawString(5.5 * inch, y * inch, trans('reports_aging_overdue', default='Reminder Overdue'))
+        return y - row_height
+
+    draw_ficore_pdf_header(p, current_user, y_start=max_y)
+    p.setFont("Helvetica", 12)
+    p.drawString(1 * inch, title_y * inch, title)
+    p.drawString(1 * inch, (title_y - 0.3) * inch, f"{trans('reports_generated_on', default='Generated on')}: {utils.format_date(report['as_of'])}")
+    y = title_y - 0.8
+    for debt_type in DEBT_TYPES:
+        p.setFont("Helvetica-Bold", 12)
+        p.drawString(1 * inch, y * inch, trans(f'general_{debt_type}s', default=f'{debt_type.title()}s'))
+        p.setFont("Helvetica", 12)
+        y = draw_table_headers(y - row_height)
+        for bucket in report[debt_type]:
+            p.drawString(1 * inch, y * inch, bucket['bucket'])
+            p.drawString(2.5 * inch, y * inch, utils.format_currency(bucket['total']))
+            p.drawString(4.5 * inch, y * inch, str(bucket['count']))
+            p.drawString(5.5 * inch, y * inch, str(bucket['overdue']))
+            y -= row_height
+        totals = report['totals'][debt_type]
+        p.drawString(1 * inch, y * inch, trans('general_total', default='Total'))
+        p.drawString(2.5 * inch, y * inch, utils.format_currency(totals['total']))
+        p.drawString(4.5 * inch, y * inch, str(totals['count']))
+        p.drawString(5.5 * inch, y * inch, str(totals['overdue']))
+        y -= 2 * row_height
+
+    p.save()
+    buffer.seek(0)
+    logger.info(
+        f"Generated aging PDF for user {current_user.id}",
+        extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id}
+    )
+    return Response(buffer, mimetype='application/pdf', headers={'Content-Disposition': 'attachment;filename=aging_report.pdf'})
+
 def generate_funds_pdf(funds):
     buffer = BytesIO()
     p = canvas.Canvas(buffer, pagesize=A4)
@@ -0,0 +1,84 @@
+from flask import Blueprint, jsonify, render_template, request, session, url_for, flash, redirect
+from flask_login import login_required, current_user
+import utils
+from utils import logger
+from translations import trans
+from helpers.ledger_search import CASHFLOW_TYPES, RECORD_TYPES, parse_search_args, result_endpoint, search_ledger
+from helpers.counterparties import RELATED_KINDS, SUGGESTION_LIMIT, suggest_counterparties
+
+search_bp = Blueprint('search', __name__, url_prefix='/search')
+
+
+def result_url(result):
+    endpoint, kwargs = result_endpoint(result)
+    return url_for(endpoint, **kwargs) if endpoint else None
+
+
+@search_bp.route('/', methods=['GET'])
+@login_required
+@utils.requires_role(['trader', 'startup', 'admin'])
+@utils.limiter.limit('120 per minute')
+def index():
+    """Search page over the user's records and cashflows."""
+    params = parse_search_args(request.args)
+    try:
+        results = search_ledger(utils.get_mongo_db(), str(current_user.id), params)
+        for result in results:
+            result['url'] = result_url(result)
+        return render_template(
+            'search/index.html',
+            results=results,
+            params=params,
+            types=RECORD_TYPES + CASHFLOW_TYPES,
+            title=trans('search_title', default='Search', lang=session.get('lang', 'en'))
+        )
+    except Exception as e:
+        logger.error(f"Error searching ledger for user {current_user.id}: {str(e)}", extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
+        flash(trans('search_error', default='Search failed, please try again', lang=session.get('lang', 'en')), 'danger')
+        return redirect(url_for('dashboard.index'))
+
+
+@search_bp.route('/api', methods=['GET'])
+@login_required
+@utils.requires_role(['trader', 'startup', 'admin'])
+@utils.limiter.limit('300 per minute')
+def api():
+    """JSON search: q plus optional type, start_date, end_date, min_amount, max_amount and limit."""
+    params = parse_search_args(request.args)
+    try:
+        results = search_ledger(utils.get_mongo_db(), str(current_user.id), params)
+        for result in results:
+            result['url'] = result_url(result)
+            result['created_at'] = result['created_at'].isoformat() if result['created_at'] else None
+        response = jsonify({'query': params['q'], 'results': results})
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+    except Exception as e:
+        logger.error(f"Error in search API for user {current_user.id}: {str(e)}", extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
+        return jsonify({'success': False, 'message': trans('search_error', default='Search failed, please try again', lang=session.get('lang', 'en'))}), 500
+
+
+@search_bp.route('/parties', methods=['GET'])
+@login_required
+@utils.requires_role(['trader', 'startup', 'admin'])
+@utils.limiter.limit('600 per minute')
+def parties():
+    """Typeahead for party names: q is the typed prefix, kind the entry being filled in."""
+    kind = request.args.get('kind')
+    limit = min(max(request.args.get('limit', SUGGESTION_LIMIT, type=int) or SUGGESTION_LIMIT, 1), 20)
+    try:
+        matches = suggest_counterparties(
+            utils.get_mongo_db(),
+            str(current_user.id),
+            (request.args.get('q') or '')[:100],
+            kind=kind if kind in RELATED_KINDS else None,
+            limit=limit
+        )
+        for match in matches:
+            match['last_used_at'] = match['last_used_at'].isoformat() if match['last_used_at'] else None
+        response = jsonify({'parties': matches})
+        response.headers['Cache-Control'] = 'private, max-age=30'
+        return response
+    except Exception as e:
+        logger.error(f"Error suggesting parties for user {current_user.id}: {str(e)}", extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
+        return jsonify({'parties': []}), 500
@@ -1,10 +1,12 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app, session
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, session
 from flask_login import login_required, current_user
 from flask_wtf.csrf import CSRFError
 from translations import trans
 from models import update_user, get_mongo_db
 import requests
 import utils
+from werkzeug.utils import secure_filename
+from helpers.blob_storage import blob_storage, BlobTooLarge, UnsupportedBlobType
 import os
 from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
@@ -365,19 +367,23 @@ def upload_receipt():
             flash(trans('subscribe_invalid_amount', default='Invalid amount format'), 'danger')
             return redirect(url_for('subscribe_bp.manage_subscription'))
         
-        # Save file
-        filename = f"{current_user.id}_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}_{file.filename}"
-        upload_folder = os.path.join(current_app.root_path, 'uploads', 'receipts')
-        os.makedirs(upload_folder, exist_ok=True)
-        file_path = os.path.join(upload_folder, filename)
-        file.save(file_path)
+        # Store file; size and content are checked while streaming
+        filename = secure_filename(file.filename)
+        try:
+            blob = blob_storage.store(file.stream, filename=filename, owner=current_user.id)
+        except BlobTooLarge:
+            flash(trans('subscribe_file_too_large', default='File size exceeds 5MB limit'), 'danger')
+            return redirect(url_for('subscribe_bp.manage_subscription'))
+        except UnsupportedBlobType:
+            flash(trans('subscribe_invalid_file', default='Invalid file type. Please upload PNG, JPG, JPEG, or PDF files only.'), 'danger')
+            return redirect(url_for('subscribe_bp.manage_subscription'))
         
         # Store receipt info in database
         db = get_mongo_db()
         receipt_data = {
             'user_id': current_user.id,
             'filename': filename,
-            'file_path': file_path,
+            'blob_key': blob['_id'],
             'plan_type': plan_type,
             'amount_paid': amount_paid_float,
             'payment_date': datetime.strptime(payment_date, '%Y-%m-%d'),
@@ -0,0 +1,349 @@
+from flask import Blueprint, jsonify, request, session
+from flask_login import login_required, current_user
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime, timedelta, timezone
+from pymongo import ASCENDING, UpdateOne, DeleteOne
+from pymongo.errors import BulkWriteError
+import utils
+from utils import logger
+from models import SYNC_TOMBSTONE_TTL
+from translations import trans
+from helpers.counterparties import record_counterparties
+from helpers.monthly_analytics import invalidate_months
+
+sync_bp = Blueprint('sync', __name__, url_prefix='/api/sync')
+
+# Field each synced collection is paged on; notifications are never edited in place
+CURSOR_FIELDS = {
+    'records': 'updated_at',
+    'cashflows': 'updated_at',
+    'notifications': 'timestamp',
+}
+PUSHABLE_COLLECTIONS = ('records', 'cashflows')
+# Sections a pull cursor tracks a position for: each paged collection plus tombstones
+CURSOR_SECTIONS = tuple(CURSOR_FIELDS) + ('deleted',)
+RECORD_TYPES_BY_ROLE = {
+    'trader': ['debtor', 'creditor', 'fund'],
+    'startup': ['debtor', 'creditor', 'fund', 'forecast', 'investor_report'],
+    'admin': ['debtor', 'creditor', 'fund', 'forecast', 'investor_report'],
+}
+CASHFLOW_TYPES = ['receipt', 'payment']
+TEXT_FIELDS = {
+    'records': ['name', 'contact', 'phone_number', 'email', 'description', 'title', 'source', 'category', 'summary', 'financial_highlights'],
+    'cashflows': ['party_name', 'method', 'category', 'contact', 'description'],
+}
+AMOUNT_FIELDS = {
+    'records': ['amount_owed', 'projected_revenue', 'projected_expenses', 'amount'],
+    'cashflows': ['amount'],
+}
+DATE_FIELDS = {
+    'records': ['forecast_date', 'report_date', 'reminder_date'],
+    'cashflows': ['created_at'],
+}
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 1000
+MAX_PUSH_BATCH = 200
+# Writes committed slightly after a pull started may carry an earlier timestamp
+SAFETY_WINDOW = timedelta(seconds=2)
+
+
+def to_millis(value):
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
+
+def from_millis(value):
+    return datetime.fromtimestamp(int(value) / 1000, tz=timezone.utc)
+
+
+def compact(doc):
+    """Serialize a document for the wire: string ids, epoch-ms dates, no nulls."""
+    result = {}
+    for key, value in doc.items():
+        if value is None or key == 'user_id':
+            continue
+        if isinstance(value, ObjectId):
+            value = str(value)
+        elif isinstance(value, datetime):
+            value = to_millis(value)
+        elif isinstance(value, dict):
+            value = compact(value)
+        result['id' if key == '_id' else key] = value
+    return result
+
+
+def party_entry(collection, data):
+    """(name, kind, contact) for the counterparty directory, or None if the change names no party."""
+    if collection == 'cashflows' and data.get('party_name'):
+        return data['party_name'], data.get('type', 'cashflow'), data.get('contact')
+    if collection == 'records' and data.get('name') and data.get('type') in ('debtor', 'creditor'):
+        return data['name'], data['type'], data.get('contact') or data.get('phone_number')
+    return None
+
+
+def clean_change_data(collection, data, allowed_types):
+    """
+    Whitelist and coerce the fields of a pushed document.
+
+    Raises:
+        ValueError: If a field has an unusable value or the type is not allowed
+    """
+    cleaned = {}
+    if 'type' in data:
+        if data['type'] not in allowed_types:
+            raise ValueError(f"type {data['type']!r} not allowed")
+        cleaned['type'] = data['type']
+    for field in TEXT_FIELDS[collection]:
+        if field in data:
+            cleaned[field] = utils.sanitize_input(data[field], max_length=1000) if data[field] is not None else None
+    for field in AMOUNT_FIELDS[collection]:
+        if field in data:
+            cleaned[field] = utils.clean_currency(data[field])
+    for field in DATE_FIELDS[collection]:
+        if field in data:
+            cleaned[field] = from_millis(data[field]) if data[field] is not None else None
+    return cleaned
+
+
+def parse_cursor(raw):
+    """
+    Decode a pull cursor into {section: (time, last _id or None)}.
+
+    A bare epoch-ms value stands for every section. Cursors handed out mid-way
+    through a paged pull list each section as name=millis[.id], so pages
+    resume after the last (timestamp, _id) delivered even when many documents
+    share one timestamp.
+    """
+    if not raw:
+        return None
+    try:
+        if '=' not in raw:
+            since = from_millis(raw)
+            return {section: (since, None) for section in CURSOR_SECTIONS}
+        positions = {}
+        for part in raw.split(','):
+            section, _, value = part.partition('=')
+            millis, _, last_id = value.partition('.')
+            if section not in CURSOR_SECTIONS:
+                raise ValueError(section)
+            positions[section] = (from_millis(millis), ObjectId(last_id) if last_id else None)
+        if set(positions) != set(CURSOR_SECTIONS):
+            raise ValueError('incomplete cursor')
+        return positions
+    except (TypeError, ValueError, OverflowError, InvalidId):
+        raise ValueError('invalid cursor')
+
+
+def encode_cursor(positions):
+    values = {section: (to_millis(since), last_id) for section, (since, last_id) in positions.items()}
+    if len({value for value in values.values()}) == 1 and all(last_id is None for _, last_id in values.values()):
+        return str(next(iter(values.values()))[0])
+    return ','.join(
+        f'{section}={millis}.{last_id}' if last_id is not None else f'{section}={millis}'
+        for section, (millis, last_id) in values.items()
+    )
+
+
+def after(field, position):
+    """Query for documents strictly after a (time, _id) position in (field, _id) order."""
+    since, last_id = position
+    if last_id is None:
+        return {field: {'$gt': since}}
+    return {'$or': [{field: {'$gt': since}}, {field: since, '_id': {'$gt': last_id}}]}
+
+
+@sync_bp.route('', methods=['GET'])
+@login_required
+@utils.requires_role(['trader', 'startup', 'admin'])
+@utils.limiter.limit('60 per minute')
+def pull():
+    """Return everything that changed for the user since the client's cursor."""
+    try:
+        positions = parse_cursor(request.args.get('cursor'))
+        limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int) or DEFAULT_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'success': False, 'message': trans('sync_invalid_cursor', default='Invalid sync cursor', lang=session.get('lang', 'en'))}), 400
+    try:
+        db = utils.get_mongo_db()
+        user_id = str(current_user.id)
+        started_at = datetime.now(timezone.utc)
+        # Deletions older than the tombstone TTL are gone, so the client must start over
+        reset = positions is not None and min(since for since, _ in positions.values()) < started_at - timedelta(seconds=SYNC_TOMBSTONE_TTL)
+        if reset:
+            positions = None
+
+        # Sections delivered in full resume from just before this pull started
+        caught_up = (from_millis(to_millis(started_at - SAFETY_WINDOW)), None)
+        next_positions = {}
+        changes = {}
+        has_more = False
+        for collection, field in CURSOR_FIELDS.items():
+            query = {'user_id': user_id}
+            if positions is not None:
+                query.update(after(field, positions[collection]))
+            docs = list(db[collection].find(query).sort([(field, ASCENDING), ('_id', ASCENDING)]).limit(limit + 1))
+            if len(docs) > limit:
+                docs = docs[:limit]
+                next_positions[collection] = (docs[-1][field], docs[-1]['_id'])
+                has_more = True
+            else:
+                next_positions[collection] = caught_up
+            changes[collection] = [compact(doc) for doc in docs]
+
+        deleted = {collection: [] for collection in PUSHABLE_COLLECTIONS}
+        if positions is not None:
+            for tombstone in db.sync_tombstones.find({'user_id': user_id, 'deleted_at': {'$gt': positions['deleted'][0]}}, {'collection': 1, 'record_id': 1}):
+                deleted.setdefault(tombstone['collection'], []).append(tombstone['record_id'])
+        next_positions['deleted'] = caught_up
+
+        if positions is not None:
+            # Never move a section backwards past what the client already has
+            for section, position in positions.items():
+                if next_positions[section] is caught_up and to_millis(position[0]) >= to_millis(caught_up[0]):
+                    next_positions[section] = position
+        cursor = encode_cursor(next_positions)
+
+        response = jsonify({
+            'cursor': cursor,
+            'has_more': has_more,
+            'reset': reset or positions is None,
+            'changes': changes,
+            'deleted': deleted
+        })
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+    except Exception as e:
+        logger.error(f"Error during sync pull for user {current_user.id}: {str(e)}", extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
+        return jsonify({'success': False, 'message': trans('sync_error', default='Sync failed, please retry', lang=session.get('lang', 'en'))}), 500
+
+
+@sync_bp.route('', methods=['POST'])
+@login_required
+@utils.requires_role(['trader', 'startup', 'admin'])
+@utils.limiter.limit('30 per minute')
+def push():
+    """
+    Apply a batch of offline edits.
+
+    Each change is {collection, op: 'upsert'|'delete', client_id, id?, base_updated_at?, data?}.
+    New documents are keyed by client_id so retried batches are idempotent. Edits
+    and deletes only apply if the server copy still carries base_updated_at;
+    otherwise they are reported back as conflicts with the server version.
+    """
+    lang = session.get('lang', 'en')
+    if not utils.can_user_interact(current_user):
+        return jsonify({'success': False, 'message': trans('general_subscription_required', default='Your trial or subscription has expired. Please subscribe to continue.', lang=lang)}), 403
+    payload = request.get_json(silent=True) or {}
+    batch = payload.get('changes')
+    if not isinstance(batch, list) or len(batch) > MAX_PUSH_BATCH:
+        return jsonify({'success': False, 'message': trans('sync_invalid_batch', default='Invalid sync batch', lang=lang)}), 400
+
+    try:
+        db = utils.get_mongo_db()
+        user_id = str(current_user.id)
+        # BSON dates are millisecond precision; match that so read-back comparisons hold
+        now = from_millis(to_millis(datetime.now(timezone.utc)))
+        record_types = RECORD_TYPES_BY_ROLE.get(current_user.role, [])
+        operations = {collection: [] for collection in PUSHABLE_COLLECTIONS}
+        pending = {collection: [] for collection in PUSHABLE_COLLECTIONS}
+        rejected = []
+
+        for change in batch:
+            client_id = str(change.get('client_id') or '')
+            collection = change.get('collection')
+            op = change.get('op')
+            try:
+                if collection not in PUSHABLE_COLLECTIONS or op not in ('upsert', 'delete') or not client_id:
+                    raise ValueError('malformed change')
+                allowed_types = record_types if collection == 'records' else CASHFLOW_TYPES
+                data = clean_change_data(collection, change.get('data') or {}, allowed_types)
+                record_id = ObjectId(change['id']) if change.get('id') else None
+                base = from_millis(change['base_updated_at']) if change.get('base_updated_at') is not None else None
+            except (ValueError, TypeError, InvalidId, KeyError) as e:
+                rejected.append({'client_id': client_id, 'reason': 'invalid', 'detail': str(e)})
+                continue
+            party = party_entry(collection, data) if op == 'upsert' else None
+
+            if record_id is None:
+                if op == 'delete' or 'type' not in data:
+                    rejected.append({'client_id': client_id, 'reason': 'invalid', 'detail': 'new documents need a type'})
+                    continue
+                data.setdefault('created_at', now)
+                data['updated_at'] = now
+                operations[collection].append(UpdateOne(
+                    {'user_id': user_id, 'client_id': client_id},
+                    {'$setOnInsert': {**data, 'user_id': user_id, 'client_id': client_id}},
+                    upsert=True
+                ))
+            else:
+                guard = {'_id': record_id, 'user_id': user_id, 'updated_at': base}
+                if op == 'delete':
+                    operations[collection].append(DeleteOne(guard))
+                else:
+                    data.pop('type', None)
+                    data['updated_at'] = now
+                    operations[collection].append(UpdateOne(guard, {'$set': data}))
+            pending[collection].append({'client_id': client_id, 'id': record_id, 'op': op, 'party': party, 'created_at': data.get('created_at')})
+
+        applied, conflicts, parties = [], [], []
+        # Old and new dates of every pushed document, so the closed months they touch are recomputed
+        touched_dates = []
+        for collection in PUSHABLE_COLLECTIONS:
+            if not operations[collection]:
+                continue
+            failed = set()
+            touched_dates.extend(item['created_at'] for item in pending[collection])
+            existing_ids = [item['id'] for item in pending[collection] if item['id'] is not None]
+            if existing_ids:
+                touched_dates.extend(doc.get('created_at') for doc in db[collection].find({'_id': {'$in': existing_ids}, 'user_id': user_id}, {'created_at': 1}))
+            try:
+                db[collection].bulk_write(operations[collection], ordered=False)
+            except BulkWriteError as e:
+                for error in e.details.get('writeErrors', []):
+                    failed.add(error['index'])
+                    item = pending[collection][error['index']]
+                    rejected.append({'client_id': item['client_id'], 'reason': 'invalid', 'detail': error.get('errmsg', '')})
+
+            # bulk_write only reports totals, so read back which guarded writes landed
+            ids = [item['id'] for item in pending[collection] if item['id'] is not None]
+            client_ids = [item['client_id'] for item in pending[collection] if item['id'] is None]
+            current = {doc['_id']: doc for doc in db[collection].find({'_id': {'$in': ids}, 'user_id': user_id})} if ids else {}
+            created = {doc['client_id']: doc for doc in db[collection].find({'user_id': user_id, 'client_id': {'$in': client_ids}}, {'client_id': 1, 'updated_at': 1})} if client_ids else {}
+            tombstones = []
+            for index, item in enumerate(pending[collection]):
+                if index in failed:
+                    continue
+                if item['id'] is None:
+                    doc = created.get(item['client_id'])
+                    if doc:
+                        applied.append({'client_id': item['client_id'], 'id': str(doc['_id']), 'updated_at': to_millis(doc['updated_at'])})
+                        if item['party']:
+                            parties.append(item['party'])
+                    continue
+                doc = current.get(item['id'])
+                if item['op'] == 'delete' and doc is None:
+                    applied.append({'client_id': item['client_id'], 'id': str(item['id'])})
+                    tombstones.append({'user_id': user_id, 'collection': collection, 'record_id': str(item['id']), 'deleted_at': now})
+                elif item['op'] == 'upsert' and doc is not None and doc.get('updated_at') and to_millis(doc['updated_at']) == to_millis(now):
+                    applied.append({'client_id': item['client_id'], 'id': str(item['id']), 'updated_at': to_millis(now)})
+                    if item['party']:
+                        parties.append(item['party'])
+                else:
+                    conflicts.append({'client_id': item['client_id'], 'id': str(item['id']), 'server': compact(doc) if doc else None})
+            if tombstones:
+                db.sync_tombstones.insert_many(tombstones)
+        record_counterparties(db, user_id, parties)
+        invalidate_months(db, user_id, *touched_dates)
+
+        logger.info(
+            f"Sync push for user {user_id}: {len(applied)} applied, {len(conflicts)} conflicts, {len(rejected)} rejected",
+            extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': user_id}
+        )
+        response = jsonify({'success': True, 'applied': applied, 'conflicts': conflicts, 'rejected': rejected})
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+    except Exception as e:
+        logger.error(f"Error during sync push for user {current_user.id}: {str(e)}", extra={'session_id': session.get('sid', 'no-session-id'), 'user_id': current_user.id})
+        return jsonify({'success': False, 'message': trans('sync_error', default='Sync failed, please retry', lang=lang)}), 500
@@ -0,0 +1,115 @@
+// Generated by helpers/service_worker.py; do not edit the served file by hand.
+const VERSION = {{ version | tojson }};
+const PRECACHE = `ficore-precache-${VERSION}`;
+const RUNTIME = {
+    pages: `ficore-pages-${VERSION}`,
+    json: `ficore-json-${VERSION}`,
+    static: `ficore-static-${VERSION}`
+};
+const CACHE_LIMITS = {{ cache_limits | tojson }};
+const PRECACHE_URLS = {{ precache_urls | tojson }};
+const PUBLIC_PAGES = new Set({{ public_pages | tojson }});
+const JSON_SWR_PATTERN = new RegExp({{ json_swr_pattern | tojson }});
+const OFFLINE_URL = {{ offline_url | tojson }};
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(PRECACHE)
+            .then(cache => cache.addAll(PRECACHE_URLS))
+            .then(() => self.skipWaiting())
+    );
+});
+
+// Drop every cache that does not belong to this deploy
+self.addEventListener('activate', event => {
+    const current = new Set([PRECACHE, ...Object.values(RUNTIME)]);
+    event.waitUntil(
+        caches.keys()
+            .then(names => Promise.all(
+                names.filter(name => !current.has(name)).map(name => caches.delete(name))
+            ))
+            .then(() => self.clients.claim())
+    );
+});
+
+// Cache.keys() is in insertion order, so re-putting on use gives LRU eviction
+async function putLru(kind, request, response) {
+    const cache = await caches.open(RUNTIME[kind]);
+    await cache.delete(request);
+    await cache.put(request, response);
+    const keys = await cache.keys();
+    for (let i = 0; i < keys.length - CACHE_LIMITS[kind]; i++) {
+        await cache.delete(keys[i]);
+    }
+}
+
+function isCacheable(response) {
+    return response && response.status === 200 && response.type === 'basic';
+}
+
+async function networkFirst(event) {
+    const { request } = event;
+    const path = new URL(request.url).pathname;
+    try {
+        const response = await fetch(request);
+        if (isCacheable(response) && PUBLIC_PAGES.has(path)) {
+            event.waitUntil(putLru('pages', request, response.clone()));
+        }
+        return response;
+    } catch (error) {
+        const cached = PUBLIC_PAGES.has(path) ? await caches.match(request, { cacheName: RUNTIME.pages }) : null;
+        return cached || (await caches.match(OFFLINE_URL)) || new Response('Offline', { status: 503 });
+    }
+}
+
+async function staleWhileRevalidate(event) {
+    const { request } = event;
+    const cached = await caches.match(request, { cacheName: RUNTIME.json });
+    const network = fetch(request).then(response => {
+        if (isCacheable(response)) {
+            return putLru('json', request, response.clone()).then(() => response);
+        }
+        return response;
+    });
+    if (cached) {
+        event.waitUntil(network.catch(() => null));
+        return cached;
+    }
+    return network;
+}
+
+async function cacheFirst(event) {
+    const { request } = event;
+    const precached = await caches.match(request, { cacheName: PRECACHE });
+    if (precached) {
+        return precached;
+    }
+    const cached = await caches.match(request, { cacheName: RUNTIME.static });
+    if (cached) {
+        event.waitUntil(putLru('static', request, cached.clone()));
+        return cached;
+    }
+    const response = await fetch(request);
+    if (isCacheable(response)) {
+        event.waitUntil(putLru('static', request, response.clone()));
+    }
+    return response;
+}
+
+self.addEventListener('fetch', event => {
+    const { request } = event;
+    if (request.method !== 'GET') {
+        return;
+    }
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) {
+        return;
+    }
+    if (request.mode === 'navigate') {
+        event.respondWith(networkFirst(event));
+    } else if (JSON_SWR_PATTERN.test(url.pathname)) {
+        event.respondWith(staleWhileRevalidate(event));
+    } else if (url.pathname.startsWith('/assets/') || url.pathname.startsWith('/static/')) {
+        event.respondWith(cacheFirst(event));
+    }
+});
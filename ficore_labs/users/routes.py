@@ -8,7 +8,7 @@ from wtforms import StringField, PasswordField, TextAreaField, SelectField, Subm
 from flask_login import login_required, current_user, login_user, logout_user
 from pymongo import errors
 from werkzeug.security import generate_password_hash, check_password_hash
-from flask_mailman import EmailMessage
+from helpers.mail_outbox import queue_email
 import re
 import random
 from itsdangerous import URLSafeTimedSerializer
@@ -240,7 +240,7 @@ def login():
                 else:
                     user = db.users.find_one({'_id': {'$regex': f'^{identifier}$', '$options': 'i'}})
                 
-                if not user:
+                if not user or user.get('deletion_pending'):
                     logger.warning(f"Login attempt failed: Identifier {identifier} not found")
                     flash(trans('general_identifier_not_found', default='Username or Email not found. Please check your signup details.'), 'danger')
                     return render_template('users/login.html', form=form, title=trans('general_login', lang=session.get('lang', 'en'))), 401
@@ -259,17 +259,18 @@ def login():
                             {'_id': username},
                             {'$set': {'otp': otp, 'otp_expiry': datetime.utcnow() + timedelta(minutes=5)}}
                         )
-                        mail = utils.get_mail(current_app)
                         lang = user.get('language', session.get('lang', 'en'))
                         translation_key = 'general_otp_body_ha' if lang == 'ha' else 'general_otp_body'
-                        msg = EmailMessage(
+                        queue_email(
+                            db,
+                            user['email'],
                             subject=trans('general_otp_subject', default='Your One-Time Password', lang=lang),
                             body=trans(translation_key, default='Your OTP is {otp}. It expires in 5 minutes.', lang=lang, otp=otp),
-                            to=[user['email']]
+                            kind='otp',
+                            dedupe_key=f"otp:{username}:{otp}"
                         )
-                        msg.send()
                         session['pending_user_id'] = username
-                        logger.info(f"OTP sent to {user['email']} for username: {username}")
+                        logger.info(f"OTP queued for {user['email']} for username: {username}")
                         return redirect(url_for('users.verify_2fa'))
                     except Exception as e:
                         logger.warning(f"Email delivery or formatting failed for OTP for {username}: {str(e)}. Allowing login without 2FA for testing.")
@@ -561,16 +562,17 @@ def forgot_password():
                 {'_id': user['_id']},
                 {'$set': {'reset_token': reset_token, 'reset_token_expiry': expiry}}
             )
-            mail = utils.get_mail(current_app)
             reset_url = url_for('users.reset_password', token=reset_token, _external=True)
-            msg = EmailMessage(
+            queue_email(
+                db,
+                email,
                 subject=trans('general_reset_password_subject', default='Reset Your Password'),
                 body=trans('general_reset_password_body', default=f'Click the link to reset your password: {reset_url}\nLink expires in 15 minutes.'),
-                to=[email]
+                kind='password_reset',
+                dedupe_key=f"password_reset:{reset_token}"
             )
-            msg.send()
             log_audit_action('forgot_password', {'email': email})
-            logger.info(f"Password reset email sent to {email}")
+            logger.info(f"Password reset email queued for {email}")
             flash(trans('general_reset_email_sent', default='Password reset email sent'), 'success')
             return render_template('users/forgot_password.html', form=form, title=trans('general_send_reset_link', lang=session.get('lang', 'en')))
         except pymongo.errors.PyMongoError as e:
@@ -730,6 +732,8 @@ def logout():
         response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
         response.headers['Pragma'] = 'no-cache'
         response.headers['Expires'] = '0'
+        # Drops the service worker's runtime caches, which hold per-user summaries
+        response.headers['Clear-Site-Data'] = '"cache"'
         response.set_cookie(current_app.config['SESSION_COOKIE_NAME'], '', expires=0, httponly=True, secure=current_app.config.get('SESSION_COOKIE_SECURE', True))
         response.set_cookie('remember_token', '', expires=0, httponly=True, secure=current_app.config.get('SESSION_COOKIE_SECURE', True))
         flash(trans('general_logged_out', default='Logged out successfully'), 'success')
@@ -741,6 +745,7 @@ def logout():
         response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
         response.headers['Pragma'] = 'no-cache'
         response.headers['Expires'] = '0'
+        response.headers['Clear-Site-Data'] = '"cache"'
         response.set_cookie(current_app.config['SESSION_COOKIE_NAME'], '', expires=0, httponly=True, secure=current_app.config.get('SESSION_COOKIE_SECURE', True))
         response.set_cookie('remember_token', '', expires=0, httponly=True, secure=current_app.config.get('SESSION_COOKIE_SECURE', True))
         return response
@@ -17,6 +17,9 @@ from flask_login import current_user
 # Initialize extensions
 limiter = Limiter(key_func=get_remote_address, default_limits=['5,000 per day', '500 per hour'], storage_uri='memory://')
 
+# Entries kept in each user's activity_feeds document; older ones stay in user_activities until archived
+ACTIVITY_FEED_SIZE = 20
+
 # Set up logging
 root_logger = logging.getLogger('bizcore_app')
 root_logger.setLevel(logging.INFO)
@@ -418,6 +421,7 @@ def log_tool_usage(action, tool_name=None, details=None, user_id=None, db=None,
         log_entry = {
             'tool_name': tool_name or action,
             'user_id': str(user_id) if user_id else None,
+            'role': current_user.role if has_request_context() and current_user.is_authenticated else 'anonymous',
             'session_id': effective_session_id,
             'action': details.get('action') if details else None,
             'timestamp': datetime.now(timezone.utc),
@@ -741,6 +745,9 @@ def track_user_activity(activity_type, description, amount=None, related_id=None
     """
     Track user activity for the recent activity sidebar.
     
+    The entry is pushed onto the user's capped activity_feeds document, which the
+    sidebar reads, and appended to the user_activities history (archived by helpers.retention).
+    
     Args:
         activity_type: Type of activity (e.g., 'debtor_added', 'payment_made', etc.)
         description: Human-readable description of the activity
@@ -772,7 +779,15 @@ def track_user_activity(activity_type, description, amount=None, related_id=None
             
             db = get_mongo_db()
             
-            # Store in a dedicated user_activities collection for the sidebar
+            # Newest-first capped feed the sidebar reads with a single point lookup
+            feed_entry = {k: activity_entry[k] for k in ('type', 'description', 'amount', 'related_id', 'timestamp')}
+            db.activity_feeds.update_one(
+                {'_id': user_id},
+                {'$push': {'items': {'$each': [feed_entry], '$position': 0, '$slice': ACTIVITY_FEED_SIZE}}},
+                upsert=True
+            )
+            
+            # Full history, archived once past its retention policy
             db.user_activities.insert_one(activity_entry)
             
             # Also log as a regular audit log
@@ -794,7 +809,7 @@ __all__ = [
     'clean_currency', 'log_tool_usage', 'get_limiter', 'create_anonymous_session', 
     'is_valid_email', 'get_mongo_db', 'requires_role', 'is_admin', 'can_user_interact',
     'should_show_subscription_banner', 'format_currency', 'format_date', 'sanitize_input', 'generate_unique_id', 
-    'validate_required_fields', 'get_user_language', 'log_user_action', 'track_user_activity',
+    'validate_required_fields', 'get_user_language', 'log_user_action', 'track_user_activity', 'ACTIVITY_FEED_SIZE',
     'initialize_tools_with_urls', 'TRADER_TOOLS', 
     'TRADER_NAV', 'STARTUP_TOOLS', 'STARTUP_NAV', 'ADMIN_TOOLS', 'ADMIN_NAV', 
     'ALL_TOOLS', 'get_explore_features'